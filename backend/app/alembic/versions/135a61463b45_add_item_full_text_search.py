@@ -0,0 +1,40 @@
+"""Add item full-text search
+
+Revision ID: 135a61463b45
+Revises: 0487a56e3bcb
+Create Date: 2026-10-17 01:55:55.547599
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = "135a61463b45"
+down_revision = "0487a56e3bcb"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Kept up to date by Postgres, and left out of the Item model: app code
+    # never writes it, only searches it (see crud.item_search)
+    op.execute(
+        """
+        ALTER TABLE item ADD COLUMN search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', coalesce(title, '')), 'A')
+            || setweight(to_tsvector('english', coalesce(description, '')), 'B')
+        ) STORED
+        """
+    )
+    op.create_index(
+        "ix_item_search_vector", "item", ["search_vector"], postgresql_using="gin"
+    )
+
+
+def downgrade():
+    op.drop_index("ix_item_search_vector", table_name="item")
+    op.drop_column("item", "search_vector")
@@ -0,0 +1,25 @@
+"""Default revoked token revoked_at to the database clock
+
+Revision ID: b66ca586b394
+Revises: c5d229cf8057
+Create Date: 2026-10-17 02:43:01.731975
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = 'b66ca586b394'
+down_revision = 'c5d229cf8057'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.alter_column('revokedtoken', 'revoked_at', server_default=sa.func.now())
+
+
+def downgrade():
+    op.alter_column('revokedtoken', 'revoked_at', server_default=None)
@@ -0,0 +1,54 @@
+"""Conditional GET support: ETags, If-None-Match and Cache-Control.
+
+Polling clients send back the ETag of the response they have, and get an
+empty 304 Not Modified while it still matches, so the body is neither
+serialized nor sent again. ETags are weak: the representation is the same
+whatever the Content-Encoding of the response.
+"""
+
+import hashlib
+import json
+from typing import Annotated, Any
+
+from fastapi import Header, Response, status
+
+# Responses depend on who is asking: shared caches must not store them, and
+# browsers must check with the server (which answers 304) before reusing them
+PRIVATE_REVALIDATE = "private, no-cache"
+# Requests are authenticated by either header
+VARY = "Authorization, X-API-Key"
+
+IfNoneMatch = Annotated[str | None, Header(include_in_schema=False)]
+
+
+def make_etag(*values: Any) -> str:
+    """A weak ETag of the values a response is built from."""
+    data = json.dumps(values, default=str, separators=(",", ":")).encode()
+    return f'W/"{hashlib.blake2b(data, digest_size=16).hexdigest()}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Whether an If-None-Match header matches an ETag, by weak comparison."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque_tag = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque_tag
+        for candidate in if_none_match.split(",")
+    )
+
+
+def set_cache_headers(
+    response: Response, etag: str, cache_control: str = PRIVATE_REVALIDATE
+) -> None:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+    response.headers["Vary"] = VARY
+
+
+def not_modified(etag: str, cache_control: str = PRIVATE_REVALIDATE) -> Response:
+    response = Response(status_code=status.HTTP_304_NOT_MODIFIED)
+    set_cache_headers(response, etag, cache_control)
+    return response
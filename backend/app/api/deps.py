@@ -1,21 +1,28 @@
-from collections.abc import Generator
-from typing import Annotated
+import uuid
+from collections.abc import AsyncGenerator, Generator
+from typing import Annotated, Any
 
 import jwt
 from fastapi import Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer
+from fastapi.security import APIKeyHeader, OAuth2PasswordBearer
 from jwt.exceptions import InvalidTokenError
 from pydantic import ValidationError
-from sqlmodel import Session
+from sqlmodel import Session, col, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.core import security
+from app.core.api_key_usage import api_key_usage
 from app.core.config import settings
-from app.core.db import engine
-from app.models import TokenPayload, User
+from app.core.db import async_engine, engine
+from app.core.token_revocation import revocation_list
+from app.core.user_cache import user_cache
+from app.models import ApiKey, TokenPayload, User, UserPublic
 
+# Either scheme authenticates a request, so neither rejects it on its own
 reusable_oauth2 = OAuth2PasswordBearer(
-    tokenUrl=f"{settings.API_V1_STR}/login/access-token"
+    tokenUrl=f"{settings.API_V1_STR}/login/access-token", auto_error=False
 )
+api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
 
 
 def get_db() -> Generator[Session, None, None]:
@@ -23,22 +30,73 @@ def get_db() -> Generator[Session, None, None]:
         yield session
 
 
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    # Loaded objects stay usable after commit: in async code an expired
+    # attribute can't be lazily reloaded
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
+
+
 SessionDep = Annotated[Session, Depends(get_db)]
-TokenDep = Annotated[str, Depends(reusable_oauth2)]
+AsyncSessionDep = Annotated[AsyncSession, Depends(get_async_db)]
+TokenDep = Annotated[str | None, Depends(reusable_oauth2)]
+ApiKeyDep = Annotated[str | None, Depends(api_key_header)]
+
 
+def not_authenticated() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Not authenticated",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
 
-def get_current_user(session: SessionDep, token: TokenDep) -> User:
+
+def decode_token(token: str) -> dict[str, Any]:
     try:
         payload = jwt.decode(
             token, settings.SECRET_KEY, algorithms=[security.ALGORITHM]
         )
-        token_data = TokenPayload(**payload)
+        TokenPayload(**payload)
     except (InvalidTokenError, ValidationError):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Could not validate credentials",
         )
-    user = session.get(User, token_data.sub)
+    return payload
+
+
+async def decode_access_token(token: str) -> dict[str, Any]:
+    """Decode a token used as an access token, and check stateless ones for revocation."""
+    payload = decode_token(token)
+    if payload.get("type") == "refresh":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Could not validate credentials",
+        )
+    if payload.get("jti") is not None:
+        try:
+            user_id = uuid.UUID(payload.get("sub"))
+        except (TypeError, ValueError):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Could not validate credentials",
+            )
+        await revocation_list.sync_if_stale(lambda: AsyncSession(async_engine))
+        if revocation_list.is_revoked(payload["jti"], user_id, payload.get("iat")):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Token has been revoked",
+            )
+    return payload
+
+
+async def get_active_user(user_id: str | None) -> User:
+    # Look the user up in a short-lived session of its own, so the connection
+    # goes back to the pool right away. Routes that only need the user (like
+    # proposal generation, which awaits the AI provider for seconds) then
+    # don't hold a database connection for the rest of the request.
+    async with AsyncSession(async_engine) as session:
+        user = await session.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     if not user.is_active:
@@ -46,10 +104,94 @@ def get_current_user(session: SessionDep, token: TokenDep) -> User:
     return user
 
 
+async def record_api_key_use(key: str) -> None:
+    prefix = security.get_api_key_prefix(key)
+    if prefix is not None:
+        api_key_usage.record(prefix)
+    await api_key_usage.flush_if_due(lambda: AsyncSession(async_engine))
+
+
+async def get_api_key_user(key: str) -> User:
+    """Authenticate an API key: one indexed lookup and an HMAC comparison."""
+    prefix = security.get_api_key_prefix(key)
+    if prefix is None:
+        raise HTTPException(status_code=403, detail="Invalid API key")
+    statement = (
+        select(ApiKey, User)
+        .join(User, col(ApiKey.owner_id) == User.id)
+        .where(ApiKey.prefix == prefix)
+    )
+    async with AsyncSession(async_engine) as session:
+        row = (await session.exec(statement)).first()
+    if row is None or not security.verify_api_key(key, row[0].key_hash):
+        raise HTTPException(status_code=403, detail="Invalid API key")
+    user = row[1]
+    if not user.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    await record_api_key_use(key)
+    return user
+
+
+async def get_current_user(token: TokenDep, api_key: ApiKeyDep) -> User:
+    if api_key is not None:
+        return await get_api_key_user(api_key)
+    if token is None:
+        raise not_authenticated()
+    token_data = TokenPayload(**await decode_access_token(token))
+    return await get_active_user(token_data.sub)
+
+
 CurrentUser = Annotated[User, Depends(get_current_user)]
 
 
-def get_current_active_superuser(current_user: CurrentUser) -> User:
+async def get_current_user_cached(token: TokenDep, api_key: ApiKeyDep) -> UserPublic:
+    """
+    Get a snapshot of the current user, from the user cache when possible.
+
+    For routes that only need who the user is (id, email, flags): a cache hit
+    skips both the token decoding and the database. Routes that change the
+    user or need its password hash use CurrentUser instead.
+
+    With JWT_STATELESS_CLAIMS the snapshot comes from the token's own claims,
+    so the only check left is the in-memory revocation list. API keys are
+    cached like tokens.
+    """
+    if api_key is not None:
+        user = user_cache.get(api_key)
+        if user is not None:
+            await record_api_key_use(api_key)
+            return user
+        user = UserPublic.model_validate(await get_api_key_user(api_key))
+        user_cache.set(api_key, user)
+        return user
+    if token is None:
+        raise not_authenticated()
+    if settings.JWT_STATELESS_CLAIMS:
+        payload = await decode_access_token(token)
+        if payload.get("type") == "access":
+            user = UserPublic(
+                id=payload["sub"],
+                email=payload["email"],
+                full_name=payload.get("full_name"),
+                is_active=payload["is_active"],
+                is_superuser=payload["is_superuser"],
+            )
+            if not user.is_active:
+                raise HTTPException(status_code=400, detail="Inactive user")
+            return user
+    user = user_cache.get(token)
+    if user is not None:
+        return user
+    payload = await decode_access_token(token)
+    user = UserPublic.model_validate(await get_active_user(payload.get("sub")))
+    user_cache.set(token, user, token_expires_at=payload.get("exp"))
+    return user
+
+
+CachedUser = Annotated[UserPublic, Depends(get_current_user_cached)]
+
+
+def get_current_active_superuser(current_user: CachedUser) -> UserPublic:
     if not current_user.is_superuser:
         raise HTTPException(
             status_code=403, detail="The user doesn't have enough privileges"
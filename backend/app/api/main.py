@@ -1,11 +1,12 @@
 from fastapi import APIRouter
 
-from app.api.routes import items, login, private, users, utils, proposals
+from app.api.routes import api_keys, items, login, private, users, utils, proposals
 from app.core.config import settings
 
 api_router = APIRouter()
 api_router.include_router(login.router)
 api_router.include_router(users.router)
+api_router.include_router(api_keys.router)
 api_router.include_router(utils.router)
 api_router.include_router(items.router)
 api_router.include_router(proposals.router)
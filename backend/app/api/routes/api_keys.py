@@ -0,0 +1,79 @@
+import uuid
+from typing import Any
+
+from fastapi import APIRouter, HTTPException
+from sqlmodel import col, func, select
+
+from app.api.deps import AsyncSessionDep, CachedUser
+from app.core.security import generate_api_key, hash_api_key
+from app.core.user_cache import user_cache
+from app.models import (
+    ApiKey,
+    ApiKeyCreate,
+    ApiKeyCreated,
+    ApiKeyPublic,
+    ApiKeysPublic,
+    Message,
+)
+
+router = APIRouter(prefix="/api-keys", tags=["api-keys"])
+
+
+@router.get("/", response_model=ApiKeysPublic)
+async def read_api_keys(session: AsyncSessionDep, current_user: CachedUser) -> Any:
+    """
+    Retrieve own API keys.
+    """
+    count_statement = (
+        select(func.count())
+        .select_from(ApiKey)
+        .where(ApiKey.owner_id == current_user.id)
+    )
+    count = (await session.exec(count_statement)).one()
+    statement = (
+        select(ApiKey)
+        .where(ApiKey.owner_id == current_user.id)
+        .order_by(col(ApiKey.created_at).desc())
+    )
+    api_keys = (await session.exec(statement)).all()
+    return ApiKeysPublic(
+        data=[ApiKeyPublic.model_validate(api_key) for api_key in api_keys],
+        count=count,
+    )
+
+
+@router.post("/", response_model=ApiKeyCreated)
+async def create_api_key(
+    *, session: AsyncSessionDep, current_user: CachedUser, api_key_in: ApiKeyCreate
+) -> Any:
+    """
+    Create a new API key. The key is only returned in this response.
+    """
+    key, prefix = generate_api_key()
+    api_key = ApiKey(
+        name=api_key_in.name,
+        prefix=prefix,
+        key_hash=hash_api_key(key),
+        owner_id=current_user.id,
+    )
+    session.add(api_key)
+    await session.commit()
+    await session.refresh(api_key)
+    return ApiKeyCreated.model_validate(api_key, update={"key": key})
+
+
+@router.delete("/{id}")
+async def delete_api_key(
+    session: AsyncSessionDep, current_user: CachedUser, id: uuid.UUID
+) -> Message:
+    """
+    Delete an API key.
+    """
+    api_key = await session.get(ApiKey, id)
+    if not api_key or api_key.owner_id != current_user.id:
+        raise HTTPException(status_code=404, detail="API key not found")
+    await session.delete(api_key)
+    await session.commit()
+    # The key may be cached as an authenticated user
+    user_cache.invalidate_user(current_user.id)
+    return Message(message="API key deleted successfully")
@@ -1,77 +1,373 @@
+import csv
+import json
 import uuid
+from collections.abc import AsyncIterator
 from typing import Any
 
-from fastapi import APIRouter, HTTPException
-from sqlmodel import func, select
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from pydantic import ValidationError
+from sqlmodel import and_, col, func, or_, select
 
-from app.api.deps import CurrentUser, SessionDep
-from app.models import Item, ItemCreate, ItemPublic, ItemsPublic, ItemUpdate, Message
+from app import async_crud, crud
+from app.api.caching import (
+    IfNoneMatch,
+    etag_matches,
+    make_etag,
+    not_modified,
+    set_cache_headers,
+)
+from app.api.deps import AsyncSessionDep, CurrentUser
+from app.core import counters
+from app.core.config import settings
+from app.models import (
+    Item,
+    ItemBulkResult,
+    ItemCreate,
+    ItemImportError,
+    ItemPublic,
+    ItemsBulkCreate,
+    ItemsBulkDelete,
+    ItemsBulkResult,
+    ItemsBulkUpdate,
+    ItemsImportResult,
+    ItemsPublic,
+    ItemUpdate,
+    Message,
+)
+from app.utils import decode_cursor, encode_cursor
 
 router = APIRouter(prefix="/items", tags=["items"])
 
+# Errors reported by an import; later ones are only counted as skipped rows
+IMPORT_MAX_ERRORS = 100
+IMPORT_CONTENT_TYPES = ("text/csv", "application/x-ndjson")
+
+
+def check_bulk_size(rows: int) -> None:
+    if rows > settings.ITEMS_BULK_MAX_ROWS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"A bulk request can contain at most {settings.ITEMS_BULK_MAX_ROWS} items",
+        )
+
+
+async def read_lines(request: Request) -> AsyncIterator[tuple[int, bytes]]:
+    """Yield the request body's lines, numbered from 1, as they arrive."""
+    number = 0
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            number += 1
+            yield number, line
+    if buffer:
+        yield number + 1, buffer
+
+
+async def parse_import(
+    lines: AsyncIterator[tuple[int, bytes]],
+    content_type: str,
+    errors: list[ItemImportError],
+) -> AsyncIterator[ItemCreate]:
+    """Yield the valid items of a CSV or NDJSON upload, collecting errors."""
+    header: list[str] | None = None
+    async for number, raw_line in lines:
+        line = raw_line.rstrip(b"\r")
+        if not line.strip():
+            continue
+        try:
+            text = line.decode()
+            if content_type == "text/csv":
+                fields = next(csv.reader([text]))
+                if header is None:
+                    header = [field.strip() for field in fields]
+                    continue
+                # CSV has no null: an empty description is a missing one
+                values: Any = {
+                    name: value
+                    for name, value in zip(header, fields, strict=True)
+                    if value or name != "description"
+                }
+            else:
+                values = json.loads(text)
+            yield ItemCreate.model_validate(values)
+        except ValidationError as e:
+            if len(errors) < IMPORT_MAX_ERRORS:
+                error = "; ".join(
+                    f"{'.'.join(map(str, detail['loc'])) or 'item'}: {detail['msg']}"
+                    for detail in e.errors()
+                )
+                errors.append(ItemImportError(line=number, error=error))
+        except ValueError as e:
+            # Undecodable text, invalid JSON, or a CSV row of the wrong length
+            if len(errors) < IMPORT_MAX_ERRORS:
+                errors.append(ItemImportError(line=number, error=str(e)))
+
 
 @router.get("/", response_model=ItemsPublic)
-def read_items(
-    session: SessionDep, current_user: CurrentUser, skip: int = 0, limit: int = 100
+async def read_items(
+    session: AsyncSessionDep,
+    current_user: CurrentUser,
+    response: Response,
+    skip: int = 0,
+    limit: int = Query(default=100, ge=1),
+    cursor: str | None = None,
+    approximate: bool = False,
+    q: str | None = Query(default=None, max_length=255),
+    if_none_match: IfNoneMatch = None,
 ) -> Any:
     """
-    Retrieve items.
+    Retrieve items, ordered by id, or by relevance when searching with `q`.
+
+    Pass the `next_cursor` of a page as `cursor` to get the next one: every
+    page then costs the same, however deep. `skip` is kept for compatibility.
+    With `approximate`, a superuser's total count is the planner's estimate.
+    Send a page's ETag back in If-None-Match to get a 304 Not Modified while
+    the page is unchanged.
     """
+    search = None
+    if q and q.strip():
+        search = crud.item_search(q, session.bind.dialect.name)
 
-    if current_user.is_superuser:
-        count_statement = select(func.count()).select_from(Item)
-        count = session.exec(count_statement).one()
-        statement = select(Item).offset(skip).limit(limit)
-        items = session.exec(statement).all()
-    else:
-        count_statement = (
-            select(func.count())
-            .select_from(Item)
-            .where(Item.owner_id == current_user.id)
-        )
-        count = session.exec(count_statement).one()
-        statement = (
-            select(Item)
-            .where(Item.owner_id == current_user.id)
-            .offset(skip)
-            .limit(limit)
+    after_id = None
+    after_rank = None
+    if cursor:
+        if skip:
+            raise HTTPException(status_code=400, detail="Use either skip or cursor")
+        try:
+            values = decode_cursor(cursor)
+            after_id = uuid.UUID(values["id"])
+            if search is not None:
+                after_rank = float(values["rank"])
+        except (ValueError, KeyError, TypeError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    owner_id = None if current_user.is_superuser else current_user.id
+    # The page's ids and versions are read first, so an unchanged page is
+    # answered without loading its items; one extra row tells whether there
+    # is a next page
+    rows: list[tuple[uuid.UUID, int, float | None]]
+    if search is not None:
+        condition, rank = search
+        # Ranked first, then by id, which keeps the order stable across pages
+        ranked = (
+            select(col(Item.id), col(Item.version), rank)
+            .where(condition)
+            .order_by(rank.desc(), col(Item.id))
         )
-        items = session.exec(statement).all()
+        if after_rank is not None:
+            ranked = ranked.where(
+                or_(
+                    rank < after_rank, and_(rank == after_rank, col(Item.id) > after_id)
+                )
+            )
+        if owner_id is not None:
+            ranked = ranked.where(Item.owner_id == owner_id)
+        ranked_rows = (await session.exec(ranked.offset(skip).limit(limit + 1))).all()
+        rows = [
+            (item_id, version, item_rank) for item_id, version, item_rank in ranked_rows
+        ]
+    else:
+        plain = select(col(Item.id), col(Item.version)).order_by(col(Item.id))
+        if after_id is not None:
+            plain = plain.where(col(Item.id) > after_id)
+        if owner_id is not None:
+            plain = plain.where(Item.owner_id == owner_id)
+        plain_rows = (await session.exec(plain.offset(skip).limit(limit + 1))).all()
+        rows = [(item_id, version, None) for item_id, version in plain_rows]
+
+    count = None
+    if after_id is None:
+        if search is None:
+            count = await async_crud.count_items(
+                session=session, owner_id=owner_id, approximate=approximate
+            )
+        else:
+            count_statement = select(func.count()).select_from(Item).where(condition)
+            if owner_id is not None:
+                count_statement = count_statement.where(Item.owner_id == owner_id)
+            count = (await session.exec(count_statement)).one()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last_id, _, last_rank = rows[-1]
+        values = {"id": str(last_id)}
+        if search is not None:
+            values["rank"] = last_rank
+        next_cursor = encode_cursor(values)
+    versions = [(item_id, version) for item_id, version, _ in rows]
+    etag = make_etag(count, next_cursor, versions)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
+    ids = [item_id for item_id, _ in versions]
+    items: dict[uuid.UUID, Item] = {}
+    if ids:
+        items_statement = select(Item).where(col(Item.id).in_(ids))
+        items = {item.id: item for item in (await session.exec(items_statement)).all()}
+    # In page order, without any item deleted in between
+    page = [items[item_id] for item_id in ids if item_id in items]
+    set_cache_headers(
+        response,
+        make_etag(count, next_cursor, [(item.id, item.version) for item in page]),
+    )
+    return ItemsPublic(
+        data=[ItemPublic.model_validate(item) for item in page],
+        count=count,
+        next_cursor=next_cursor,
+    )
+
+
+@router.post("/bulk", response_model=ItemsBulkResult)
+async def create_items(
+    *, session: AsyncSessionDep, current_user: CurrentUser, items_in: ItemsBulkCreate
+) -> Any:
+    """
+    Create items in one transaction.
+    """
+    check_bulk_size(len(items_in.items))
+    items = await async_crud.create_items(
+        session=session, items_in=items_in.items, owner_id=current_user.id
+    )
+    return ItemsBulkResult(
+        results=[
+            ItemBulkResult(
+                index=index, id=item.id, item=ItemPublic.model_validate(item)
+            )
+            for index, item in enumerate(items)
+        ]
+    )
+
+
+@router.patch("/bulk", response_model=ItemsBulkResult)
+async def update_items(
+    *, session: AsyncSessionDep, current_user: CurrentUser, items_in: ItemsBulkUpdate
+) -> Any:
+    """
+    Update items in one transaction.
+
+    Rows that can't be applied (unknown item, someone else's item) get an
+    `error`; the others are updated.
+    """
+    check_bulk_size(len(items_in.items))
+    results = await async_crud.update_items(
+        session=session,
+        items_in=items_in.items,
+        owner_id=None if current_user.is_superuser else current_user.id,
+    )
+    return ItemsBulkResult(results=results)
+
+
+@router.delete("/bulk", response_model=ItemsBulkResult)
+async def delete_items(
+    *, session: AsyncSessionDep, current_user: CurrentUser, items_in: ItemsBulkDelete
+) -> Any:
+    """
+    Delete items in one transaction.
+
+    Rows that can't be applied (unknown item, someone else's item) get an
+    `error`; the others are deleted.
+    """
+    check_bulk_size(len(items_in.ids))
+    results = await async_crud.delete_items(
+        session=session,
+        ids=items_in.ids,
+        owner_id=None if current_user.is_superuser else current_user.id,
+    )
+    return ItemsBulkResult(results=results)
+
+
+@router.post(
+    "/import",
+    response_model=ItemsImportResult,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "description": "CSV with a `title,description` header, or one JSON item per line",
+            "content": {
+                content_type: {"schema": {"type": "string"}}
+                for content_type in IMPORT_CONTENT_TYPES
+            },
+        }
+    },
+)
+async def import_items(
+    request: Request, session: AsyncSessionDep, current_user: CurrentUser
+) -> Any:
+    """
+    Import items from a CSV or NDJSON upload, with Postgres COPY.
 
-    return ItemsPublic(data=items, count=count)
+    The upload is parsed and written as it arrives, so it can be as large as
+    needed. Invalid rows are skipped and reported by line number.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type not in IMPORT_CONTENT_TYPES:
+        raise HTTPException(
+            status_code=415,
+            detail=f"Upload {' or '.join(IMPORT_CONTENT_TYPES)}",
+        )
+    errors: list[ItemImportError] = []
+    imported = await async_crud.import_items(
+        session=session,
+        items_in=parse_import(read_lines(request), content_type, errors),
+        owner_id=current_user.id,
+    )
+    return ItemsImportResult(imported=imported, errors=errors)
 
 
 @router.get("/{id}", response_model=ItemPublic)
-def read_item(session: SessionDep, current_user: CurrentUser, id: uuid.UUID) -> Any:
+async def read_item(
+    session: AsyncSessionDep,
+    current_user: CurrentUser,
+    response: Response,
+    id: uuid.UUID,
+    if_none_match: IfNoneMatch = None,
+) -> Any:
     """
     Get item by ID.
+
+    Send the response's ETag back in If-None-Match to get a 304 Not Modified
+    while the item is unchanged.
     """
-    item = session.get(Item, id)
-    if not item:
+    # Owner and version only: an unchanged item is answered without loading it
+    statement = select(Item.owner_id, Item.version).where(Item.id == id)
+    row = (await session.exec(statement)).first()
+    if not row:
         raise HTTPException(status_code=404, detail="Item not found")
-    if not current_user.is_superuser and (item.owner_id != current_user.id):
+    owner_id, version = row
+    if not current_user.is_superuser and (owner_id != current_user.id):
         raise HTTPException(status_code=400, detail="Not enough permissions")
+    etag = make_etag(id, version)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
+    item = await session.get(Item, id)
+    if not item:
+        raise HTTPException(status_code=404, detail="Item not found")
+    set_cache_headers(response, make_etag(item.id, item.version))
     return item
 
 
 @router.post("/", response_model=ItemPublic)
-def create_item(
-    *, session: SessionDep, current_user: CurrentUser, item_in: ItemCreate
+async def create_item(
+    *, session: AsyncSessionDep, current_user: CurrentUser, item_in: ItemCreate
 ) -> Any:
     """
     Create new item.
     """
     item = Item.model_validate(item_in, update={"owner_id": current_user.id})
     session.add(item)
-    session.commit()
-    session.refresh(item)
+    await session.execute(counters.change_item_count(current_user.id, 1))
+    await session.commit()
+    await session.refresh(item)
     return item
 
 
 @router.put("/{id}", response_model=ItemPublic)
-def update_item(
+async def update_item(
     *,
-    session: SessionDep,
+    session: AsyncSessionDep,
     current_user: CurrentUser,
     id: uuid.UUID,
     item_in: ItemUpdate,
@@ -79,31 +375,34 @@ def update_item(
     """
     Update an item.
     """
-    item = session.get(Item, id)
+    item = await session.get(Item, id)
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
     if not current_user.is_superuser and (item.owner_id != current_user.id):
         raise HTTPException(status_code=400, detail="Not enough permissions")
     update_dict = item_in.model_dump(exclude_unset=True)
     item.sqlmodel_update(update_dict)
+    # Incremented in SQL, so concurrent updates never get the same version
+    item.version = Item.version + 1
     session.add(item)
-    session.commit()
-    session.refresh(item)
+    await session.commit()
+    await session.refresh(item)
     return item
 
 
 @router.delete("/{id}")
-def delete_item(
-    session: SessionDep, current_user: CurrentUser, id: uuid.UUID
+async def delete_item(
+    session: AsyncSessionDep, current_user: CurrentUser, id: uuid.UUID
 ) -> Message:
     """
     Delete an item.
     """
-    item = session.get(Item, id)
+    item = await session.get(Item, id)
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
     if not current_user.is_superuser and (item.owner_id != current_user.id):
         raise HTTPException(status_code=400, detail="Not enough permissions")
-    session.delete(item)
-    session.commit()
+    await session.delete(item)
+    await session.execute(counters.change_item_count(item.owner_id, -1))
+    await session.commit()
     return Message(message="Item deleted successfully")
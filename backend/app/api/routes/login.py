@@ -1,16 +1,32 @@
-from datetime import timedelta
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
 from typing import Annotated, Any
 
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import HTMLResponse
 from fastapi.security import OAuth2PasswordRequestForm
 
-from app import crud
-from app.api.deps import CurrentUser, SessionDep, get_current_active_superuser
+from app import async_crud
+from app.api.deps import (
+    AsyncSessionDep,
+    CachedUser,
+    decode_token,
+    get_current_active_superuser,
+)
 from app.core import security
 from app.core.config import settings
-from app.core.security import get_password_hash
-from app.models import Message, NewPassword, Token, UserPublic
+from app.core.security import aget_password_hash
+from app.core.user_cache import user_cache
+from app.models import (
+    Message,
+    NewPassword,
+    RefreshTokenRequest,
+    Token,
+    TokenPayload,
+    User,
+    UserPublic,
+)
 from app.utils import (
     generate_password_reset_token,
     generate_reset_password_email,
@@ -21,30 +37,95 @@ from app.utils import (
 router = APIRouter(tags=["login"])
 
 
+def issue_tokens(user: User) -> Token:
+    if not settings.JWT_STATELESS_CLAIMS:
+        access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+        return Token(
+            access_token=security.create_access_token(
+                user.id, expires_delta=access_token_expires
+            )
+        )
+    claims = {
+        "email": user.email,
+        "full_name": user.full_name,
+        "is_active": user.is_active,
+        "is_superuser": user.is_superuser,
+    }
+    return Token(
+        access_token=security.create_access_token(
+            user.id,
+            expires_delta=timedelta(
+                minutes=settings.STATELESS_ACCESS_TOKEN_EXPIRE_MINUTES
+            ),
+            claims=claims,
+        ),
+        refresh_token=security.create_refresh_token(
+            user.id, expires_delta=timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+        ),
+    )
+
+
 @router.post("/login/access-token")
-def login_access_token(
-    session: SessionDep, form_data: Annotated[OAuth2PasswordRequestForm, Depends()]
+async def login_access_token(
+    session: AsyncSessionDep, form_data: Annotated[OAuth2PasswordRequestForm, Depends()]
 ) -> Token:
     """
     OAuth2 compatible token login, get an access token for future requests
     """
-    user = crud.authenticate(
+    user = await async_crud.authenticate(
         session=session, email=form_data.username, password=form_data.password
     )
     if not user:
         raise HTTPException(status_code=400, detail="Incorrect email or password")
     elif not user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    return Token(
-        access_token=security.create_access_token(
-            user.id, expires_delta=access_token_expires
-        )
-    )
+    return issue_tokens(user)
+
+
+@router.post("/login/refresh-token")
+async def refresh_access_token(
+    session: AsyncSessionDep, body: RefreshTokenRequest
+) -> Token:
+    """
+    Exchange a refresh token for a new access token and refresh token
+    """
+    if not settings.JWT_STATELESS_CLAIMS:
+        raise HTTPException(status_code=400, detail="Refresh tokens are not enabled")
+    payload = decode_token(body.refresh_token)
+    token_data = TokenPayload(**payload)
+    try:
+        user_id = uuid.UUID(token_data.sub)
+    except (TypeError, ValueError):
+        user_id = None
+    if token_data.type != "refresh" or not token_data.jti or user_id is None:
+        raise HTTPException(status_code=403, detail="Could not validate credentials")
+    # Checked against the database: refreshing is rare, and a revoked
+    # refresh token must never be accepted late
+    if await async_crud.is_refresh_token_revoked(
+        session=session,
+        jti=token_data.jti,
+        user_id=user_id,
+        issued_at=token_data.iat or 0.0,
+    ):
+        raise HTTPException(status_code=403, detail="Token has been revoked")
+    user = await session.get(User, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    if not user.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    # Refresh tokens are single use: of concurrent refreshes, only the one
+    # that revokes the token gets new ones
+    if not await async_crud.revoke_token(
+        session=session,
+        jti=token_data.jti,
+        expires_at=datetime.fromtimestamp(payload["exp"], timezone.utc),
+    ):
+        raise HTTPException(status_code=403, detail="Token has been revoked")
+    return issue_tokens(user)
 
 
 @router.post("/login/test-token", response_model=UserPublic)
-def test_token(current_user: CurrentUser) -> Any:
+async def test_token(current_user: CachedUser) -> Any:
     """
     Test access token
     """
@@ -52,11 +133,11 @@ def test_token(current_user: CurrentUser) -> Any:
 
 
 @router.post("/password-recovery/{email}")
-def recover_password(email: str, session: SessionDep) -> Message:
+async def recover_password(email: str, session: AsyncSessionDep) -> Message:
     """
     Password Recovery
     """
-    user = crud.get_user_by_email(session=session, email=email)
+    user = await async_crud.get_user_by_email(session=session, email=email)
 
     if not user:
         raise HTTPException(
@@ -67,7 +148,9 @@ def recover_password(email: str, session: SessionDep) -> Message:
     email_data = generate_reset_password_email(
         email_to=user.email, email=email, token=password_reset_token
     )
-    send_email(
+    # SMTP is blocking: keep it off the event loop
+    await asyncio.to_thread(
+        send_email,
         email_to=user.email,
         subject=email_data.subject,
         html_content=email_data.html_content,
@@ -76,14 +159,14 @@ def recover_password(email: str, session: SessionDep) -> Message:
 
 
 @router.post("/reset-password/")
-def reset_password(session: SessionDep, body: NewPassword) -> Message:
+async def reset_password(session: AsyncSessionDep, body: NewPassword) -> Message:
     """
     Reset password
     """
     email = verify_password_reset_token(token=body.token)
     if not email:
         raise HTTPException(status_code=400, detail="Invalid token")
-    user = crud.get_user_by_email(session=session, email=email)
+    user = await async_crud.get_user_by_email(session=session, email=email)
     if not user:
         raise HTTPException(
             status_code=404,
@@ -91,10 +174,12 @@ def reset_password(session: SessionDep, body: NewPassword) -> Message:
         )
     elif not user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
-    hashed_password = get_password_hash(password=body.new_password)
+    hashed_password = await aget_password_hash(body.new_password)
     user.hashed_password = hashed_password
     session.add(user)
-    session.commit()
+    await session.commit()
+    user_cache.invalidate_user(user.id)
+    await async_crud.revoke_user_tokens(session=session, user_id=user.id)
     return Message(message="Password updated successfully")
 
 
@@ -103,11 +188,11 @@ def reset_password(session: SessionDep, body: NewPassword) -> Message:
     dependencies=[Depends(get_current_active_superuser)],
     response_class=HTMLResponse,
 )
-def recover_password_html_content(email: str, session: SessionDep) -> Any:
+async def recover_password_html_content(email: str, session: AsyncSessionDep) -> Any:
     """
     HTML Content for Password Recovery
     """
-    user = crud.get_user_by_email(session=session, email=email)
+    user = await async_crud.get_user_by_email(session=session, email=email)
 
     if not user:
         raise HTTPException(
@@ -4,6 +4,7 @@ from fastapi import APIRouter
 from pydantic import BaseModel
 
 from app.api.deps import SessionDep
+from app.core import counters
 from app.core.security import get_password_hash
 from app.models import (
     User,
@@ -33,6 +34,7 @@ def create_user(user_in: PrivateUserCreate, session: SessionDep) -> Any:
     )
 
     session.add(user)
+    session.execute(counters.change_row_count(counters.USER_COUNT, 1))
     session.commit()
 
     return user
@@ -1,18 +1,171 @@
+import json
+import logging
+import uuid
+from collections.abc import AsyncIterator, Iterator
+from datetime import datetime
 from typing import Any
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from sqlmodel import Session, col, select
+from starlette.background import BackgroundTask
 
-from app.api.deps import CurrentUser
-from app.models import ProposalGeneratorInput, ProposalGeneratorOutput, Message
-from app.services.proposal_generator import generate_proposal, ProposalGenerationError
+from app import crud
+from app.api.deps import CachedUser, SessionDep, get_current_active_superuser
+from app.core.config import settings
+from app.core.db import engine
+from app.core.webhooks import WebhookURLError, check_webhook_url
+from app.models import (
+    Proposal,
+    ProposalBatchInput,
+    ProposalBatchItemResult,
+    ProposalBatchOutput,
+    ProposalCreate,
+    ProposalGeneratorInput,
+    ProposalGeneratorOutput,
+    ProposalJob,
+    ProposalJobCreate,
+    ProposalJobPublic,
+    ProposalPromptPreview,
+    ProposalPublic,
+    ProposalServiceStats,
+    ProposalsPublic,
+)
+from app.services.proposal_generator import (
+    ProposalGenerationError,
+    ProposalRateLimitError,
+    generate_proposal,
+    generate_proposals_batch,
+    get_proposal_service_stats,
+    preview_proposal_prompt,
+    stream_proposal,
+)
+from app.utils import decode_cursor, encode_cursor
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/proposals", tags=["proposals"])
 
+# Rows fetched per round trip by the export's server-side cursor
+EXPORT_BATCH_SIZE = 500
+
+
+def _to_history(
+    proposal_input: ProposalGeneratorInput, output: ProposalGeneratorOutput
+) -> list[ProposalCreate]:
+    return [
+        ProposalCreate(
+            job_title=proposal_input.job_title,
+            proposal_text=output.proposal_text,
+            # The backend that served it, which may be a fallback model
+            model=output.model_used
+            or proposal_input.model
+            or settings.DEFAULT_LLM_MODEL,
+            input=proposal_input.model_dump(mode="json"),
+            # The cache and in-flight calls are shared between users, so a
+            # reused proposal may have been saved for someone else only
+            reused=output.cached,
+        )
+    ]
+
+
+def _save_history(owner_id: uuid.UUID, proposals_in: list[ProposalCreate]) -> None:
+    """
+    Save generated proposals to the owner's history.
+
+    Runs as a background task after the response is sent, with its own
+    session, so no database connection is held while the AI provider is
+    called. A failure here must not affect the (already delivered) response.
+    """
+    if not proposals_in:
+        return
+    try:
+        with Session(engine) as session:
+            crud.create_proposals(
+                session=session, proposals_in=proposals_in, owner_id=owner_id
+            )
+    except Exception:
+        logger.exception("Failed to save proposal history")
+
+
+@router.get("/", response_model=ProposalsPublic)
+def read_proposals(
+    session: SessionDep,
+    current_user: CachedUser,
+    cursor: str | None = None,
+    limit: int = Query(default=20, ge=1, le=100),
+) -> Any:
+    """
+    List your generated proposals, newest first.
+
+    Pass the `next_cursor` of a page as `cursor` to get the next one.
+    """
+    after = None
+    if cursor:
+        try:
+            values = decode_cursor(cursor)
+            after = (
+                datetime.fromisoformat(values["created_at"]),
+                uuid.UUID(values["id"]),
+            )
+        except (ValueError, KeyError, TypeError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    proposals, has_more = crud.get_proposals_page(
+        session=session, owner_id=current_user.id, limit=limit, after=after
+    )
+    next_cursor = None
+    if has_more:
+        last = proposals[-1]
+        next_cursor = encode_cursor(
+            {"created_at": last.created_at.isoformat(), "id": str(last.id)}
+        )
+    return ProposalsPublic(
+        data=[ProposalPublic.model_validate(proposal) for proposal in proposals],
+        next_cursor=next_cursor,
+    )
+
+
+@router.get(
+    "/export",
+    response_class=StreamingResponse,
+    responses={
+        200: {
+            "description": "Every proposal in your history, one JSON object per line, oldest first",
+            "content": {"application/x-ndjson": {}},
+        },
+    },
+)
+def export_proposals(current_user: CachedUser) -> StreamingResponse:
+    """
+    Download your whole proposal history as NDJSON.
+
+    Rows are read through a server-side cursor and streamed as they arrive, so
+    the export runs in constant memory however large the history is.
+    """
+    owner_id = current_user.id
+
+    def ndjson_rows() -> Iterator[str]:
+        statement = (
+            select(Proposal)
+            .where(Proposal.owner_id == owner_id)
+            .order_by(col(Proposal.created_at), col(Proposal.id))
+            .execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        with Session(engine) as session:
+            for proposal in session.exec(statement):
+                yield ProposalPublic.model_validate(proposal).model_dump_json() + "\n"
+
+    return StreamingResponse(
+        ndjson_rows(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="proposals.ndjson"'},
+    )
+
 
 @router.post(
-    "/generate", 
-    response_model=ProposalGeneratorOutput,
+    "/generate",
+    response_model=ProposalGeneratorOutput | ProposalPromptPreview,
     status_code=status.HTTP_200_OK,
     responses={
         200: {
@@ -21,14 +174,16 @@ router = APIRouter(prefix="/proposals", tags=["proposals"])
                 "application/json": {
                     "example": {
                         "proposal_text": "Hi there, I noticed your job posting for a Python Developer and I'm excited about the opportunity to build a robust web scraper for your project. With 5+ years of Python experience and expertise in BeautifulSoup and Scrapy, I've successfully delivered similar web scraping solutions for clients in various industries.\n\nI'd approach your project by first understanding the specific data points you need to extract, then designing a scalable scraper that respects website policies and handles different edge cases gracefully. My implementations typically include proper error handling, rate limiting, and data cleaning to ensure you get high-quality results.\n\nI'm particularly interested in learning more about your specific use case - are you looking to scrape data on a recurring schedule or as a one-time extraction? This would help me recommend the most appropriate architecture for your needs.\n\nI'm available to start immediately and can deliver an initial working prototype within the first week. Let me know if you'd like to discuss your requirements in more detail.\n\nLooking forward to potentially working together!\n\nBest regards,\n[Your Name]",
-                        "generation_time": "2023-03-20T12:34:56.789Z"
+                        "generation_time": "2023-03-20T12:34:56.789Z",
                     }
                 }
-            }
+            },
         },
         401: {
             "description": "Unauthorized",
-            "content": {"application/json": {"example": {"detail": "Not authenticated"}}}
+            "content": {
+                "application/json": {"example": {"detail": "Not authenticated"}}
+            },
         },
         422: {
             "description": "Validation Error",
@@ -39,51 +194,321 @@ router = APIRouter(prefix="/proposals", tags=["proposals"])
                             {
                                 "loc": ["body", "job_title"],
                                 "msg": "field required",
-                                "type": "value_error.missing"
+                                "type": "value_error.missing",
                             }
                         ]
                     }
                 }
-            }
+            },
         },
         500: {
             "description": "Internal Server Error",
             "content": {
                 "application/json": {
-                    "example": {"detail": "Error generating proposal: Failed to connect to AI service provider"}
+                    "example": {
+                        "detail": "Error generating proposal: Failed to connect to AI service provider"
+                    }
+                }
+            },
+        },
+        503: {
+            "description": "AI provider is rate limiting or overloaded",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "detail": "Error generating proposal: AI provider is busy, please retry shortly"
+                    }
                 }
-            }
-        }
-    }
+            },
+        },
+    },
 )
 async def generate_proposal_endpoint(
     *,
-    current_user: CurrentUser,
+    current_user: CachedUser,
+    background_tasks: BackgroundTasks,
     proposal_input: ProposalGeneratorInput,
+    fresh: bool = False,
+    dry_run: bool = False,
 ) -> Any:
     """
     Generate a personalized Upwork proposal based on job details.
-    
+
     This endpoint uses AI to create a customized proposal for a job posting based on:
-    - The job title and description 
+    - The job title and description
     - Your relevant skills
     - Optional additional context about your experience
-    
+
     The generated proposal will:
     - Be professionally written and personalized to match the job requirements
     - Highlight your skills relevant to the specific job
     - Include engagement elements to increase response rates
     - Be properly formatted and ready to submit
-    
+
+    Identical requests are answered from a short-lived cache; pass `fresh=true`
+    to skip it and get a new variant.
+
+    Very long job descriptions and context are trimmed to fit the prompt token
+    budget. Pass `dry_run=true` to get the rendered prompt and its estimated
+    token counts instead, without calling the AI provider.
+
+    Proposals are saved to your history (`GET /proposals/`); a cached or
+    coalesced one only if it isn't there already.
+
     **Rate limits may apply** depending on your subscription level.
-    
+
     **Authentication required**: Only authenticated users can access this endpoint.
     """
     try:
-        result = await generate_proposal(proposal_input)
+        if dry_run:
+            return preview_proposal_prompt(proposal_input)
+        result = await generate_proposal(proposal_input, fresh=fresh)
+        background_tasks.add_task(
+            _save_history, current_user.id, _to_history(proposal_input, result)
+        )
         return result
+    except ProposalRateLimitError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Error generating proposal: {str(e)}",
+            headers={"Retry-After": "30"},
+        )
     except ProposalGenerationError as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error generating proposal: {str(e)}"
-        ) 
\ No newline at end of file
+            detail=f"Error generating proposal: {str(e)}",
+        )
+
+
+def _sse_event(event: str, data: Any) -> str:
+    """Format a single Server-Sent Event frame."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post(
+    "/generate/stream",
+    response_class=StreamingResponse,
+    responses={
+        200: {
+            "description": "Server-Sent Events stream of the proposal as it is generated",
+            "content": {
+                "text/event-stream": {
+                    "example": (
+                        'event: token\ndata: {"text": "Hi there, "}\n\n'
+                        'event: token\ndata: {"text": "I noticed your job posting..."}\n\n'
+                        'event: done\ndata: {"proposal_text": "Hi there, I noticed your job posting...", '
+                        '"generation_time": "2023-03-20T12:34:56.789Z"}\n\n'
+                    )
+                }
+            },
+        },
+        401: {
+            "description": "Unauthorized",
+            "content": {
+                "application/json": {"example": {"detail": "Not authenticated"}}
+            },
+        },
+        422: {"description": "Validation Error"},
+    },
+)
+async def generate_proposal_stream_endpoint(
+    *,
+    current_user: CachedUser,
+    proposal_input: ProposalGeneratorInput,
+    fresh: bool = False,
+) -> StreamingResponse:
+    """
+    Generate a personalized Upwork proposal and stream it as Server-Sent Events.
+
+    Accepts the same input as `/proposals/generate`. The response is a
+    `text/event-stream` with the following events:
+    - `token`: `{"text": "..."}` for every chunk of text as the model produces it
+    - `done`: the assembled proposal, in the same shape as `/proposals/generate`
+    - `error`: `{"detail": "..."}` if generation fails after the stream has started
+
+    A cached proposal is sent as a single `token` event; pass `fresh=true` to skip the cache.
+
+    **Authentication required**: Only authenticated users can access this endpoint.
+    """
+    history: list[ProposalCreate] = []
+
+    async def event_stream() -> AsyncIterator[str]:
+        try:
+            async for event in stream_proposal(proposal_input, fresh=fresh):
+                if isinstance(event, ProposalGeneratorOutput):
+                    history.extend(_to_history(proposal_input, event))
+                    yield _sse_event("done", event.model_dump(mode="json"))
+                else:
+                    yield _sse_event("token", {"text": event})
+        except ProposalGenerationError as e:
+            yield _sse_event(
+                "error", {"detail": f"Error generating proposal: {str(e)}"}
+            )
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(_save_history, current_user.id, history),
+    )
+
+
+@router.post(
+    "/generate/batch",
+    response_model=ProposalBatchOutput,
+    responses={
+        200: {
+            "description": "Per-job results, or NDJSON lines in completion order when `stream=true`",
+            "content": {
+                "application/x-ndjson": {
+                    "example": (
+                        '{"index": 1, "output": {"proposal_text": "Hi there...", "generation_time": "2023-03-20T12:34:56.789Z"}, "error": null}\n'
+                        '{"index": 0, "output": null, "error": "Error generating proposal: Failed to connect to AI service provider"}\n'
+                    )
+                }
+            },
+        },
+        400: {
+            "description": "Batch too large",
+            "content": {
+                "application/json": {
+                    "example": {"detail": "A batch can contain at most 50 jobs"}
+                }
+            },
+        },
+        401: {
+            "description": "Unauthorized",
+            "content": {
+                "application/json": {"example": {"detail": "Not authenticated"}}
+            },
+        },
+        422: {"description": "Validation Error"},
+    },
+)
+async def generate_proposal_batch_endpoint(
+    *,
+    current_user: CachedUser,
+    background_tasks: BackgroundTasks,
+    batch_input: ProposalBatchInput,
+    fresh: bool = False,
+    stream: bool = False,
+) -> Any:
+    """
+    Generate proposals for several jobs in one request.
+
+    Jobs are generated concurrently, up to `concurrency` at a time (capped by the
+    server). A failing job doesn't fail the batch: each result carries either an
+    `output` or an `error`.
+
+    With `stream=true` the response is NDJSON, one result per line in the order the
+    jobs finish; otherwise results are returned together, ordered by `index`.
+
+    **Authentication required**: Only authenticated users can access this endpoint.
+    """
+    if len(batch_input.items) > settings.PROPOSAL_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"A batch can contain at most {settings.PROPOSAL_BATCH_MAX_ITEMS} jobs",
+        )
+    concurrency = min(
+        batch_input.concurrency or settings.PROPOSAL_BATCH_MAX_CONCURRENCY,
+        settings.PROPOSAL_BATCH_MAX_CONCURRENCY,
+    )
+    results = generate_proposals_batch(
+        batch_input.items, concurrency=concurrency, fresh=fresh
+    )
+
+    history: list[ProposalCreate] = []
+
+    def to_item_result(index: int, result: Any) -> ProposalBatchItemResult:
+        if isinstance(result, ProposalGenerationError):
+            return ProposalBatchItemResult(
+                index=index, error=f"Error generating proposal: {str(result)}"
+            )
+        history.extend(_to_history(batch_input.items[index], result))
+        return ProposalBatchItemResult(index=index, output=result)
+
+    if stream:
+
+        async def ndjson_stream() -> AsyncIterator[str]:
+            async for index, result in results:
+                yield to_item_result(index, result).model_dump_json() + "\n"
+
+        return StreamingResponse(
+            ndjson_stream(),
+            media_type="application/x-ndjson",
+            background=BackgroundTask(_save_history, current_user.id, history),
+        )
+
+    items = [to_item_result(index, result) async for index, result in results]
+    background_tasks.add_task(_save_history, current_user.id, history)
+    return ProposalBatchOutput(results=sorted(items, key=lambda item: item.index))
+
+
+@router.get(
+    "/stats",
+    dependencies=[Depends(get_current_active_superuser)],
+    response_model=ProposalServiceStats,
+)
+def read_proposal_stats() -> Any:
+    """
+    Get proposal generator runtime statistics for this worker process.
+    """
+    return ProposalServiceStats(**get_proposal_service_stats())
+
+
+@router.post(
+    "/jobs",
+    response_model=ProposalJobPublic,
+    status_code=status.HTTP_202_ACCEPTED,
+    responses={
+        401: {
+            "description": "Unauthorized",
+            "content": {
+                "application/json": {"example": {"detail": "Not authenticated"}}
+            },
+        },
+        422: {"description": "Validation Error"},
+    },
+)
+def create_proposal_job(
+    *,
+    session: SessionDep,
+    current_user: CachedUser,
+    job_in: ProposalJobCreate,
+    fresh: bool = False,
+) -> Any:
+    """
+    Queue a proposal generation and return its job id immediately.
+
+    Accepts the same body as `/generate`, plus an optional `webhook_url`. The
+    job is processed by a proposal worker; poll `GET /proposals/jobs/{id}`
+    for the result. If a webhook URL is given, the finished job is POSTed to
+    it as JSON; it must be https and resolve to a public address.
+
+    **Authentication required**: Only authenticated users can access this endpoint.
+    """
+    if job_in.webhook_url is not None:
+        try:
+            check_webhook_url(str(job_in.webhook_url))
+        except WebhookURLError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+    job = crud.create_proposal_job(
+        session=session, job_in=job_in, owner_id=current_user.id, fresh=fresh
+    )
+    return ProposalJobPublic.from_job(job)
+
+
+@router.get("/jobs/{id}", response_model=ProposalJobPublic)
+def read_proposal_job(
+    session: SessionDep, current_user: CachedUser, id: uuid.UUID
+) -> Any:
+    """
+    Get the status of a proposal job, and its output once it has succeeded.
+    """
+    job = session.get(ProposalJob, id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Proposal job not found")
+    if not current_user.is_superuser and (job.owner_id != current_user.id):
+        raise HTTPException(status_code=400, detail="Not enough permissions")
+    return ProposalJobPublic.from_job(job)
@@ -1,8 +1,11 @@
+from typing import Any
+
 from fastapi import APIRouter, Depends
 from pydantic.networks import EmailStr
 
 from app.api.deps import get_current_active_superuser
-from app.models import Message
+from app.core.db import get_pool_stats
+from app.models import DatabasePoolStats, Message
 from app.utils import generate_test_email, send_email
 
 router = APIRouter(prefix="/utils", tags=["utils"])
@@ -26,6 +29,18 @@ def test_email(email_to: EmailStr) -> Message:
     return Message(message="Test email sent")
 
 
+@router.get(
+    "/db-pool-stats/",
+    dependencies=[Depends(get_current_active_superuser)],
+    response_model=list[DatabasePoolStats],
+)
+def read_db_pool_stats() -> Any:
+    """
+    Get connection pool metrics of the sync and async engines for this worker process.
+    """
+    return get_pool_stats()
+
+
 @router.get("/health-check/")
 async def health_check() -> bool:
     return True
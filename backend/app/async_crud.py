@@ -0,0 +1,352 @@
+"""Async versions of the crud functions used by the API routes.
+
+They mirror app.crud, which stays synchronous for Alembic, scripts, the
+proposal worker and tests.
+"""
+
+import uuid
+from collections import Counter
+from collections.abc import AsyncIterable
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from sqlalchemy import delete, insert, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlmodel import col, or_, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core import counters
+from app.core.config import settings
+from app.core.security import aget_password_hash, averify_and_update_password
+from app.core.token_revocation import revocation_list
+from app.core.user_cache import user_cache
+from app.models import (
+    Item,
+    ItemBulkResult,
+    ItemBulkUpdate,
+    ItemCreate,
+    ItemPublic,
+    RevokedToken,
+    User,
+    UserCreate,
+    UserUpdate,
+)
+
+
+async def create_user(*, session: AsyncSession, user_create: UserCreate) -> User:
+    db_obj = User.model_validate(
+        user_create,
+        update={"hashed_password": await aget_password_hash(user_create.password)},
+    )
+    session.add(db_obj)
+    await session.execute(counters.change_row_count(counters.USER_COUNT, 1))
+    await session.commit()
+    await session.refresh(db_obj)
+    return db_obj
+
+
+async def update_user(
+    *, session: AsyncSession, db_user: User, user_in: UserUpdate
+) -> Any:
+    user_data = user_in.model_dump(exclude_unset=True)
+    extra_data = {}
+    if "password" in user_data:
+        password = user_data["password"]
+        hashed_password = await aget_password_hash(password)
+        extra_data["hashed_password"] = hashed_password
+    db_user.sqlmodel_update(user_data, update=extra_data)
+    session.add(db_user)
+    await session.commit()
+    await session.refresh(db_user)
+    user_cache.invalidate_user(db_user.id)
+    # A new password or deactivation ends every session; other changes only
+    # need the claims in access tokens to be reissued
+    ends_sessions = "password" in user_data or user_data.get("is_active") is False
+    await revoke_user_tokens(
+        session=session, user_id=db_user.id, scope="all" if ends_sessions else "access"
+    )
+    return db_user
+
+
+async def get_user_by_email(*, session: AsyncSession, email: str) -> User | None:
+    statement = select(User).where(User.email == email)
+    session_user = (await session.exec(statement)).first()
+    return session_user
+
+
+async def authenticate(
+    *, session: AsyncSession, email: str, password: str
+) -> User | None:
+    db_user = await get_user_by_email(session=session, email=email)
+    if not db_user:
+        return None
+    verified, new_hash = await averify_and_update_password(
+        password, db_user.hashed_password
+    )
+    if not verified:
+        return None
+    if new_hash:
+        # Stored with a different bcrypt cost than configured: upgrade it
+        db_user.hashed_password = new_hash
+        session.add(db_user)
+        await session.commit()
+        await session.refresh(db_user)
+    return db_user
+
+
+async def create_items(
+    *, session: AsyncSession, items_in: list[ItemCreate], owner_id: uuid.UUID
+) -> list[ItemPublic]:
+    rows = [
+        {"id": uuid.uuid4(), "owner_id": owner_id, **item_in.model_dump()}
+        for item_in in items_in
+    ]
+    # A single executemany, sent as multi-row INSERTs
+    await session.execute(insert(Item), rows)
+    await session.execute(counters.change_item_count(owner_id, len(rows)))
+    await session.commit()
+    return [ItemPublic.model_validate(row) for row in rows]
+
+
+async def get_item_owners(
+    *, session: AsyncSession, ids: list[uuid.UUID]
+) -> dict[uuid.UUID, uuid.UUID]:
+    """Owners of the items that exist, by item id, in one query."""
+    statement = select(Item.id, Item.owner_id).where(col(Item.id).in_(ids))
+    return dict((await session.exec(statement)).all())
+
+
+def _bulk_item_error(
+    item_id: uuid.UUID,
+    owners: dict[uuid.UUID, uuid.UUID],
+    owner_id: uuid.UUID | None,
+    seen: set[uuid.UUID],
+) -> str | None:
+    if item_id in seen:
+        return "Duplicate item id"
+    seen.add(item_id)
+    if item_id not in owners:
+        return "Item not found"
+    if owner_id is not None and owners[item_id] != owner_id:
+        return "Not enough permissions"
+    return None
+
+
+async def update_items(
+    *,
+    session: AsyncSession,
+    items_in: list[ItemBulkUpdate],
+    owner_id: uuid.UUID | None,
+) -> list[ItemBulkResult]:
+    """
+    Update items, reporting an error for each row that can't be applied.
+
+    `owner_id` restricts the updates to that owner's items (None for a
+    superuser).
+    """
+    owners = await get_item_owners(
+        session=session, ids=[item_in.id for item_in in items_in]
+    )
+    results: list[ItemBulkResult] = []
+    rows: list[dict[str, Any]] = []
+    seen: set[uuid.UUID] = set()
+    for index, item_in in enumerate(items_in):
+        error = _bulk_item_error(item_in.id, owners, owner_id, seen)
+        values = item_in.model_dump(exclude_unset=True, exclude={"id"})
+        if error is None and "title" in values and values["title"] is None:
+            error = "Title can't be null"
+        results.append(ItemBulkResult(index=index, id=item_in.id, error=error))
+        if error is None and values:
+            rows.append({"id": item_in.id, **values})
+    if rows:
+        # Bulk UPDATE by primary key: one executemany per set of changed fields
+        await session.execute(update(Item), rows)
+        # Incremented in SQL, under the rows' locks, so concurrent updates
+        # never end up with the same version
+        await session.execute(
+            update(Item)
+            .where(col(Item.id).in_([row["id"] for row in rows]))
+            .values(version=Item.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+        await session.commit()
+
+    updated_ids = [result.id for result in results if result.error is None]
+    items = {
+        item.id: item
+        for item in (
+            await session.exec(select(Item).where(col(Item.id).in_(updated_ids)))
+        ).all()
+    }
+    for result in results:
+        if result.error is None:
+            item = items.get(result.id)  # type: ignore[arg-type]
+            if item is None:
+                result.error = "Item not found"
+            else:
+                result.item = ItemPublic.model_validate(item)
+    return results
+
+
+async def delete_items(
+    *, session: AsyncSession, ids: list[uuid.UUID], owner_id: uuid.UUID | None
+) -> list[ItemBulkResult]:
+    owners = await get_item_owners(session=session, ids=ids)
+    results: list[ItemBulkResult] = []
+    seen: set[uuid.UUID] = set()
+    for index, item_id in enumerate(ids):
+        error = _bulk_item_error(item_id, owners, owner_id, seen)
+        results.append(ItemBulkResult(index=index, id=item_id, error=error))
+
+    to_delete = [result.id for result in results if result.error is None]
+    if to_delete:
+        statement = (
+            delete(Item)
+            .where(col(Item.id).in_(to_delete))
+            .returning(col(Item.id), col(Item.owner_id))
+        )
+        deleted = dict((await session.execute(statement)).tuples().all())
+        # Counted from what was actually deleted, in a stable order
+        for deleted_owner_id, count in sorted(Counter(deleted.values()).items()):
+            await session.execute(counters.change_item_count(deleted_owner_id, -count))
+        await session.commit()
+        for result in results:
+            if result.error is None and result.id not in deleted:
+                result.error = "Item not found"
+    return results
+
+
+async def import_items(
+    *, session: AsyncSession, items_in: AsyncIterable[ItemCreate], owner_id: uuid.UUID
+) -> int:
+    """
+    Import items with COPY, as they are read; return how many were imported.
+
+    Rows are streamed to Postgres, so memory use doesn't grow with the size
+    of the import, and all of them are committed in one transaction.
+    """
+    connection = await session.connection()
+    raw_connection = await connection.get_raw_connection()
+    imported = 0
+    async with raw_connection.driver_connection.cursor() as cursor:  # type: ignore[union-attr]
+        async with cursor.copy(
+            "COPY item (id, owner_id, title, description) FROM STDIN"
+        ) as copy:
+            async for item_in in items_in:
+                await copy.write_row(
+                    (uuid.uuid4(), owner_id, item_in.title, item_in.description)
+                )
+                imported += 1
+    await session.execute(counters.change_item_count(owner_id, imported))
+    await session.commit()
+    return imported
+
+
+async def count_items(
+    *,
+    session: AsyncSession,
+    owner_id: uuid.UUID | None = None,
+    approximate: bool = False,
+) -> int:
+    """
+    Count an owner's items, or all items, from the maintained counters.
+
+    `approximate` reads the planner's estimate instead of summing every
+    owner's counter; an owner's count is always exact, it's one row anyway.
+    """
+    if approximate and owner_id is None:
+        estimate = await estimated_row_count(session=session, table_name="item")
+        if estimate is not None:
+            return estimate
+    return (await session.exec(counters.item_count(owner_id))).one()
+
+
+async def count_users(*, session: AsyncSession, approximate: bool = False) -> int:
+    if approximate:
+        estimate = await estimated_row_count(session=session, table_name="user")
+        if estimate is not None:
+            return estimate
+    return (await session.exec(counters.row_count(counters.USER_COUNT))).one()
+
+
+async def estimated_row_count(*, session: AsyncSession, table_name: str) -> int | None:
+    """The planner's row estimate, or None if the table was never analyzed."""
+    estimate = (await session.exec(counters.estimated_row_count(table_name))).first()
+    if estimate is None or estimate < 0:
+        return None
+    return estimate
+
+
+async def revoke_user_tokens(
+    *, session: AsyncSession, user_id: uuid.UUID, scope: str = "all"
+) -> None:
+    """
+    Revoke the stateless tokens of a user issued up to now.
+
+    With scope "access" the user's refresh tokens stay valid, so clients pick
+    up the changed claims on their next refresh. No-op unless
+    JWT_STATELESS_CLAIMS is set: other tokens are checked against the
+    database on every request anyway.
+    """
+    if not settings.JWT_STATELESS_CLAIMS:
+        return
+    now = datetime.now(timezone.utc)
+    if scope == "all":
+        expires_at = now + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+    else:
+        expires_at = now + timedelta(
+            minutes=settings.STATELESS_ACCESS_TOKEN_EXPIRE_MINUTES
+        )
+    revocation = RevokedToken(user_id=user_id, scope=scope, expires_at=expires_at)
+    # revoked_at is left to the database clock
+    statement = (
+        insert(RevokedToken)
+        .values(revocation.model_dump(exclude={"revoked_at"}))
+        .returning(col(RevokedToken.revoked_at))
+    )
+    revocation.revoked_at = (await session.execute(statement)).scalar_one()
+    await session.commit()
+    revocation_list.add(revocation)
+
+
+async def revoke_token(
+    *, session: AsyncSession, jti: str, expires_at: datetime
+) -> bool:
+    """
+    Revoke a token by its jti.
+
+    Returns False if it was already revoked, so callers racing to use a
+    single-use token can tell which one won.
+    """
+    revocation = RevokedToken(jti=jti, expires_at=expires_at)
+    statement = (
+        pg_insert(RevokedToken)
+        .values(revocation.model_dump(exclude={"revoked_at"}))
+        .on_conflict_do_nothing(index_elements=["jti"])
+        .returning(col(RevokedToken.revoked_at))
+    )
+    revoked_at = (await session.execute(statement)).scalar_one_or_none()
+    await session.commit()
+    if revoked_at is None:
+        return False
+    revocation.revoked_at = revoked_at
+    revocation_list.add(revocation)
+    return True
+
+
+async def is_refresh_token_revoked(
+    *, session: AsyncSession, jti: str, user_id: uuid.UUID, issued_at: float
+) -> bool:
+    """Check a refresh token against the database, not the synced list."""
+    statement = select(RevokedToken.id).where(
+        or_(
+            col(RevokedToken.jti) == jti,
+            (col(RevokedToken.user_id) == user_id)
+            & (col(RevokedToken.scope) == "all")
+            & (
+                col(RevokedToken.revoked_at)
+                >= datetime.fromtimestamp(issued_at, timezone.utc)
+            ),
+        )
+    )
+    return (await session.exec(statement)).first() is not None
@@ -0,0 +1,91 @@
+"""Batched last-used tracking for API keys.
+
+Writing last_used_at on every request would turn each authenticated read
+into a write. Instead, each process keeps the latest use of every key in
+memory and writes them all in one statement at most every
+API_KEY_USAGE_FLUSH_SECONDS, piggybacking on a request, and once more on
+shutdown. A crash loses at most that interval of usage times.
+"""
+
+import asyncio
+import logging
+import time
+from collections.abc import Callable
+from datetime import datetime, timezone
+
+from sqlalchemy import bindparam, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.models import ApiKey
+
+logger = logging.getLogger(__name__)
+
+
+class ApiKeyUsageTracker:
+    """Latest use of each API key (by prefix) since the last flush."""
+
+    def __init__(self, flush_interval_seconds: float = 60.0):
+        self.flush_interval_seconds = flush_interval_seconds
+        self._pending: dict[str, datetime] = {}
+        self._flushed_at = time.monotonic()
+        self._flush_lock = asyncio.Lock()
+        self.flushes = 0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def record(self, prefix: str) -> None:
+        self._pending[prefix] = datetime.now(timezone.utc)
+
+    async def flush(self, session: AsyncSession) -> int:
+        """Write the pending usage times; return how many keys were updated."""
+        pending, self._pending = self._pending, {}
+        self._flushed_at = time.monotonic()
+        if not pending:
+            return 0
+        # A Core update of the table, run once per key (executemany)
+        table = ApiKey.__table__  # type: ignore[attr-defined]
+        statement = (
+            update(table)
+            .where(table.c.prefix == bindparam("key_prefix"))
+            .values(last_used_at=bindparam("used_at"))
+        )
+        try:
+            await session.execute(
+                statement,
+                [
+                    {"key_prefix": prefix, "used_at": used_at}
+                    for prefix, used_at in pending.items()
+                ],
+            )
+            await session.commit()
+        except Exception:
+            # Put them back, unless the key was used again meanwhile
+            for prefix, used_at in pending.items():
+                self._pending.setdefault(prefix, used_at)
+            raise
+        self.flushes += 1
+        return len(pending)
+
+    async def flush_if_due(self, session_factory: Callable[[], AsyncSession]) -> None:
+        """Flush, in a session of its own, once the flush interval has passed."""
+        if time.monotonic() - self._flushed_at < self.flush_interval_seconds:
+            return
+        async with self._flush_lock:
+            if time.monotonic() - self._flushed_at < self.flush_interval_seconds:
+                return
+            try:
+                async with session_factory() as session:
+                    await self.flush(session)
+            except Exception:
+                logger.exception("Failed to write API key usage")
+
+    def clear(self) -> None:
+        self._pending.clear()
+        self._flushed_at = time.monotonic()
+
+
+api_key_usage = ApiKeyUsageTracker(
+    flush_interval_seconds=settings.API_KEY_USAGE_FLUSH_SECONDS
+)
@@ -0,0 +1,298 @@
+"""Negotiated response compression and gzip request bodies.
+
+Responses are compressed with the best encoding the client accepts, among
+zstd and br (when the zstandard and brotli packages are installed) and gzip,
+if their content type is in COMPRESSED_TYPES and they are at least
+COMPRESSION_MIN_SIZE bytes. Streamed responses are compressed chunk by
+chunk, each flushed as it is sent, so nothing is held back; Server-Sent
+Events and NDJSON streams are never compressed at all, as proxies and
+clients read them as they arrive.
+
+Request bodies sent with Content-Encoding: gzip are inflated as they are
+read, and rejected with 413 past REQUEST_MAX_DECOMPRESSED_SIZE: a few
+kilobytes of gzip can inflate to gigabytes.
+"""
+
+import zlib
+from typing import Protocol
+
+from fastapi import HTTPException, status
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Optional (the "compression" extra): without them, responses are gzipped
+try:
+    import brotli  # type: ignore[import-not-found,unused-ignore]
+except ImportError:  # pragma: no cover
+    brotli = None
+
+try:
+    import zstandard  # type: ignore[import-not-found,unused-ignore]
+except ImportError:  # pragma: no cover
+    zstandard = None  # type: ignore[assignment,unused-ignore]
+
+# Compressed when at least COMPRESSION_MIN_SIZE bytes
+COMPRESSED_TYPES = (
+    "application/json",
+    "application/javascript",
+    "image/svg+xml",
+    "text/css",
+    "text/csv",
+    "text/html",
+    "text/plain",
+)
+# Moderate levels: most of the size reduction for a fraction of the CPU time
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+ZSTD_LEVEL = 3
+
+
+class Encoder(Protocol):
+    def compress(self, data: bytes) -> bytes: ...
+
+    # Everything compressed so far, ready to be sent
+    def flush(self) -> bytes: ...
+
+    def finish(self) -> bytes: ...
+
+
+class GzipEncoder:
+    def __init__(self) -> None:
+        self._compressor = zlib.compressobj(
+            GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS
+        )
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class BrotliEncoder:
+    def __init__(self) -> None:
+        self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def compress(self, data: bytes) -> bytes:
+        compressed: bytes = self._compressor.process(data)
+        return compressed
+
+    def flush(self) -> bytes:
+        compressed: bytes = self._compressor.flush()
+        return compressed
+
+    def finish(self) -> bytes:
+        compressed: bytes = self._compressor.finish()
+        return compressed
+
+
+class ZstdEncoder:
+    def __init__(self) -> None:
+        self._compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        compressed: bytes = self._compressor.compress(data)
+        return compressed
+
+    def flush(self) -> bytes:
+        compressed: bytes = self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        return compressed
+
+    def finish(self) -> bytes:
+        compressed: bytes = self._compressor.flush()
+        return compressed
+
+
+# Available encodings, preferred first when the client accepts several equally
+ENCODERS: dict[str, type[Encoder]] = {}
+if zstandard is not None:
+    ENCODERS["zstd"] = ZstdEncoder
+if brotli is not None:
+    ENCODERS["br"] = BrotliEncoder
+ENCODERS["gzip"] = GzipEncoder
+
+
+def negotiate_encoding(accept_encoding: str) -> str | None:
+    """Pick the response encoding for an Accept-Encoding header, if any."""
+    weights: dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, *params = part.split(";")
+        weight = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding.strip().lower()] = weight
+    best, best_weight = None, 0.0
+    for encoding in ENCODERS:
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+def is_compressible(headers: Headers) -> bool:
+    content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+    return content_type in COMPRESSED_TYPES and "content-encoding" not in headers
+
+
+class GzipRequestBody:
+    """An ASGI receive callable that inflates a gzip request body, up to a size."""
+
+    def __init__(self, receive: Receive, max_size: int):
+        self._receive = receive
+        self._max_size = max_size
+        self._size = 0
+        self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    async def __call__(self) -> Message:
+        message = await self._receive()
+        if message["type"] != "http.request":
+            return message
+        try:
+            # Never inflates more than one byte past the limit
+            body = self._decompressor.decompress(
+                message.get("body", b""), self._max_size - self._size + 1
+            )
+        except zlib.error:
+            raise HTTPException(status_code=400, detail="Invalid gzip request body")
+        self._size += len(body)
+        if self._size > self._max_size:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail="Request body is too large once decompressed",
+            )
+        more_body = message.get("more_body", False)
+        if not more_body and not self._decompressor.eof:
+            raise HTTPException(status_code=400, detail="Invalid gzip request body")
+        return {"type": "http.request", "body": body, "more_body": more_body}
+
+
+class CompressedResponder:
+    """
+    Wraps the ASGI send of one response, compressing its body if it's worth it.
+
+    The start message is held until the first body message: a response sent
+    in one message is compressed whole, if it's large enough, and a streamed
+    one chunk by chunk.
+    """
+
+    def __init__(self, send: Send, encoding: str, minimum_size: int):
+        self._send = send
+        self._encoding = encoding
+        self._minimum_size = minimum_size
+        self._start: Message | None = None
+        self._encoder: Encoder | None = None
+        self._passthrough = False
+
+    async def send(self, message: Message) -> None:
+        if self._passthrough:
+            await self._send(message)
+        elif message["type"] == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            if is_compressible(headers):
+                # The encoding depends on the request's Accept-Encoding
+                MutableHeaders(raw=message["headers"]).add_vary_header(
+                    "Accept-Encoding"
+                )
+                self._start = message
+            else:
+                self._passthrough = True
+                await self._send(message)
+        elif message["type"] == "http.response.body" and self._encoder is None:
+            await self._send_first_body(message)
+        elif message["type"] == "http.response.body":
+            await self._send_compressed(message)
+        else:
+            await self._send(message)
+
+    async def _send_first_body(self, message: Message) -> None:
+        assert self._start is not None
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if not more_body and len(body) < self._minimum_size:
+            self._passthrough = True
+            await self._send(self._start)
+            await self._send(message)
+            return
+
+        self._encoder = ENCODERS[self._encoding]()
+        headers = MutableHeaders(raw=self._start["headers"])
+        headers["Content-Encoding"] = self._encoding
+        del headers["Content-Length"]
+        if more_body:
+            data = self._encoder.compress(body) + self._encoder.flush()
+        else:
+            data = self._encoder.compress(body) + self._encoder.finish()
+            headers["Content-Length"] = str(len(data))
+        await self._send(self._start)
+        await self._send(
+            {"type": "http.response.body", "body": data, "more_body": more_body}
+        )
+
+    async def _send_compressed(self, message: Message) -> None:
+        assert self._encoder is not None
+        body: bytes = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        data = self._encoder.compress(body)
+        data += self._encoder.flush() if more_body else self._encoder.finish()
+        await self._send(
+            {"type": "http.response.body", "body": data, "more_body": more_body}
+        )
+
+
+class CompressionMiddleware:
+    """
+    Compress responses and inflate gzip request bodies.
+
+    Usage:
+        app.add_middleware(CompressionMiddleware, minimum_size=1024)
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        max_request_size: int = 10 * 1024 * 1024,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.max_request_size = max_request_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        content_encoding = headers.get("content-encoding", "identity").strip().lower()
+        if content_encoding == "gzip":
+            # The body changes length: the app reads it until more_body is False
+            scope = dict(scope)
+            scope["headers"] = [
+                (name, value)
+                for name, value in scope["headers"]
+                if name not in (b"content-encoding", b"content-length")
+            ]
+            receive = GzipRequestBody(receive, self.max_request_size)
+        elif content_encoding != "identity":
+            response = JSONResponse(
+                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                content={"detail": f"Unsupported Content-Encoding: {content_encoding}"},
+            )
+            await response(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(headers.get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = CompressedResponder(send, encoding, self.minimum_size)
+        await self.app(scope, receive, responder.send)
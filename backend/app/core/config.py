@@ -35,6 +35,28 @@ class Settings(BaseSettings):
     SECRET_KEY: str = secrets.token_urlsafe(32)
     # 60 minutes * 24 hours * 8 days = 8 days
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8
+    # Authenticated users are cached per token for this long (0 disables the cache)
+    USER_CACHE_TTL_SECONDS: float = 30.0
+    USER_CACHE_MAX_SIZE: int = 10_000
+    # Opt-in stateless tokens: short-lived access tokens carry the user's
+    # claims (no database lookup per request) and are renewed with a refresh
+    # token. Revocations are synced from the database every few seconds.
+    JWT_STATELESS_CLAIMS: bool = False
+    STATELESS_ACCESS_TOKEN_EXPIRE_MINUTES: int = 15
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 30
+    TOKEN_REVOCATION_SYNC_SECONDS: float = 5.0
+    # API keys' last_used_at is written at most this often, in one batch
+    API_KEY_USAGE_FLUSH_SECONDS: float = 60.0
+    # bcrypt cost for new hashes; existing hashes are migrated on login
+    BCRYPT_ROUNDS: int = 12
+    # Processes that hash passwords (0 to hash in the request thread)
+    PASSWORD_HASH_WORKERS: int = 2
+    # Hashing calls allowed to wait for a worker before new ones are rejected
+    PASSWORD_HASH_MAX_PENDING: int = 64
+    # Responses smaller than this are sent uncompressed (see app/core/compression.py)
+    COMPRESSION_MIN_SIZE: int = 1024
+    # Largest request body accepted once a Content-Encoding: gzip body is inflated
+    REQUEST_MAX_DECOMPRESSED_SIZE: int = 10 * 1024 * 1024
     FRONTEND_HOST: str = "http://localhost:5173"
     ENVIRONMENT: Literal["local", "staging", "production"] = "local"
 
@@ -56,12 +78,81 @@ class Settings(BaseSettings):
     POSTGRES_USER: str
     POSTGRES_PASSWORD: str = ""
     POSTGRES_DB: str = ""
+    # Connection pool, per engine and per worker process: with N workers the
+    # API can open up to N * 2 * (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections
+    # (sync and async engine), which must stay under Postgres' max_connections
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SECONDS: float = 30.0
+    # Replace connections older than this (-1 to keep them for ever)
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    # Rows per bulk item request (POST/PATCH/DELETE /items/bulk)
+    ITEMS_BULK_MAX_ROWS: int = 1000
+    # Maintained row counts are recounted this often (see app/counter_reconciler.py)
+    COUNTER_RECONCILE_INTERVAL_SECONDS: float = 3600.0
 
     # LangChain settings
     OPENAI_API_KEY: str | None = None
     ANTHROPIC_API_KEY: str | None = None
     DEFAULT_LLM_MODEL: str | None = "claude-3-haiku-20240307"
     DEFAULT_LLM_TEMPERATURE: float = 0.7
+    # Ordered models to hedge to or fail over to when the default model is slow or down
+    LLM_FALLBACK_MODELS: Annotated[list[str] | str, BeforeValidator(parse_cors)] = []
+    # Models a request may override the default with (the default and fallbacks always are)
+    LLM_ALLOWED_MODELS: Annotated[list[str] | str, BeforeValidator(parse_cors)] = [
+        "claude-3-haiku-20240307",
+        "claude-3-5-haiku-20241022",
+        "claude-3-5-sonnet-20241022",
+        "gpt-4o-mini",
+        "gpt-4o",
+    ]
+    # Hedge to the next model once a call exceeds this latency percentile
+    LLM_HEDGE_ENABLED: bool = True
+    LLM_HEDGE_PERCENTILE: float = 95.0
+    LLM_HEDGE_MIN_SAMPLES: int = 20
+    LLM_HEDGE_INITIAL_DELAY_SECONDS: float = 12.0
+    # In-process proposal response cache, set either value to 0 to disable
+    PROPOSAL_CACHE_MAX_SIZE: int = 256
+    PROPOSAL_CACHE_TTL_SECONDS: int = 600
+    # Prompt token budget; longer job descriptions and context are trimmed (0 to disable)
+    PROPOSAL_PROMPT_MAX_TOKENS: int = 3000
+    # Target proposal length, used to derive the max_tokens sent to the model
+    PROPOSAL_MAX_OUTPUT_WORDS: int = 300
+    # Generators kept per process, one per (model, temperature, prompt template)
+    PROPOSAL_GENERATOR_POOL_SIZE: int = 8
+    # Batch generation limits, per request
+    PROPOSAL_BATCH_MAX_ITEMS: int = 50
+    PROPOSAL_BATCH_MAX_CONCURRENCY: int = 5
+    # Background proposal jobs (see app/proposal_worker.py)
+    PROPOSAL_WORKER_CONCURRENCY: int = 8
+    PROPOSAL_WORKER_POLL_INTERVAL_SECONDS: float = 1.0
+    PROPOSAL_JOB_MAX_ATTEMPTS: int = 3
+    # Running jobs not finished after this long are assumed lost with their worker and retried
+    PROPOSAL_JOB_STALE_AFTER_SECONDS: int = 600
+    PROPOSAL_JOB_WEBHOOK_TIMEOUT_SECONDS: float = 10.0
+    PROPOSAL_JOB_WEBHOOK_ATTEMPTS: int = 3
+    # Hosts webhooks may be sent to; when empty, any host resolving to public addresses
+    PROPOSAL_JOB_WEBHOOK_ALLOWED_HOSTS: Annotated[
+        list[str] | str, BeforeValidator(parse_cors)
+    ] = []
+    # Outbound LLM budgets per provider (0 for unlimited). They are shared by all
+    # server workers, so each process gets 1/LLM_SCHEDULER_WORKERS of them.
+    ANTHROPIC_RPM_LIMIT: int = 50
+    ANTHROPIC_TPM_LIMIT: int = 50000
+    OPENAI_RPM_LIMIT: int = 500
+    OPENAI_TPM_LIMIT: int = 200000
+    LLM_SCHEDULER_WORKERS: int = 4
+    LLM_MAX_CONCURRENCY: int = 16
+    LLM_MAX_QUEUE_WAIT_SECONDS: float = 60.0
+
+    @computed_field  # type: ignore[prop-decorator]
+    @property
+    def all_llm_models(self) -> list[str]:
+        models = [*self.LLM_ALLOWED_MODELS, *self.LLM_FALLBACK_MODELS]
+        if self.DEFAULT_LLM_MODEL:
+            models.append(self.DEFAULT_LLM_MODEL)
+        return models
 
     @computed_field  # type: ignore[prop-decorator]
     @property
@@ -0,0 +1,67 @@
+"""Maintained row counts, so item and user listings don't COUNT(*) every time.
+
+Every path that creates or deletes items or users changes the matching
+counter in the same transaction: a per-owner item count (itemcount, removed
+with its owner by ON DELETE CASCADE) and global counts (rowcount, one row per
+table). The total item count is the sum of the per-owner counts, so item
+inserts by different users never wait on the same counter row.
+
+Writes that bypass these paths (manual SQL, a failed deploy) are corrected by
+the periodic reconciliation in app.counter_reconciler.
+"""
+
+import uuid
+
+from sqlalchemy import BigInteger, cast, column, table
+from sqlalchemy.dialects.postgresql import Insert, insert
+from sqlmodel import col, func, select
+from sqlmodel.sql.expression import SelectOfScalar
+
+from app.models import ItemCount, RowCount
+
+USER_COUNT = "user"
+
+pg_class = table("pg_class", column("oid"), column("reltuples"))
+
+
+def change_item_count(owner_id: uuid.UUID, delta: int) -> Insert:
+    statement = insert(ItemCount).values(owner_id=owner_id, count=delta)
+    return statement.on_conflict_do_update(
+        index_elements=[col(ItemCount.owner_id)],
+        set_={"count": ItemCount.count + statement.excluded.count},
+    )
+
+
+def change_row_count(name: str, delta: int) -> Insert:
+    statement = insert(RowCount).values(name=name, count=delta)
+    return statement.on_conflict_do_update(
+        index_elements=[col(RowCount.name)],
+        set_={"count": RowCount.count + statement.excluded.count},
+    )
+
+
+def item_count(owner_id: uuid.UUID | None = None) -> SelectOfScalar[int]:
+    """Count of an owner's items, or of all items."""
+    if owner_id is not None:
+        return select(func.coalesce(func.max(ItemCount.count), 0)).where(
+            ItemCount.owner_id == owner_id
+        )
+    return select(func.coalesce(func.sum(ItemCount.count), 0))
+
+
+def row_count(name: str) -> SelectOfScalar[int]:
+    return select(func.coalesce(func.max(RowCount.count), 0)).where(
+        RowCount.name == name
+    )
+
+
+def estimated_row_count(table_name: str) -> SelectOfScalar[int]:
+    """
+    The planner's estimate of a table's rows, from its last ANALYZE.
+
+    Negative if the table has never been analyzed.
+    """
+    # Quoted, as "user" is a reserved word
+    return select(cast(pg_class.c.reltuples, BigInteger)).where(
+        pg_class.c.oid == func.to_regclass(f'"{table_name}"')
+    )
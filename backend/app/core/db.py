@@ -1,10 +1,44 @@
+from typing import Any
+
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from sqlmodel import Session, create_engine, select
 
 from app import crud
 from app.core.config import settings
+from app.core.db_metrics import PoolMetrics
 from app.models import User, UserCreate
 
-engine = create_engine(str(settings.SQLALCHEMY_DATABASE_URI))
+pool_options: dict[str, Any] = {
+    "pool_size": settings.DB_POOL_SIZE,
+    "max_overflow": settings.DB_MAX_OVERFLOW,
+    "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+    "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+    "pool_pre_ping": settings.DB_POOL_PRE_PING,
+}
+
+# Sync engine, for Alembic, scripts, the proposal worker and tests
+sync_pool_metrics = PoolMetrics("sync")
+engine = create_engine(
+    str(settings.SQLALCHEMY_DATABASE_URI),
+    poolclass=sync_pool_metrics.pool_class(QueuePool),
+    **pool_options,
+)
+sync_pool_metrics.listen(engine)
+
+# Async engine (psycopg async), for the API routes
+async_pool_metrics = PoolMetrics("async")
+async_engine = create_async_engine(
+    str(settings.SQLALCHEMY_DATABASE_URI),
+    poolclass=async_pool_metrics.pool_class(AsyncAdaptedQueuePool),
+    **pool_options,
+)
+async_pool_metrics.listen(async_engine.sync_engine)
+
+
+def get_pool_stats() -> list[dict[str, Any]]:
+    """Return the pool metrics of both engines in this process."""
+    return [sync_pool_metrics.stats(), async_pool_metrics.stats()]
 
 
 # make sure all SQLModel models are imported (app.models) before initializing DB
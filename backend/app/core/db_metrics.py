@@ -0,0 +1,162 @@
+"""Connection pool instrumentation.
+
+Every engine gets a PoolMetrics that records, per process:
+- how long checkouts wait for a connection (a histogram), and how many time out
+- how many connections are in use, the peak, and checkouts served from overflow
+- how long connections live between being opened and closed (a histogram)
+
+Pool status is per worker process, so size the pool from the peak in-use
+count across workers, against Postgres' max_connections.
+"""
+
+import bisect
+import threading
+import time
+from typing import Any
+
+from sqlalchemy import Engine, event, exc
+from sqlalchemy.pool import PoolProxiedConnection, QueuePool
+
+# Upper bounds of the histogram buckets; the last bucket is unbounded
+CHECKOUT_WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+CONNECTION_LIFETIME_BUCKETS_SECONDS = (1, 10, 60, 300, 900, 1800, 3600, 14400)
+
+
+class Histogram:
+    """Fixed-bucket histogram with count, sum and max."""
+
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "buckets": list(self.buckets),
+            "counts": list(self.counts),
+            "count": self.count,
+            "sum": self.sum,
+            "max": self.max,
+        }
+
+
+class PoolMetrics:
+    """
+    Metrics for one engine's connection pool.
+
+    Usage:
+        metrics = PoolMetrics("sync")
+        engine = create_engine(url, poolclass=metrics.pool_class(QueuePool))
+        metrics.listen(engine)
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.engine: Engine | None = None
+        self._lock = threading.Lock()
+        self.checkout_wait_ms = Histogram(CHECKOUT_WAIT_BUCKETS_MS)
+        self.connection_lifetime_seconds = Histogram(
+            CONNECTION_LIFETIME_BUCKETS_SECONDS
+        )
+        self.checkouts = 0
+        self.overflow_checkouts = 0
+        self.timeouts = 0
+        self.peak_checked_out = 0
+        self.connections_opened = 0
+        self.connections_closed = 0
+
+    def pool_class(self, base: type[QueuePool]) -> type[QueuePool]:
+        """Return a subclass of a queue pool class that times its checkouts."""
+        metrics = self
+
+        class InstrumentedPool(base):  # type: ignore[valid-type,misc]
+            def connect(self) -> PoolProxiedConnection:
+                start = time.perf_counter()
+                try:
+                    connection: PoolProxiedConnection = super().connect()
+                except exc.TimeoutError:
+                    metrics.record_timeout((time.perf_counter() - start) * 1000)
+                    raise
+                metrics.record_checkout(
+                    (time.perf_counter() - start) * 1000,
+                    checked_out=self.checkedout(),
+                    overflow=self.overflow(),
+                )
+                return connection
+
+        InstrumentedPool.__name__ = f"Instrumented{base.__name__}"
+        return InstrumentedPool
+
+    def listen(self, engine: Engine) -> None:
+        """Track the lifetime of the engine's connections."""
+        self.engine = engine
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "close", self._on_close)
+        event.listen(engine, "close_detached", self._on_close)
+
+    def record_checkout(self, wait_ms: float, checked_out: int, overflow: int) -> None:
+        with self._lock:
+            self.checkout_wait_ms.observe(wait_ms)
+            self.checkouts += 1
+            # overflow() is negative while the pool hasn't opened all its connections
+            if overflow > 0:
+                self.overflow_checkouts += 1
+            self.peak_checked_out = max(self.peak_checked_out, checked_out)
+
+    def record_timeout(self, wait_ms: float) -> None:
+        with self._lock:
+            self.checkout_wait_ms.observe(wait_ms)
+            self.timeouts += 1
+
+    def _on_connect(self, _dbapi_connection: Any, connection_record: Any) -> None:
+        connection_record.info["connected_at"] = time.monotonic()
+        with self._lock:
+            self.connections_opened += 1
+
+    def _on_close(self, _dbapi_connection: Any, connection_record: Any = None) -> None:
+        connected_at = (
+            connection_record.info.get("connected_at") if connection_record else None
+        )
+        with self._lock:
+            self.connections_closed += 1
+            if connected_at is not None:
+                self.connection_lifetime_seconds.observe(
+                    time.monotonic() - connected_at
+                )
+
+    def stats(self) -> dict[str, Any]:
+        """Return the pool configuration, its current status and the metrics."""
+        pool = self.engine.pool if self.engine is not None else None
+        status: dict[str, Any] = {}
+        if isinstance(pool, QueuePool):
+            status = {
+                "pool_size": pool.size(),
+                "max_overflow": pool._max_overflow,
+                "timeout_seconds": pool.timeout(),
+                "recycle_seconds": pool._recycle,
+                "pre_ping": pool._pre_ping,
+                "checked_out": pool.checkedout(),
+                "idle": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+            }
+        with self._lock:
+            return {
+                "name": self.name,
+                **status,
+                "peak_checked_out": self.peak_checked_out,
+                "checkouts": self.checkouts,
+                "overflow_checkouts": self.overflow_checkouts,
+                "timeouts": self.timeouts,
+                "connections_opened": self.connections_opened,
+                "connections_closed": self.connections_closed,
+                "checkout_wait_ms": self.checkout_wait_ms.stats(),
+                "connection_lifetime_seconds": self.connection_lifetime_seconds.stats(),
+            }
@@ -0,0 +1,188 @@
+"""Password hashing off the request threads.
+
+bcrypt is deliberately slow (~250 ms per call at cost 12), and it is pure
+CPU work. Running it in the API threadpool lets a burst of logins slow every
+other endpoint of the worker down, so hashes are computed in a small pool of
+separate processes instead. The number of calls waiting for the pool is
+bounded: past that, PasswordHashQueueFull is raised so the request can be
+rejected quickly instead of queueing for ever.
+
+This module is imported by the pool's child processes, so it must not import
+the app settings.
+"""
+
+import asyncio
+import multiprocessing
+import threading
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, TypeVar
+
+from passlib.context import CryptContext
+
+T = TypeVar("T")
+
+# Contexts built in this process, by bcrypt cost
+_contexts: dict[int, CryptContext] = {}
+
+
+class PasswordHashQueueFull(Exception):
+    """Raised when too many password hashing calls are already waiting."""
+
+    pass
+
+
+def get_crypt_context(rounds: int) -> CryptContext:
+    """
+    Return the CryptContext for a bcrypt cost.
+
+    Hashes made with any other cost are reported as needing an update, so
+    raising or lowering the cost migrates users as they log in.
+    """
+    context = _contexts.get(rounds)
+    if context is None:
+        context = CryptContext(
+            schemes=["bcrypt"],
+            deprecated="auto",
+            bcrypt__rounds=rounds,
+            bcrypt__min_rounds=rounds,
+            bcrypt__max_rounds=rounds,
+        )
+        _contexts[rounds] = context
+    return context
+
+
+def hash_password(password: str, rounds: int) -> str:
+    return get_crypt_context(rounds).hash(password)
+
+
+def verify_password(password: str, hashed_password: str, rounds: int) -> bool:
+    return get_crypt_context(rounds).verify(password, hashed_password)
+
+
+def verify_and_update_password(
+    password: str, hashed_password: str, rounds: int
+) -> tuple[bool, str | None]:
+    return get_crypt_context(rounds).verify_and_update(password, hashed_password)
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt in a process pool, with at most `max_pending` calls in flight.
+
+    The `a`-prefixed methods await the result without blocking the event
+    loop; the others block the calling thread. With `workers=0` hashing runs
+    inline (in a worker thread for the async methods), which is what scripts
+    and single-shot tools want.
+    """
+
+    def __init__(self, rounds: int = 12, workers: int = 2, max_pending: int = 64):
+        """
+        Initialize a hasher; the process pool is started on first use.
+
+        Args:
+            rounds: bcrypt cost (log2 of the number of rounds)
+            workers: Number of hashing processes (0 to hash inline)
+            max_pending: Calls allowed to run or wait for the pool at once
+        """
+        self.rounds = rounds
+        self.workers = workers
+        self.max_pending = max_pending
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor: ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # Spawn rather than fork: the API process has threads and open
+                # database connections that a forked child must not inherit
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    def _reset_executor(self, executor: ProcessPoolExecutor) -> None:
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False)
+
+    def _acquire_slot(self) -> None:
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise PasswordHashQueueFull(
+                f"More than {self.max_pending} password hashing calls are pending"
+            )
+
+    def _run(self, fn: Callable[..., T], *args: Any) -> T:
+        if self.workers <= 0:
+            return fn(*args)
+        self._acquire_slot()
+        try:
+            executor = self._get_executor()
+            try:
+                return executor.submit(fn, *args).result()
+            except BrokenProcessPool:
+                # A child died (e.g. killed for memory): retry once in a fresh pool
+                self._reset_executor(executor)
+                return self._get_executor().submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    async def _arun(self, fn: Callable[..., T], *args: Any) -> T:
+        if self.workers <= 0:
+            return await asyncio.to_thread(fn, *args)
+        self._acquire_slot()
+        try:
+            executor = self._get_executor()
+            try:
+                return await asyncio.wrap_future(executor.submit(fn, *args))
+            except BrokenProcessPool:
+                self._reset_executor(executor)
+                return await asyncio.wrap_future(self._get_executor().submit(fn, *args))
+        finally:
+            self._slots.release()
+
+    def hash(self, password: str) -> str:
+        return self._run(hash_password, password, self.rounds)
+
+    def verify(self, password: str, hashed_password: str) -> bool:
+        return self._run(verify_password, password, hashed_password, self.rounds)
+
+    def verify_and_update(
+        self, password: str, hashed_password: str
+    ) -> tuple[bool, str | None]:
+        """
+        Verify a password, and return a new hash if the stored one uses an
+        outdated cost.
+
+        Returns:
+            (verified, new_hash_or_None)
+        """
+        return self._run(
+            verify_and_update_password, password, hashed_password, self.rounds
+        )
+
+    async def ahash(self, password: str) -> str:
+        return await self._arun(hash_password, password, self.rounds)
+
+    async def averify(self, password: str, hashed_password: str) -> bool:
+        return await self._arun(verify_password, password, hashed_password, self.rounds)
+
+    async def averify_and_update(
+        self, password: str, hashed_password: str
+    ) -> tuple[bool, str | None]:
+        return await self._arun(
+            verify_and_update_password, password, hashed_password, self.rounds
+        )
+
+    def shutdown(self) -> None:
+        """Stop the hashing processes; they are restarted on the next call."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
@@ -1,27 +1,106 @@
+import hashlib
+import hmac
+import secrets
+import time
+import uuid
 from datetime import datetime, timedelta, timezone
 from typing import Any
 
 import jwt
-from passlib.context import CryptContext
 
 from app.core.config import settings
+from app.core.password_hashing import PasswordHasher
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+password_hasher = PasswordHasher(
+    rounds=settings.BCRYPT_ROUNDS,
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+)
 
 
 ALGORITHM = "HS256"
+API_KEY_PREFIX = "pg_"
 
 
-def create_access_token(subject: str | Any, expires_delta: timedelta) -> str:
+def create_access_token(
+    subject: str | Any, expires_delta: timedelta, claims: dict[str, Any] | None = None
+) -> str:
     expire = datetime.now(timezone.utc) + expires_delta
     to_encode = {"exp": expire, "sub": str(subject)}
+    if claims is not None:
+        # Stateless token: identifiable (jti) and datable (iat) for revocation.
+        # iat keeps sub-second precision, so a token issued right after a
+        # revocation isn't mistaken for one issued before it.
+        to_encode.update(claims, type="access", jti=uuid.uuid4().hex, iat=time.time())
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 
+def create_refresh_token(subject: str | Any, expires_delta: timedelta) -> str:
+    to_encode = {
+        "exp": datetime.now(timezone.utc) + expires_delta,
+        "sub": str(subject),
+        "type": "refresh",
+        "jti": uuid.uuid4().hex,
+        "iat": time.time(),
+    }
+    return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
+
+
+def generate_api_key() -> tuple[str, str]:
+    """
+    Return a new API key and its lookup prefix.
+
+    Keys look like `pg_<prefix>_<secret>`: the prefix is stored in clear to
+    find the key's row, the secret has 256 bits of entropy.
+    """
+    prefix = secrets.token_hex(6)
+    return f"{API_KEY_PREFIX}{prefix}_{secrets.token_urlsafe(32)}", prefix
+
+
+def get_api_key_prefix(key: str) -> str | None:
+    if not key.startswith(API_KEY_PREFIX):
+        return None
+    prefix, separator, _ = key[len(API_KEY_PREFIX) :].partition("_")
+    return prefix if separator and prefix else None
+
+
+def hash_api_key(key: str) -> str:
+    # The key is random and long, so a keyed fast hash is enough: unlike
+    # passwords, it can't be guessed from a dictionary
+    return hmac.new(
+        settings.SECRET_KEY.encode(), key.encode(), hashlib.sha256
+    ).hexdigest()
+
+
+def verify_api_key(key: str, key_hash: str) -> bool:
+    return hmac.compare_digest(hash_api_key(key), key_hash)
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return password_hasher.verify(plain_password, hashed_password)
+
+
+def verify_and_update_password(
+    plain_password: str, hashed_password: str
+) -> tuple[bool, str | None]:
+    """Verify a password; also return a new hash if the stored one is outdated."""
+    return password_hasher.verify_and_update(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return password_hasher.hash(password)
+
+
+async def averify_password(plain_password: str, hashed_password: str) -> bool:
+    return await password_hasher.averify(plain_password, hashed_password)
+
+
+async def averify_and_update_password(
+    plain_password: str, hashed_password: str
+) -> tuple[bool, str | None]:
+    return await password_hasher.averify_and_update(plain_password, hashed_password)
+
+
+async def aget_password_hash(password: str) -> str:
+    return await password_hasher.ahash(password)
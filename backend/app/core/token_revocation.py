@@ -0,0 +1,163 @@
+"""In-memory token revocation list, synced from the revokedtoken table.
+
+Stateless access tokens (JWT_STATELESS_CLAIMS) are trusted without a
+database lookup, so revocations are checked against this list instead.
+Every process loads new revocations at most every
+TOKEN_REVOCATION_SYNC_SECONDS, piggybacking on a request, and learns about
+its own revocations immediately; a revocation made elsewhere takes effect
+within that interval.
+
+Revoked token ids go through a Bloom filter in front of the exact set: the
+common case, a token that was never revoked, is answered by a few bit tests.
+"""
+
+import asyncio
+import hashlib
+import logging
+import time
+import uuid
+from collections.abc import Callable
+from datetime import datetime, timedelta, timezone
+
+from sqlmodel import col, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.models import RevokedToken
+
+logger = logging.getLogger(__name__)
+
+# Revocations are re-read with this overlap, so rows committed out of order
+# by other processes are not missed
+SYNC_OVERLAP = timedelta(seconds=60)
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter of strings (no false negatives, no removal)."""
+
+    def __init__(self, size_bits: int = 1 << 20, hashes: int = 7):
+        self.size_bits = size_bits
+        self.hashes = hashes
+        self._bits = bytearray(size_bits // 8)
+
+    def _positions(self, key: str) -> list[int]:
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        # Double hashing: k positions from two 64-bit halves
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size_bits for i in range(self.hashes)]
+
+    def add(self, key: str) -> None:
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(
+            self._bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(key)
+        )
+
+
+class TokenRevocationList:
+    """
+    Revoked token ids and per-user revocation times.
+
+    A token is revoked if its jti was revoked, or if it was issued before the
+    latest revocation of its user.
+    """
+
+    def __init__(self, sync_interval_seconds: float = 5.0):
+        self.sync_interval_seconds = sync_interval_seconds
+        self._bloom = BloomFilter()
+        # jti -> expires_at (Unix time)
+        self._jtis: dict[str, float] = {}
+        # user id -> (revoked_at, expires_at) as Unix times
+        self._users: dict[uuid.UUID, tuple[float, float]] = {}
+        self._synced_at = 0.0
+        self._synced_until: datetime | None = None
+        self._sync_lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self._jtis) + len(self._users)
+
+    def is_revoked(
+        self, jti: str | None, user_id: uuid.UUID | None, issued_at: float | None
+    ) -> bool:
+        if jti is not None and jti in self._bloom and jti in self._jtis:
+            return True
+        if user_id is not None:
+            revoked = self._users.get(user_id)
+            if revoked is not None and (issued_at is None or issued_at <= revoked[0]):
+                return True
+        return False
+
+    def add(self, revocation: RevokedToken) -> None:
+        expires_at = revocation.expires_at.timestamp()
+        if revocation.jti is not None:
+            self._jtis[revocation.jti] = expires_at
+            self._bloom.add(revocation.jti)
+        if revocation.user_id is not None:
+            revoked_at = revocation.revoked_at.timestamp()
+            current = self._users.get(revocation.user_id)
+            if current is None or current[0] < revoked_at:
+                self._users[revocation.user_id] = (revoked_at, expires_at)
+
+    def _purge(self) -> None:
+        """Forget revocations whose tokens have expired anyway."""
+        now = time.time()
+        expired = [jti for jti, expires_at in self._jtis.items() if expires_at <= now]
+        for jti in expired:
+            del self._jtis[jti]
+        if expired:
+            # A Bloom filter can't remove keys: rebuild it
+            self._bloom = BloomFilter(self._bloom.size_bits, self._bloom.hashes)
+            for jti in self._jtis:
+                self._bloom.add(jti)
+        for user_id, (_, expires_at) in list(self._users.items()):
+            if expires_at <= now:
+                del self._users[user_id]
+
+    async def sync(self, session: AsyncSession) -> None:
+        """Load revocations made since the last sync."""
+        statement = select(RevokedToken).where(
+            col(RevokedToken.expires_at) > datetime.now(timezone.utc)
+        )
+        if self._synced_until is not None:
+            statement = statement.where(
+                col(RevokedToken.revoked_at) > self._synced_until - SYNC_OVERLAP
+            )
+        revocations = (await session.exec(statement)).all()
+        for revocation in revocations:
+            self.add(revocation)
+            # revoked_at is on the database clock, so only ever compared to itself
+            if self._synced_until is None or revocation.revoked_at > self._synced_until:
+                self._synced_until = revocation.revoked_at
+        self._purge()
+        self._synced_at = time.monotonic()
+
+    async def sync_if_stale(self, session_factory: Callable[[], AsyncSession]) -> None:
+        """Sync, in a session of its own, unless it was done within the sync interval."""
+        if time.monotonic() - self._synced_at < self.sync_interval_seconds:
+            return
+        async with self._sync_lock:
+            if time.monotonic() - self._synced_at < self.sync_interval_seconds:
+                return
+            try:
+                async with session_factory() as session:
+                    await self.sync(session)
+            except Exception:
+                # Keep serving from the last known list; retry on a later request
+                logger.exception("Failed to sync token revocations")
+                self._synced_at = time.monotonic()
+
+    def clear(self) -> None:
+        self._bloom = BloomFilter(self._bloom.size_bits, self._bloom.hashes)
+        self._jtis.clear()
+        self._users.clear()
+        self._synced_at = 0.0
+        self._synced_until = None
+
+
+revocation_list = TokenRevocationList(
+    sync_interval_seconds=settings.TOKEN_REVOCATION_SYNC_SECONDS
+)
@@ -0,0 +1,130 @@
+"""In-process cache of authenticated users, keyed by access token.
+
+Clients like the browser extension send the same token on every request, so
+the user behind it is looked up once and kept for a short TTL. An entry never
+outlives its token, and it is dropped as soon as this process changes the
+user. Other worker processes see the change within the TTL at the latest.
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any
+
+from app.core.config import settings
+from app.models import UserPublic
+
+
+class UserCache:
+    """
+    Bounded LRU cache of token -> user snapshot with TTL expiry.
+
+    Entries are read and set by the async auth dependency and invalidated by
+    async routes, all on the event loop. No operation awaits, so each one
+    runs to completion before another coroutine can touch the cache. The lock
+    covers the sync crud functions, which may invalidate from another thread;
+    on the event loop it is never contended and never held across an await.
+    """
+
+    def __init__(self, max_size: int = 10_000, ttl_seconds: float = 30.0):
+        """
+        Initialize an empty cache.
+
+        Args:
+            max_size: Maximum number of tokens kept in memory
+            ttl_seconds: How long a cached user stays valid
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, tuple[float, UserPublic]] = OrderedDict()
+        # user id -> tokens cached for that user, for invalidation
+        self._tokens: dict[uuid.UUID, set[str]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, token: str) -> UserPublic | None:
+        """Return the cached user for token, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, user = entry
+            if expires_at <= time.monotonic():
+                self._remove(token)
+                self.evictions += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return user
+
+    def set(
+        self, token: str, user: UserPublic, token_expires_at: float | None = None
+    ) -> None:
+        """
+        Cache the user for a token, evicting the least recently used entries if full.
+
+        token_expires_at is the token's `exp` claim (a Unix timestamp); the entry
+        expires with the token if that comes before the TTL.
+        """
+        ttl = self.ttl_seconds
+        if token_expires_at is not None:
+            ttl = min(ttl, token_expires_at - time.time())
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._remove(token)
+            self._entries[token] = (time.monotonic() + ttl, user)
+            self._tokens.setdefault(user.id, set()).add(token)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate_user(self, user_id: uuid.UUID) -> None:
+        """Drop every cached token of a user, after it was changed or deleted."""
+        with self._lock:
+            for token in self._tokens.pop(user_id, set()):
+                self._entries.pop(token, None)
+
+    def clear(self) -> None:
+        """Drop all entries (counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+            self._tokens.clear()
+
+    def stats(self) -> dict[str, Any]:
+        """Return the current size and hit/miss/eviction counters."""
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _remove(self, token: str) -> None:
+        entry = self._entries.pop(token, None)
+        if entry is None:
+            return
+        tokens = self._tokens.get(entry[1].id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens[entry[1].id]
+
+
+user_cache = UserCache(
+    max_size=settings.USER_CACHE_MAX_SIZE,
+    ttl_seconds=settings.USER_CACHE_TTL_SECONDS,
+)
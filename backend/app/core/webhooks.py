@@ -0,0 +1,60 @@
+"""Checks on the user-supplied URLs proposal job webhooks are POSTed to.
+
+The worker sends requests to whatever URL a user gives it, from inside the
+deployment's network, so a webhook must use https and, unless
+PROPOSAL_JOB_WEBHOOK_ALLOWED_HOSTS restricts it to known hosts, resolve to
+public addresses only: never to the database, the cloud metadata endpoint or
+anything else on a private, loopback or link-local network. URLs are checked
+when the job is created and again right before delivery, as DNS answers can
+change in between.
+"""
+
+import ipaddress
+import socket
+from urllib.parse import urlsplit
+
+from app.core.config import settings
+
+
+class WebhookURLError(ValueError):
+    """Raised when a webhook URL may not be called."""
+
+    pass
+
+
+def resolve_host(host: str, port: int) -> list[str]:
+    """Return every address a host name resolves to."""
+    return [
+        str(info[4][0])
+        for info in socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    ]
+
+
+def check_webhook_url(url: str) -> None:
+    """
+    Make sure a webhook URL may be called, resolving its host (blocking).
+
+    Raises:
+        WebhookURLError: If the URL isn't https, or its host isn't allowed
+    """
+    parts = urlsplit(url)
+    if parts.scheme != "https":
+        raise WebhookURLError("Webhook URL must use https")
+    host = (parts.hostname or "").rstrip(".").lower()
+    if not host:
+        raise WebhookURLError("Webhook URL must have a host")
+
+    if settings.PROPOSAL_JOB_WEBHOOK_ALLOWED_HOSTS:
+        if host not in settings.PROPOSAL_JOB_WEBHOOK_ALLOWED_HOSTS:
+            raise WebhookURLError("Webhook host is not allowed")
+        return
+
+    try:
+        addresses = resolve_host(host, parts.port or 443)
+    except (OSError, UnicodeError):
+        raise WebhookURLError("Webhook host could not be resolved")
+    # is_global is False for private, loopback, link-local, reserved, shared
+    # (carrier-grade NAT) and unspecified addresses
+    ips = [ipaddress.ip_address(address.split("%")[0]) for address in addresses]
+    if not ips or not all(ip.is_global and not ip.is_multicast for ip in ips):
+        raise WebhookURLError("Webhook URL must resolve to a public address")
@@ -1,10 +1,29 @@
 import uuid
+from datetime import datetime, timedelta, timezone
 from typing import Any
 
-from sqlmodel import Session, select
+from sqlalchemy import ColumnElement, Float, case, cast, literal, literal_column
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlmodel import Session, and_, col, func, or_, select, tuple_
 
-from app.core.security import get_password_hash, verify_password
-from app.models import Item, ItemCreate, User, UserCreate, UserUpdate
+from app.core import counters
+from app.core.config import settings
+from app.core.security import get_password_hash, verify_and_update_password
+from app.core.user_cache import user_cache
+from app.models import (
+    Item,
+    ItemCount,
+    ItemCreate,
+    Proposal,
+    ProposalCreate,
+    ProposalJob,
+    ProposalJobCreate,
+    ProposalJobStatus,
+    RowCount,
+    User,
+    UserCreate,
+    UserUpdate,
+)
 
 
 def create_user(*, session: Session, user_create: UserCreate) -> User:
@@ -12,6 +31,7 @@ def create_user(*, session: Session, user_create: UserCreate) -> User:
         user_create, update={"hashed_password": get_password_hash(user_create.password)}
     )
     session.add(db_obj)
+    session.execute(counters.change_row_count(counters.USER_COUNT, 1))
     session.commit()
     session.refresh(db_obj)
     return db_obj
@@ -28,6 +48,7 @@ def update_user(*, session: Session, db_user: User, user_in: UserUpdate) -> Any:
     session.add(db_user)
     session.commit()
     session.refresh(db_user)
+    user_cache.invalidate_user(db_user.id)
     return db_user
 
 
@@ -41,14 +62,325 @@ def authenticate(*, session: Session, email: str, password: str) -> User | None:
     db_user = get_user_by_email(session=session, email=email)
     if not db_user:
         return None
-    if not verify_password(password, db_user.hashed_password):
+    verified, new_hash = verify_and_update_password(password, db_user.hashed_password)
+    if not verified:
         return None
+    if new_hash:
+        # Stored with a different bcrypt cost than configured: upgrade it
+        db_user.hashed_password = new_hash
+        session.add(db_user)
+        session.commit()
+        session.refresh(db_user)
     return db_user
 
 
 def create_item(*, session: Session, item_in: ItemCreate, owner_id: uuid.UUID) -> Item:
     db_item = Item.model_validate(item_in, update={"owner_id": owner_id})
     session.add(db_item)
+    session.execute(counters.change_item_count(owner_id, 1))
     session.commit()
     session.refresh(db_item)
     return db_item
+
+
+# Generated by Postgres from the title and description, and GIN indexed; it
+# is deliberately not mapped in Item (see the migration that adds it)
+item_search_vector = literal_column("item.search_vector", TSVECTOR)
+
+
+def item_search(
+    q: str, dialect: str
+) -> tuple[ColumnElement[bool], ColumnElement[float]]:
+    """
+    Return the filter and the rank (higher is better) of an item search.
+
+    On Postgres, `q` is a web search style query (words, "quoted phrases",
+    `or`, `-excluded`) matched against item.search_vector, so the GIN index
+    finds the matches. Other databases, like a local SQLite stand-in, fall
+    back to requiring every word in the title or description, a title match
+    ranking higher.
+    """
+    if dialect == "postgresql":
+        query = func.websearch_to_tsquery("english", q)
+        # ts_rank_cd() is a real: as a double it round-trips exactly through
+        # a cursor, where a real compared to a double parameter would not
+        return (
+            item_search_vector.bool_op("@@")(query),
+            cast(func.ts_rank_cd(item_search_vector, query), Float),
+        )
+    conditions = []
+    rank: ColumnElement[float] = literal(0.0)
+    for word in q.split():
+        pattern = (
+            "%"
+            + word.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            + "%"
+        )
+        in_title = col(Item.title).ilike(pattern, escape="\\")
+        in_description = col(Item.description).ilike(pattern, escape="\\")
+        conditions.append(or_(in_title, in_description))
+        rank = (
+            rank
+            + case((in_title, 1.0), else_=0.0)
+            + case((in_description, 0.4), else_=0.0)
+        )
+    return and_(*conditions), rank
+
+
+def _new_proposals(
+    *, session: Session, proposals_in: list[ProposalCreate], owner_id: uuid.UUID
+) -> list[Proposal]:
+    """
+    Build the proposals to add to an owner's history.
+
+    A reused proposal (`reused`) is left out if the owner already has it: it
+    was generated within the proposal cache's TTL, so only that much of the
+    history, a range of the (owner_id, created_at, id) index, is searched.
+    """
+    reused = {
+        proposal_in.proposal_text for proposal_in in proposals_in if proposal_in.reused
+    }
+    # Also left out if it's being saved in the same go (identical batch items)
+    saved = {
+        proposal_in.proposal_text
+        for proposal_in in proposals_in
+        if not proposal_in.reused
+    }
+    if reused:
+        since = datetime.now(timezone.utc) - timedelta(
+            seconds=settings.PROPOSAL_CACHE_TTL_SECONDS
+        )
+        statement = select(Proposal.proposal_text).where(
+            Proposal.owner_id == owner_id,
+            col(Proposal.created_at) >= since,
+            col(Proposal.proposal_text).in_(reused),
+        )
+        saved.update(session.exec(statement).all())
+    db_proposals = []
+    for proposal_in in proposals_in:
+        if proposal_in.reused and proposal_in.proposal_text in saved:
+            continue
+        saved.add(proposal_in.proposal_text)
+        db_proposals.append(
+            Proposal.model_validate(proposal_in, update={"owner_id": owner_id})
+        )
+    return db_proposals
+
+
+def create_proposals(
+    *, session: Session, proposals_in: list[ProposalCreate], owner_id: uuid.UUID
+) -> list[Proposal]:
+    db_proposals = _new_proposals(
+        session=session, proposals_in=proposals_in, owner_id=owner_id
+    )
+    session.add_all(db_proposals)
+    session.commit()
+    return db_proposals
+
+
+def get_proposals_page(
+    *,
+    session: Session,
+    owner_id: uuid.UUID,
+    limit: int,
+    after: tuple[datetime, uuid.UUID] | None = None,
+) -> tuple[list[Proposal], bool]:
+    """
+    Get a page of a user's proposals, newest first.
+
+    Pages are keyset-paginated on (created_at, id): `after` is the last row of
+    the previous page, so every page is a range scan of the
+    (owner_id, created_at, id) index however deep it is.
+
+    Returns:
+        (proposals, has_more)
+    """
+    statement = select(Proposal).where(Proposal.owner_id == owner_id)
+    if after is not None:
+        statement = statement.where(
+            tuple_(col(Proposal.created_at), col(Proposal.id)) < tuple_(*after)
+        )
+    statement = statement.order_by(
+        col(Proposal.created_at).desc(), col(Proposal.id).desc()
+    ).limit(limit + 1)
+    proposals = list(session.exec(statement).all())
+    return proposals[:limit], len(proposals) > limit
+
+
+def create_proposal_job(
+    *,
+    session: Session,
+    job_in: ProposalJobCreate,
+    owner_id: uuid.UUID,
+    fresh: bool = False,
+) -> ProposalJob:
+    db_job = ProposalJob(
+        owner_id=owner_id,
+        input=job_in.model_dump(mode="json", exclude={"webhook_url"}),
+        fresh=fresh,
+        webhook_url=str(job_in.webhook_url) if job_in.webhook_url else None,
+    )
+    session.add(db_job)
+    session.commit()
+    session.refresh(db_job)
+    return db_job
+
+
+def claim_proposal_jobs(
+    *, session: Session, limit: int, stale_after_seconds: int, max_attempts: int
+) -> list[ProposalJob]:
+    """
+    Claim up to `limit` jobs for a worker and mark them running.
+
+    Rows are locked with FOR UPDATE SKIP LOCKED, so concurrent workers never
+    claim the same job and never wait on each other. Jobs left running longer
+    than `stale_after_seconds` (their worker died) are claimed again, until
+    they reach `max_attempts`.
+    """
+    now = datetime.now(timezone.utc)
+    statement = (
+        select(ProposalJob)
+        .where(
+            or_(
+                ProposalJob.status == ProposalJobStatus.pending.value,
+                and_(
+                    ProposalJob.status == ProposalJobStatus.running.value,
+                    ProposalJob.started_at  # type: ignore[operator]
+                    < now - timedelta(seconds=stale_after_seconds),
+                ),
+            )
+        )
+        .order_by(ProposalJob.created_at)  # type: ignore[arg-type]
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    claimed = []
+    for job in session.exec(statement).all():
+        if job.attempts >= max_attempts:
+            job.status = ProposalJobStatus.failed.value
+            job.error = f"Gave up after {job.attempts} attempts" + (
+                f": {job.error}" if job.error else ""
+            )
+            job.finished_at = now
+        else:
+            job.status = ProposalJobStatus.running.value
+            job.started_at = now
+            job.attempts += 1
+            claimed.append(job)
+        session.add(job)
+    session.commit()
+    return claimed
+
+
+def finish_proposal_job(
+    *,
+    session: Session,
+    job_id: uuid.UUID,
+    proposal_text: str | None = None,
+    model_used: str | None = None,
+    cached: bool = False,
+    error: str | None = None,
+    retry: bool = False,
+) -> ProposalJob | None:
+    """
+    Record the outcome of a job; a retryable error puts it back in the queue.
+
+    A proposal is saved to the owner's history like one generated through the
+    API: with the model that served it, and if `cached`, only if the owner
+    doesn't have it yet.
+    """
+    job = session.get(ProposalJob, job_id)
+    if not job:
+        return None
+    if error is None:
+        job.status = ProposalJobStatus.succeeded.value
+        job.proposal_text = proposal_text
+        job.error = None
+        job.finished_at = datetime.now(timezone.utc)
+        # Saved to the owner's history in the same transaction
+        proposal_in = ProposalCreate(
+            job_title=job.input["job_title"],
+            proposal_text=proposal_text or "",
+            model=model_used or job.input.get("model") or settings.DEFAULT_LLM_MODEL,
+            input=job.input,
+            reused=cached,
+        )
+        session.add_all(
+            _new_proposals(
+                session=session, proposals_in=[proposal_in], owner_id=job.owner_id
+            )
+        )
+    elif retry:
+        job.status = ProposalJobStatus.pending.value
+        job.error = error
+        job.started_at = None
+    else:
+        job.status = ProposalJobStatus.failed.value
+        job.error = error
+        job.finished_at = datetime.now(timezone.utc)
+    session.add(job)
+    session.commit()
+    session.refresh(job)
+    return job
+
+
+def mark_proposal_job_webhook_delivered(*, session: Session, job_id: uuid.UUID) -> None:
+    job = session.get(ProposalJob, job_id)
+    if job:
+        job.webhook_delivered_at = datetime.now(timezone.utc)
+        session.add(job)
+        session.commit()
+
+
+def reconcile_counters(*, session: Session, batch_size: int = 1000) -> int:
+    """
+    Recount the maintained row counts, and fix the ones that drifted.
+
+    Owners are recounted in batches, each in a transaction that first locks
+    the batch's counters: item changes of those owners wait for the recount
+    to commit, so none is lost or counted twice. Returns how many counters
+    were fixed.
+    """
+    fixed = 0
+    session.exec(
+        select(RowCount).where(RowCount.name == counters.USER_COUNT).with_for_update()
+    ).first()
+    users = session.exec(select(func.count()).select_from(User)).one()
+    stored_users = session.exec(counters.row_count(counters.USER_COUNT)).one()
+    if users != stored_users:
+        session.execute(
+            counters.change_row_count(counters.USER_COUNT, users - stored_users)
+        )
+        fixed += 1
+    session.commit()
+
+    after: uuid.UUID | None = None
+    while True:
+        statement = select(User.id).order_by(col(User.id)).limit(batch_size)
+        if after is not None:
+            statement = statement.where(col(User.id) > after)
+        owner_ids = session.exec(statement).all()
+        if not owner_ids:
+            break
+        stored = dict(
+            session.exec(
+                select(ItemCount.owner_id, ItemCount.count)
+                .where(col(ItemCount.owner_id).in_(owner_ids))
+                .with_for_update()
+            ).all()
+        )
+        actual = dict(
+            session.exec(
+                select(Item.owner_id, func.count())
+                .where(col(Item.owner_id).in_(owner_ids))
+                .group_by(col(Item.owner_id))
+            ).all()
+        )
+        for owner_id in owner_ids:
+            delta = actual.get(owner_id, 0) - stored.get(owner_id, 0)
+            if delta:
+                session.execute(counters.change_item_count(owner_id, delta))
+                fixed += 1
+        session.commit()
+        after = owner_ids[-1]
+    return fixed
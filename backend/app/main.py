@@ -1,10 +1,20 @@
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
 import sentry_sdk
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.routing import APIRoute
+from sqlmodel.ext.asyncio.session import AsyncSession
 from starlette.middleware.cors import CORSMiddleware
 
 from app.api.main import api_router
+from app.core.api_key_usage import api_key_usage
+from app.core.compression import CompressionMiddleware
 from app.core.config import settings
+from app.core.db import async_engine
+from app.core.password_hashing import PasswordHashQueueFull
+from app.core.security import password_hasher
 
 
 def custom_generate_unique_id(route: APIRoute) -> str:
@@ -14,12 +24,37 @@ def custom_generate_unique_id(route: APIRoute) -> str:
 if settings.SENTRY_DSN and settings.ENVIRONMENT != "local":
     sentry_sdk.init(dsn=str(settings.SENTRY_DSN), enable_tracing=True)
 
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI) -> AsyncIterator[None]:
+    yield
+    if len(api_key_usage):
+        async with AsyncSession(async_engine) as session:
+            await api_key_usage.flush(session)
+    password_hasher.shutdown()
+    await async_engine.dispose()
+
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
     generate_unique_id_function=custom_generate_unique_id,
+    lifespan=lifespan,
 )
 
+
+@app.exception_handler(PasswordHashQueueFull)
+def password_hash_queue_full_handler(
+    _request: Request, _exc: PasswordHashQueueFull
+) -> JSONResponse:
+    # A login storm: shed load instead of queueing every request behind bcrypt
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Too many password requests, please retry shortly"},
+        headers={"Retry-After": "5"},
+    )
+
+
 # Set all CORS enabled origins
 if settings.all_cors_origins:
     app.add_middleware(
@@ -30,4 +65,10 @@ if settings.all_cors_origins:
         allow_headers=["*"],
     )
 
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MIN_SIZE,
+    max_request_size=settings.REQUEST_MAX_DECOMPRESSED_SIZE,
+)
+
 app.include_router(api_router, prefix=settings.API_V1_STR)
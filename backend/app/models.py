@@ -1,10 +1,14 @@
 import uuid
-from datetime import datetime
-from typing import List, Optional
+from datetime import datetime, timezone
+from enum import Enum
+from typing import Any
 
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import AnyHttpUrl, BaseModel, EmailStr, Field, field_validator
+from sqlalchemy import JSON, Column, DateTime, Index, Text, func
 from sqlmodel import Field, Relationship, SQLModel
 
+from app.core.config import settings
+
 
 # Shared properties
 class UserBase(SQLModel):
@@ -46,6 +50,16 @@ class User(UserBase, table=True):
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     hashed_password: str
     items: list["Item"] = Relationship(back_populates="owner", cascade_delete=True)
+    # Deleted by the database's ON DELETE CASCADE, without loading them first
+    proposal_jobs: list["ProposalJob"] = Relationship(
+        back_populates="owner", cascade_delete=True, passive_deletes=True
+    )
+    proposals: list["Proposal"] = Relationship(
+        back_populates="owner", cascade_delete=True, passive_deletes=True
+    )
+    api_keys: list["ApiKey"] = Relationship(
+        back_populates="owner", cascade_delete=True, passive_deletes=True
+    )
 
 
 # Properties to return via API, id is always required
@@ -55,7 +69,10 @@ class UserPublic(UserBase):
 
 class UsersPublic(SQLModel):
     data: list[UserPublic]
-    count: int
+    # Only on the first page (requests without a cursor)
+    count: int | None = None
+    # Pass as `cursor` to get the next page; None on the last page
+    next_cursor: str | None = None
 
 
 # Shared properties
@@ -76,12 +93,20 @@ class ItemUpdate(ItemBase):
 
 # Database model, database table inferred from class name
 class Item(ItemBase, table=True):
+    __table_args__ = (
+        # Items are listed per owner, paginated on id
+        Index("ix_item_owner_id_id", "owner_id", "id"),
+    )
+
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     title: str = Field(max_length=255)
     owner_id: uuid.UUID = Field(
         foreign_key="user.id", nullable=False, ondelete="CASCADE"
     )
     owner: User | None = Relationship(back_populates="items")
+    # Incremented by every update; item ETags are derived from it, so an
+    # unchanged item is recognized without loading it
+    version: int = Field(default=1, sa_column_kwargs={"server_default": "1"})
 
 
 # Properties to return via API, id is always required
@@ -90,9 +115,68 @@ class ItemPublic(ItemBase):
     owner_id: uuid.UUID
 
 
+# Bulk item operations, applied in one transaction
+class ItemsBulkCreate(SQLModel):
+    items: list[ItemCreate] = Field(min_length=1)
+
+
+# Properties to receive on bulk update: the item's id and the fields to change
+class ItemBulkUpdate(ItemUpdate):
+    id: uuid.UUID
+
+
+class ItemsBulkUpdate(SQLModel):
+    items: list[ItemBulkUpdate] = Field(min_length=1)
+
+
+class ItemsBulkDelete(SQLModel):
+    ids: list[uuid.UUID] = Field(min_length=1)
+
+
+# Outcome of one row of a bulk operation, by its index in the request
+class ItemBulkResult(SQLModel):
+    index: int
+    id: uuid.UUID | None = None
+    item: ItemPublic | None = None
+    error: str | None = None
+
+
+class ItemsBulkResult(SQLModel):
+    results: list[ItemBulkResult]
+
+
+class ItemImportError(SQLModel):
+    # 1-based line number in the uploaded file
+    line: int
+    error: str
+
+
+class ItemsImportResult(SQLModel):
+    imported: int
+    # Rows with errors are skipped; only the first ones are reported
+    errors: list[ItemImportError]
+
+
+# Maintained item count per owner (app.core.counters)
+class ItemCount(SQLModel, table=True):
+    owner_id: uuid.UUID = Field(
+        foreign_key="user.id", primary_key=True, ondelete="CASCADE"
+    )
+    count: int = 0
+
+
+# Maintained row counts of whole tables, by name (app.core.counters)
+class RowCount(SQLModel, table=True):
+    name: str = Field(primary_key=True, max_length=64)
+    count: int = 0
+
+
 class ItemsPublic(SQLModel):
     data: list[ItemPublic]
-    count: int
+    # Only on the first page (requests without a cursor)
+    count: int | None = None
+    # Pass as `cursor` to get the next page; None on the last page
+    next_cursor: str | None = None
 
 
 # Generic message
@@ -104,11 +188,88 @@ class Message(SQLModel):
 class Token(SQLModel):
     access_token: str
     token_type: str = "bearer"
+    # Only issued with JWT_STATELESS_CLAIMS
+    refresh_token: str | None = None
 
 
 # Contents of JWT token
 class TokenPayload(SQLModel):
     sub: str | None = None
+    # Set on stateless tokens (JWT_STATELESS_CLAIMS)
+    type: str | None = None
+    jti: str | None = None
+    iat: float | None = None
+    email: str | None = None
+    full_name: str | None = None
+    is_active: bool | None = None
+    is_superuser: bool | None = None
+
+
+class RefreshTokenRequest(SQLModel):
+    refresh_token: str
+
+
+# Revoked tokens: a single token (jti), or every token of a user issued
+# before revoked_at (user_id). Rows can be purged once expires_at has passed.
+class RevokedToken(SQLModel, table=True):
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    jti: str | None = Field(default=None, max_length=64, unique=True, index=True)
+    user_id: uuid.UUID | None = Field(default=None, index=True)
+    # "access" revokes access tokens only, "all" refresh tokens too
+    scope: str = Field(default="all", max_length=10)
+    # Set by the database when revoking (see app.async_crud), so every
+    # process dates revocations on the same clock
+    revoked_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        sa_type=DateTime(timezone=True),
+        sa_column_kwargs={"server_default": func.now()},
+        index=True,
+    )
+    # Syncs and purges only read the revocations that haven't expired
+    expires_at: datetime = Field(sa_type=DateTime(timezone=True), index=True)
+
+
+# Properties to receive on API key creation
+class ApiKeyCreate(SQLModel):
+    name: str = Field(min_length=1, max_length=255)
+
+
+# Database model for long-lived API keys. Only an HMAC of the key is stored;
+# the prefix, which is part of the key, finds the row to compare it with.
+class ApiKey(SQLModel, table=True):
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    name: str = Field(max_length=255)
+    prefix: str = Field(max_length=16, unique=True, index=True)
+    key_hash: str = Field(max_length=64)
+    owner_id: uuid.UUID = Field(
+        foreign_key="user.id", nullable=False, ondelete="CASCADE", index=True
+    )
+    owner: User | None = Relationship(back_populates="api_keys")
+    created_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        sa_type=DateTime(timezone=True),
+    )
+    # Written in batches (app.core.api_key_usage), so it can lag a minute
+    last_used_at: datetime | None = Field(default=None, sa_type=DateTime(timezone=True))
+
+
+# Properties to return via API, the key itself is never returned again
+class ApiKeyPublic(SQLModel):
+    id: uuid.UUID
+    name: str
+    prefix: str
+    created_at: datetime
+    last_used_at: datetime | None = None
+
+
+class ApiKeysPublic(SQLModel):
+    data: list[ApiKeyPublic]
+    count: int
+
+
+# Returned once, on creation
+class ApiKeyCreated(ApiKeyPublic):
+    key: str
 
 
 class NewPassword(SQLModel):
@@ -116,20 +277,33 @@ class NewPassword(SQLModel):
     new_password: str = Field(min_length=8, max_length=40)
 
 
-# Proposal Generator Models - Using Pydantic BaseModel since these don't need DB persistence
+# Proposal Generator Models - request/response schemas, not stored as-is
 class ProposalGeneratorInput(BaseModel):
     job_title: str = Field(min_length=1)
     job_description: str = Field(min_length=1)
-    skills: List[str] = Field(min_length=1)
-    additional_context: Optional[str] = None
-    
+    skills: list[str] = Field(min_length=1)
+    additional_context: str | None = None
+    # Optional per-request generation settings (default to config)
+    model: str | None = Field(default=None, min_length=1, max_length=100)
+    temperature: float | None = Field(default=None, ge=0.0, le=1.0)
+
+    @field_validator("model")
+    @classmethod
+    def check_model_allowed(cls, model: str | None) -> str | None:
+        # Every model gets its own pooled generator and provider budget
+        if model is not None and model not in settings.all_llm_models:
+            raise ValueError(
+                f"Model must be one of: {', '.join(settings.all_llm_models)}"
+            )
+        return model
+
     model_config = {
         "json_schema_extra": {
             "example": {
                 "job_title": "Python Developer for Web Scraping Project",
                 "job_description": "Looking for an experienced Python developer to build a web scraper...",
                 "skills": ["Python", "BeautifulSoup", "FastAPI"],
-                "additional_context": "I have 5 years of experience with similar projects"
+                "additional_context": "I have 5 years of experience with similar projects",
             }
         }
     }
@@ -138,12 +312,282 @@ class ProposalGeneratorInput(BaseModel):
 class ProposalGeneratorOutput(BaseModel):
     proposal_text: str = Field(min_length=1)
     generation_time: datetime
-    
+    # Where the proposal came from, for the history; never sent to clients
+    model_used: str | None = Field(default=None, exclude=True)
+    # Served from the cache or shared with an identical request, not newly generated
+    cached: bool = Field(default=False, exclude=True)
+
     model_config = {
         "json_schema_extra": {
             "example": {
                 "proposal_text": "Hello! I'm an experienced Python developer with expertise in web scraping...",
-                "generation_time": "2023-03-19T12:34:56.789Z"
+                "generation_time": "2023-03-19T12:34:56.789Z",
             }
         }
     }
+
+
+class ProposalJobStatus(str, Enum):
+    pending = "pending"
+    running = "running"
+    succeeded = "succeeded"
+    failed = "failed"
+
+
+# Properties to receive on job creation: the generation input plus an optional webhook
+class ProposalJobCreate(ProposalGeneratorInput):
+    webhook_url: AnyHttpUrl | None = None
+
+    @field_validator("webhook_url")
+    @classmethod
+    def check_webhook_scheme(cls, url: AnyHttpUrl | None) -> AnyHttpUrl | None:
+        # The host is checked by the route, which can afford to resolve it
+        if url is not None and url.scheme != "https":
+            raise ValueError("Webhook URL must use https")
+        return url
+
+
+# Database model for queued proposal generations, processed by app.proposal_worker
+class ProposalJob(SQLModel, table=True):
+    __table_args__ = (
+        # Workers claim the oldest pending jobs first
+        Index("ix_proposaljob_status_created_at", "status", "created_at"),
+    )
+
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    owner_id: uuid.UUID = Field(
+        foreign_key="user.id", nullable=False, ondelete="CASCADE", index=True
+    )
+    owner: User | None = Relationship(back_populates="proposal_jobs")
+    status: str = Field(default=ProposalJobStatus.pending.value, max_length=20)
+    input: dict[str, Any] = Field(sa_column=Column(JSON, nullable=False))
+    fresh: bool = False
+    webhook_url: str | None = Field(default=None, max_length=2048)
+    proposal_text: str | None = Field(default=None, sa_column=Column(Text))
+    error: str | None = Field(default=None, sa_column=Column(Text))
+    attempts: int = 0
+    created_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        sa_type=DateTime(timezone=True),
+    )
+    started_at: datetime | None = Field(default=None, sa_type=DateTime(timezone=True))
+    finished_at: datetime | None = Field(default=None, sa_type=DateTime(timezone=True))
+    webhook_delivered_at: datetime | None = Field(
+        default=None, sa_type=DateTime(timezone=True)
+    )
+
+
+# Properties to return via API
+class ProposalJobPublic(BaseModel):
+    id: uuid.UUID
+    status: ProposalJobStatus
+    attempts: int
+    created_at: datetime
+    started_at: datetime | None = None
+    finished_at: datetime | None = None
+    output: ProposalGeneratorOutput | None = None
+    error: str | None = None
+
+    @classmethod
+    def from_job(cls, job: ProposalJob) -> "ProposalJobPublic":
+        output = None
+        if job.proposal_text is not None and job.finished_at is not None:
+            output = ProposalGeneratorOutput(
+                proposal_text=job.proposal_text, generation_time=job.finished_at
+            )
+        return cls(
+            id=job.id,
+            status=ProposalJobStatus(job.status),
+            attempts=job.attempts,
+            created_at=job.created_at,
+            started_at=job.started_at,
+            finished_at=job.finished_at,
+            output=output,
+            error=job.error,
+        )
+
+
+# Shared properties of saved proposals
+class ProposalBase(SQLModel):
+    job_title: str
+    proposal_text: str
+    model: str | None = Field(default=None, max_length=100)
+
+
+# Properties to receive on proposal creation
+class ProposalCreate(ProposalBase):
+    input: dict[str, Any]
+    # Served from the cache or shared with an identical request: saved only if
+    # the owner doesn't have it yet
+    reused: bool = Field(default=False, exclude=True)
+
+
+# Database model for the proposal history. Postgres compresses long text
+# values itself (TOAST), so proposals are stored as plain, searchable text.
+class Proposal(ProposalBase, table=True):
+    __table_args__ = (
+        # History is listed newest first per owner, paginated on (created_at, id)
+        Index("ix_proposal_owner_id_created_at_id", "owner_id", "created_at", "id"),
+    )
+
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    owner_id: uuid.UUID = Field(
+        foreign_key="user.id", nullable=False, ondelete="CASCADE"
+    )
+    owner: User | None = Relationship(back_populates="proposals")
+    job_title: str = Field(sa_column=Column(Text, nullable=False))
+    proposal_text: str = Field(sa_column=Column(Text, nullable=False))
+    input: dict[str, Any] = Field(sa_column=Column(JSON, nullable=False))
+    created_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        sa_type=DateTime(timezone=True),
+    )
+
+
+# Properties to return via API, id is always required
+class ProposalPublic(ProposalBase):
+    id: uuid.UUID
+    created_at: datetime
+    input: dict[str, Any]
+
+
+class ProposalsPublic(SQLModel):
+    data: list[ProposalPublic]
+    # Pass as `cursor` to get the next page; None on the last page
+    next_cursor: str | None = None
+
+
+class ProposalPromptPreview(BaseModel):
+    model: str
+    prompt: str
+    prompt_tokens: int
+    prompt_budget_tokens: int
+    max_output_tokens: int
+    truncated_fields: list[str] = []
+
+
+class ProposalBatchInput(BaseModel):
+    items: list[ProposalGeneratorInput] = Field(min_length=1)
+    concurrency: int | None = Field(default=None, ge=1)
+
+    model_config = {
+        "json_schema_extra": {
+            "example": {
+                "items": [
+                    {
+                        "job_title": "Python Developer for Web Scraping Project",
+                        "job_description": "Looking for an experienced Python developer to build a web scraper...",
+                        "skills": ["Python", "BeautifulSoup", "FastAPI"],
+                    },
+                    {
+                        "job_title": "React Developer for E-commerce Dashboard",
+                        "job_description": "Looking for a React developer to build a responsive dashboard...",
+                        "skills": ["React", "TypeScript"],
+                    },
+                ],
+                "concurrency": 2,
+            }
+        }
+    }
+
+
+class ProposalBatchItemResult(BaseModel):
+    index: int
+    output: ProposalGeneratorOutput | None = None
+    error: str | None = None
+
+
+class ProposalBatchOutput(BaseModel):
+    results: list[ProposalBatchItemResult]
+
+
+class ProposalCacheStats(BaseModel):
+    size: int
+    max_size: int
+    ttl_seconds: float
+    hits: int
+    misses: int
+    evictions: int
+
+
+class ProposalGeneratorPoolStats(BaseModel):
+    size: int
+    max_size: int
+    hits: int
+    misses: int
+    evictions: int
+
+
+class ProposalInFlightStats(BaseModel):
+    in_flight: int
+    coalesced: int
+
+
+class ProviderSchedulerStats(BaseModel):
+    provider: str
+    concurrency_limit: int
+    in_flight: int
+    queue_depth: int
+    rpm_limit: int
+    tpm_limit: int
+    requests_in_window: int
+    tokens_in_window: int
+    admitted: int
+    rate_limited: int
+    timed_out: int
+    last_wait_seconds: float
+    max_wait_seconds: float
+    avg_wait_seconds: float
+
+
+class LLMBackendStats(BaseModel):
+    model_name: str
+    provider: str
+    temperature: float | None = None
+    calls: int
+    failures: int
+    wins: int
+    hedges: int
+    hedge_wins: int
+    failovers: int
+    p50_latency_seconds: float | None = None
+    p95_latency_seconds: float | None = None
+    p99_latency_seconds: float | None = None
+
+
+class ProposalServiceStats(BaseModel):
+    cache: ProposalCacheStats | None = None
+    pool: ProposalGeneratorPoolStats | None = None
+    inflight: ProposalInFlightStats | None = None
+    schedulers: list[ProviderSchedulerStats] = []
+    backends: list[LLMBackendStats] = []
+
+
+# Database connection pool metrics, per worker process
+class HistogramStats(BaseModel):
+    # Bucket upper bounds; counts has one more entry, for values above the last bound
+    buckets: list[float]
+    counts: list[int]
+    count: int
+    sum: float
+    max: float
+
+
+class DatabasePoolStats(BaseModel):
+    name: str
+    pool_size: int | None = None
+    max_overflow: int | None = None
+    timeout_seconds: float | None = None
+    recycle_seconds: int | None = None
+    pre_ping: bool | None = None
+    checked_out: int | None = None
+    idle: int | None = None
+    overflow: int | None = None
+    peak_checked_out: int
+    checkouts: int
+    overflow_checkouts: int
+    timeouts: int
+    connections_opened: int
+    connections_closed: int
+    checkout_wait_ms: HistogramStats
+    connection_lifetime_seconds: HistogramStats
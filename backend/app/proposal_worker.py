@@ -0,0 +1,207 @@
+"""Standalone worker that processes queued proposal generation jobs.
+
+Run it with `python -m app.proposal_worker`. Every worker claims pending jobs
+from the database (FOR UPDATE SKIP LOCKED, so any number of workers can run
+side by side) and generates up to PROPOSAL_WORKER_CONCURRENCY proposals at a
+time, so generation capacity scales independently of the API servers.
+"""
+
+import asyncio
+import logging
+import signal
+import uuid
+
+import httpx
+from sqlmodel import Session
+
+from app import crud
+from app.core.config import settings
+from app.core.db import engine
+from app.core.webhooks import WebhookURLError, check_webhook_url
+from app.models import (
+    ProposalGeneratorInput,
+    ProposalJob,
+    ProposalJobPublic,
+    ProposalJobStatus,
+)
+from app.services.proposal_generator import (
+    ProposalGenerationError,
+    ProposalRateLimitError,
+    generate_proposal,
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def claim_jobs(limit: int) -> list[ProposalJob]:
+    # Claimed jobs are used after the session closes, so keep their loaded state
+    with Session(engine, expire_on_commit=False) as session:
+        return crud.claim_proposal_jobs(
+            session=session,
+            limit=limit,
+            stale_after_seconds=settings.PROPOSAL_JOB_STALE_AFTER_SECONDS,
+            max_attempts=settings.PROPOSAL_JOB_MAX_ATTEMPTS,
+        )
+
+
+def finish_job(
+    job_id: uuid.UUID,
+    proposal_text: str | None = None,
+    model_used: str | None = None,
+    cached: bool = False,
+    error: str | None = None,
+    retry: bool = False,
+) -> ProposalJob | None:
+    with Session(engine, expire_on_commit=False) as session:
+        return crud.finish_proposal_job(
+            session=session,
+            job_id=job_id,
+            proposal_text=proposal_text,
+            model_used=model_used,
+            cached=cached,
+            error=error,
+            retry=retry,
+        )
+
+
+def mark_webhook_delivered(job_id: uuid.UUID) -> None:
+    with Session(engine) as session:
+        crud.mark_proposal_job_webhook_delivered(session=session, job_id=job_id)
+
+
+async def deliver_webhook(client: httpx.AsyncClient, job: ProposalJob) -> bool:
+    """POST the finished job to its webhook URL, retrying with backoff."""
+    assert job.webhook_url is not None
+    try:
+        # Checked again: the host may resolve elsewhere since the job was created
+        await asyncio.to_thread(check_webhook_url, job.webhook_url)
+    except WebhookURLError as e:
+        logger.warning(
+            "Proposal job webhook rejected",
+            extra={"job_id": str(job.id), "error": str(e)},
+        )
+        return False
+    payload = ProposalJobPublic.from_job(job).model_dump(mode="json")
+    for attempt in range(1, settings.PROPOSAL_JOB_WEBHOOK_ATTEMPTS + 1):
+        try:
+            # A redirect could point anywhere, so it counts as a failure
+            response = await client.post(
+                job.webhook_url, json=payload, follow_redirects=False
+            )
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            logger.warning(
+                "Proposal job webhook failed",
+                extra={"job_id": str(job.id), "attempt": attempt, "error": str(e)},
+            )
+            if attempt < settings.PROPOSAL_JOB_WEBHOOK_ATTEMPTS:
+                await asyncio.sleep(2**attempt)
+            continue
+        await asyncio.to_thread(mark_webhook_delivered, job.id)
+        return True
+    return False
+
+
+async def process_job(job: ProposalJob, client: httpx.AsyncClient) -> None:
+    """Generate the proposal for a claimed job and record the outcome."""
+    logger.info(
+        "Processing proposal job",
+        extra={"job_id": str(job.id), "attempt": job.attempts},
+    )
+    try:
+        input_data = ProposalGeneratorInput.model_validate(job.input)
+        output = await generate_proposal(input_data, fresh=job.fresh)
+    except ProposalRateLimitError as e:
+        # The provider is busy: put the job back for a later attempt
+        finished = await asyncio.to_thread(finish_job, job.id, error=str(e), retry=True)
+    except ProposalGenerationError as e:
+        finished = await asyncio.to_thread(finish_job, job.id, error=str(e))
+    except Exception as e:
+        logger.exception("Unexpected error processing proposal job")
+        finished = await asyncio.to_thread(finish_job, job.id, error=str(e))
+    else:
+        finished = await asyncio.to_thread(
+            finish_job,
+            job.id,
+            proposal_text=output.proposal_text,
+            model_used=output.model_used,
+            cached=output.cached,
+        )
+
+    if finished is None:
+        # The job was deleted (with its owner) while it was running
+        return
+    logger.info(
+        "Proposal job finished",
+        extra={"job_id": str(job.id), "status": finished.status},
+    )
+    if finished.webhook_url and finished.status in (
+        ProposalJobStatus.succeeded,
+        ProposalJobStatus.failed,
+    ):
+        await deliver_webhook(client, finished)
+
+
+async def run_worker(
+    stop: asyncio.Event,
+    concurrency: int | None = None,
+    poll_interval: float | None = None,
+) -> None:
+    """
+    Claim and process jobs until `stop` is set, then finish the running ones.
+    """
+    concurrency = concurrency or settings.PROPOSAL_WORKER_CONCURRENCY
+    poll_interval = poll_interval or settings.PROPOSAL_WORKER_POLL_INTERVAL_SECONDS
+    running: set[asyncio.Task[None]] = set()
+    async with httpx.AsyncClient(
+        timeout=settings.PROPOSAL_JOB_WEBHOOK_TIMEOUT_SECONDS
+    ) as client:
+        while not stop.is_set():
+            free = concurrency - len(running)
+            jobs: list[ProposalJob] = []
+            if free > 0:
+                try:
+                    jobs = await asyncio.to_thread(claim_jobs, free)
+                except Exception:
+                    logger.exception("Failed to claim proposal jobs")
+            for job in jobs:
+                task = asyncio.create_task(process_job(job, client))
+                running.add(task)
+                task.add_done_callback(running.discard)
+
+            # Idle or at capacity: wait for a free slot, the next poll or shutdown
+            stop_waiter = asyncio.ensure_future(stop.wait())
+            await asyncio.wait(
+                {stop_waiter, *running},
+                timeout=poll_interval,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            stop_waiter.cancel()
+
+        if running:
+            logger.info(
+                "Waiting for running proposal jobs", extra={"running": len(running)}
+            )
+            await asyncio.gather(*running, return_exceptions=True)
+
+
+async def run() -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+    await run_worker(stop)
+
+
+def main() -> None:
+    logger.info(
+        "Starting proposal worker",
+        extra={"concurrency": settings.PROPOSAL_WORKER_CONCURRENCY},
+    )
+    asyncio.run(run())
+    logger.info("Proposal worker stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+"""Outbound request scheduling for LLM providers.
+
+Every call to a provider goes through a ProviderScheduler, which keeps the
+process within its share of the provider's requests-per-minute and
+tokens-per-minute budgets and adapts how many calls it lets run at once:
+the concurrency limit grows slowly while calls succeed and is halved when the
+provider answers with a rate-limit or overload error (AIMD). Calls that would
+exceed the budget wait in a queue instead of failing.
+"""
+
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from typing import Any
+
+from app.core.config import settings
+
+logger = logging.getLogger("llm_scheduler")
+
+# Status codes providers use for "slow down": 429 (rate limited), 529 (Anthropic overloaded)
+RATE_LIMIT_STATUS_CODES = {429, 529}
+RATE_LIMIT_ERROR_NAMES = {"RateLimitError", "OverloadedError"}
+
+
+class SchedulerQueueTimeout(Exception):
+    """Raised when a request waited too long for an outbound slot."""
+
+    pass
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """Return True if the provider rejected a call because of rate limits or overload."""
+    status_code = getattr(error, "status_code", None)
+    if status_code is None:
+        status_code = getattr(getattr(error, "response", None), "status_code", None)
+    return (
+        status_code in RATE_LIMIT_STATUS_CODES
+        or type(error).__name__ in RATE_LIMIT_ERROR_NAMES
+    )
+
+
+class ProviderScheduler:
+    """
+    Admission control for calls to a single LLM provider.
+
+    Usage:
+        async with scheduler.slot(estimated_tokens):
+            await llm.ainvoke(...)
+    """
+
+    def __init__(
+        self,
+        provider: str,
+        rpm_limit: int = 0,
+        tpm_limit: int = 0,
+        max_concurrency: int = 16,
+        min_concurrency: int = 1,
+        max_wait_seconds: float = 60.0,
+        window_seconds: float = 60.0,
+    ):
+        """
+        Initialize a scheduler.
+
+        Args:
+            provider: Provider name, used in logs and metrics
+            rpm_limit: Requests allowed per window (0 for unlimited)
+            tpm_limit: Estimated prompt tokens allowed per window (0 for unlimited)
+            max_concurrency: Upper bound for the adaptive concurrency limit
+            min_concurrency: Lower bound for the adaptive concurrency limit
+            max_wait_seconds: How long a call may queue before giving up
+            window_seconds: Length of the sliding budget window
+        """
+        self.provider = provider
+        self.rpm_limit = rpm_limit
+        self.tpm_limit = tpm_limit
+        self.max_concurrency = max(max_concurrency, min_concurrency)
+        self.min_concurrency = min_concurrency
+        self.max_wait_seconds = max_wait_seconds
+        self.window_seconds = window_seconds
+
+        # Start in the middle and let AIMD find the provider's real capacity
+        self.concurrency_limit = float(max(min_concurrency, self.max_concurrency // 2))
+        self.in_flight = 0
+        self._window: deque[tuple[float, int]] = deque()
+        self._window_tokens = 0
+        self._waiters: deque[asyncio.Future[None]] = deque()
+
+        self.admitted = 0
+        self.rate_limited = 0
+        self.timed_out = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds_observed = 0.0
+        self.last_wait_seconds = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    def _prune(self, now: float) -> None:
+        while self._window and self._window[0][0] <= now - self.window_seconds:
+            _, tokens = self._window.popleft()
+            self._window_tokens -= tokens
+
+    def _admission_delay(self, tokens: int, now: float) -> float:
+        """Return 0 if a call can start now, else how long until it might."""
+        if self.in_flight >= int(self.concurrency_limit):
+            # Woken up by release()
+            return math.inf
+
+        self._prune(now)
+        delay = 0.0
+        if self.rpm_limit and len(self._window) >= self.rpm_limit:
+            delay = self._window[0][0] + self.window_seconds - now
+        if (
+            self.tpm_limit
+            and self._window
+            and self._window_tokens + tokens > self.tpm_limit
+        ):
+            # Wait until enough earlier calls leave the window. A single call larger
+            # than the whole budget is let through once the window is empty.
+            excess = self._window_tokens + tokens - self.tpm_limit
+            for started_at, used in self._window:
+                excess -= used
+                if excess <= 0:
+                    delay = max(delay, started_at + self.window_seconds - now)
+                    break
+        return max(delay, 0.0)
+
+    async def acquire(self, tokens: int) -> None:
+        """Wait until the budget and concurrency limit allow another call."""
+        loop = asyncio.get_running_loop()
+        start = time.monotonic()
+        # Queue behind earlier callers instead of overtaking them
+        must_queue = bool(self._waiters)
+
+        while True:
+            now = time.monotonic()
+            delay = math.inf if must_queue else self._admission_delay(tokens, now)
+            if delay == 0:
+                break
+
+            remaining = self.max_wait_seconds - (now - start)
+            if remaining <= 0:
+                self.timed_out += 1
+                self._wake()
+                raise SchedulerQueueTimeout(
+                    f"Timed out after {self.max_wait_seconds:.0f}s waiting for a {self.provider} request slot"
+                )
+
+            waiter: asyncio.Future[None] = loop.create_future()
+            self._waiters.append(waiter)
+            try:
+                await asyncio.wait_for(waiter, timeout=min(delay, remaining))
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+            must_queue = False
+
+        self.in_flight += 1
+        self._window.append((now, tokens))
+        self._window_tokens += tokens
+        self.admitted += 1
+        if self.in_flight < int(self.concurrency_limit):
+            # Callers queued behind this one may fit too
+            self._wake()
+
+        waited = now - start
+        self.last_wait_seconds = waited
+        self.total_wait_seconds += waited
+        self.max_wait_seconds_observed = max(self.max_wait_seconds_observed, waited)
+        if waited > 1:
+            logger.info(
+                "LLM request was queued",
+                extra={
+                    "provider": self.provider,
+                    "wait_seconds": waited,
+                    "queue_depth": self.queue_depth,
+                },
+            )
+
+    def release(self, rate_limited: bool = False, cancelled: bool = False) -> None:
+        """
+        Finish a call and adapt the concurrency limit to its outcome.
+
+        A cancelled call (a hedge that lost, a client that went away) says
+        nothing about the provider's capacity and leaves the limit alone.
+        """
+        self.in_flight -= 1
+        if rate_limited:
+            self.rate_limited += 1
+            self.concurrency_limit = max(
+                float(self.min_concurrency), self.concurrency_limit / 2
+            )
+            logger.warning(
+                "Provider rate limited, reducing concurrency",
+                extra={
+                    "provider": self.provider,
+                    "concurrency_limit": int(self.concurrency_limit),
+                },
+            )
+        elif not cancelled:
+            # Additive increase: roughly +1 per window of `limit` successful calls
+            self.concurrency_limit = min(
+                float(self.max_concurrency),
+                self.concurrency_limit + 1 / self.concurrency_limit,
+            )
+        self._wake()
+
+    def _wake(self) -> None:
+        """Let the queued callers re-check whether they can start."""
+        for waiter in self._waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self, tokens: int) -> AsyncIterator[None]:
+        """Hold an outbound slot for the duration of one provider call."""
+        await self.acquire(tokens)
+        try:
+            yield
+        except asyncio.CancelledError:
+            self.release(cancelled=True)
+            raise
+        except BaseException as e:
+            self.release(rate_limited=is_rate_limit_error(e))
+            raise
+        else:
+            self.release()
+
+    def stats(self) -> dict[str, Any]:
+        """Return the current limit, queue depth and wait-time metrics."""
+        self._prune(time.monotonic())
+        return {
+            "provider": self.provider,
+            "concurrency_limit": int(self.concurrency_limit),
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "rpm_limit": self.rpm_limit,
+            "tpm_limit": self.tpm_limit,
+            "requests_in_window": len(self._window),
+            "tokens_in_window": self._window_tokens,
+            "admitted": self.admitted,
+            "rate_limited": self.rate_limited,
+            "timed_out": self.timed_out,
+            "last_wait_seconds": self.last_wait_seconds,
+            "max_wait_seconds": self.max_wait_seconds_observed,
+            "avg_wait_seconds": self.total_wait_seconds / self.admitted
+            if self.admitted
+            else 0.0,
+        }
+
+
+# Schedulers are per process, keyed by provider name
+_schedulers: dict[str, ProviderScheduler] = {}
+
+
+def _per_worker(limit: int) -> int:
+    """Split a provider-wide budget evenly between the server's worker processes."""
+    if limit <= 0:
+        return 0
+    return max(1, limit // max(1, settings.LLM_SCHEDULER_WORKERS))
+
+
+def get_scheduler(provider: str) -> ProviderScheduler:
+    """
+    Get or create the scheduler for a provider ("anthropic" or "openai").
+
+    Budgets come from settings and are divided by LLM_SCHEDULER_WORKERS, so
+    the combined traffic of all workers stays within the provider limits.
+    """
+    scheduler = _schedulers.get(provider)
+    if scheduler is None:
+        if provider == "anthropic":
+            rpm_limit, tpm_limit = (
+                settings.ANTHROPIC_RPM_LIMIT,
+                settings.ANTHROPIC_TPM_LIMIT,
+            )
+        else:
+            rpm_limit, tpm_limit = settings.OPENAI_RPM_LIMIT, settings.OPENAI_TPM_LIMIT
+        scheduler = ProviderScheduler(
+            provider,
+            rpm_limit=_per_worker(rpm_limit),
+            tpm_limit=_per_worker(tpm_limit),
+            max_concurrency=settings.LLM_MAX_CONCURRENCY,
+            max_wait_seconds=settings.LLM_MAX_QUEUE_WAIT_SECONDS,
+        )
+        _schedulers[provider] = scheduler
+    return scheduler
+
+
+def get_scheduler_stats() -> list[dict[str, Any]]:
+    """Return metrics for every provider used by this process."""
+    return [scheduler.stats() for scheduler in _schedulers.values()]
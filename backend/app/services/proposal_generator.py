@@ -1,31 +1,55 @@
 """Service for generating Upwork proposal texts using LangChain."""
 
+import asyncio
+import functools
+import hashlib
 import json
 import logging
+import math
+import string
+import threading
 import time
+from collections import OrderedDict, deque
+from collections.abc import AsyncIterator, Awaitable, Callable, Sequence
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, TypeVar
 
-from langchain.chains import LLMChain
-from langchain.prompts import PromptTemplate
 from langchain_anthropic import ChatAnthropic
 from langchain_openai import ChatOpenAI
-from pydantic import ValidationError
 
 from app.core.config import settings
-from app.models import ProposalGeneratorInput, ProposalGeneratorOutput
+from app.models import (
+    ProposalGeneratorInput,
+    ProposalGeneratorOutput,
+    ProposalPromptPreview,
+)
+from app.services.llm_scheduler import (
+    SchedulerQueueTimeout,
+    get_scheduler,
+    get_scheduler_stats,
+    is_rate_limit_error,
+)
+from app.services.token_budget import (
+    compact_text,
+    estimate_tokens,
+    output_token_limit,
+    split_budget,
+    truncate_to_tokens,
+)
 
 # Set up logging with structured format
 logger = logging.getLogger("proposal_generator")
 
+T = TypeVar("T")
+
 # Default prompt template
 DEFAULT_TEMPLATE = """
-You are an expert freelancer who specializes in writing effective Upwork proposals. 
+You are an expert freelancer who specializes in writing effective Upwork proposals.
 Your task is to create a high-quality, personalized proposal for a job posting based on the information provided.
 
 Job Title: {job_title}
 
-Job Description: 
+Job Description:
 {job_description}
 
 Skills Required: {skills}
@@ -42,90 +66,560 @@ Create a professional, personalized proposal that:
 PROPOSAL:
 """
 
+# Variables every prompt template is rendered with
+PROMPT_VARIABLES = (
+    "job_title",
+    "job_description",
+    "skills",
+    "additional_context_prompt",
+)
+
+
 class ProposalGenerationError(Exception):
     """Exception raised for errors in the proposal generation process."""
+
     pass
 
 
+class ProposalRateLimitError(ProposalGenerationError):
+    """Exception raised when the AI provider is rate limiting or overloaded."""
+
+    pass
+
+
+def _wrap_generation_error(error: Exception) -> ProposalGenerationError:
+    """Translate a provider or scheduler error into a generation error."""
+    if isinstance(error, SchedulerQueueTimeout) or is_rate_limit_error(error):
+        return ProposalRateLimitError(
+            f"AI provider is busy, please retry shortly: {str(error)}"
+        )
+    return ProposalGenerationError(f"Failed to generate proposal: {str(error)}")
+
+
+class ProposalCache:
+    """
+    Bounded in-process LRU cache of generated proposals with TTL expiry.
+
+    Entries are keyed by a generation fingerprint (see
+    ProposalGenerator.fingerprint). The least recently used entry is evicted
+    when the cache is full, and expired entries are evicted when they are read.
+    """
+
+    def __init__(self, max_size: int = 256, ttl_seconds: float = 600.0):
+        """
+        Initialize an empty cache.
+
+        Args:
+            max_size: Maximum number of proposals kept in memory
+            ttl_seconds: How long a cached proposal stays valid
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, tuple[float, ProposalGeneratorOutput]] = (
+            OrderedDict()
+        )
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> ProposalGeneratorOutput | None:
+        """Return the cached proposal for key, or None if missing or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, output = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.evictions += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return output
+
+    def set(self, key: str, output: ProposalGeneratorOutput) -> None:
+        """Store a proposal, evicting the least recently used entries if full."""
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, output)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop all entries (counters are kept)."""
+        self._entries.clear()
+
+    def stats(self) -> dict[str, Any]:
+        """Return the current size and hit/miss/eviction counters."""
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class _InFlightCall:
+    """A shared in-flight task and the number of callers waiting on it."""
+
+    def __init__(self, task: "asyncio.Task[Any]"):
+        self.task = task
+        self.waiters = 0
+        # Set once the last waiter cancels the task (Task.cancelling() is 3.11+)
+        self.cancelled = False
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical calls into a single in-flight task.
+
+    Every caller that asks for the same key while a call is running awaits the
+    same task and receives the same result (or exception). A caller that is
+    cancelled only detaches itself; the shared task is cancelled when its last
+    waiter goes away.
+    """
+
+    def __init__(self) -> None:
+        self._calls: dict[str, _InFlightCall] = {}
+        self.coalesced = 0
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def run(self, key: str, factory: Callable[[], Awaitable[T]]) -> T:
+        """
+        Await the in-flight call for key, starting it with factory if needed.
+
+        Args:
+            key: Fingerprint identifying identical calls
+            factory: Creates the awaitable to run when no call is in flight
+
+        Returns:
+            The result of the shared call
+        """
+        call = self._calls.get(key)
+        if call is None or not self._joinable(call):
+            task = asyncio.ensure_future(factory())
+            call = _InFlightCall(task)
+            self._calls[key] = call
+            task.add_done_callback(functools.partial(self._forget, key, call))
+        else:
+            self.coalesced += 1
+            logger.debug("Joining in-flight proposal generation", extra={"key": key})
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                logger.info(
+                    "Cancelling proposal generation with no remaining waiters",
+                    extra={"key": key},
+                )
+                call.cancelled = True
+                call.task.cancel()
+
+    @staticmethod
+    def _joinable(call: _InFlightCall) -> bool:
+        # A call whose last waiter left is being cancelled and would hand a new
+        # caller a CancelledError
+        task = call.task
+        return (
+            not task.done()
+            and not call.cancelled
+            and call.waiters > 0
+            and task.get_loop() is asyncio.get_running_loop()
+        )
+
+    def _forget(self, key: str, call: _InFlightCall, task: "asyncio.Task[Any]") -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def stats(self) -> dict[str, int]:
+        """Return the number of running calls and how many callers were coalesced."""
+        return {"in_flight": len(self._calls), "coalesced": self.coalesced}
+
+
+class LLMBackend:
+    """
+    One provider/model a generator can send requests to.
+
+    Keeps a window of recent call latencies, used to decide when a
+    hedged request should go to the next backend, and counts how often this
+    backend won, failed or was launched as a hedge or failover.
+    """
+
+    def __init__(
+        self, model_name: str, provider: str, llm: Any, latency_window: int = 200
+    ):
+        self.model_name = model_name
+        self.provider = provider
+        self.llm = llm
+        self.scheduler = get_scheduler(provider)
+        self.latencies: deque[float] = deque(maxlen=latency_window)
+        self.calls = 0
+        self.failures = 0
+        self.wins = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failovers = 0
+
+    def latency_percentile(
+        self, percentile: float, min_samples: int = 1
+    ) -> float | None:
+        """Return the given latency percentile, or None if there are too few samples."""
+        if len(self.latencies) < max(min_samples, 1):
+            return None
+        ordered = sorted(self.latencies)
+        index = max(0, math.ceil(percentile / 100 * len(ordered)) - 1)
+        return ordered[index]
+
+    def record_lower_bound(self, elapsed: float, percentile: float) -> None:
+        """
+        Record the latency of a call cancelled before it finished.
+
+        The call would have taken at least elapsed seconds, so it is only
+        recorded when that can't lower the given percentile.
+        """
+        current = self.latency_percentile(percentile)
+        if current is None or elapsed >= current:
+            self.latencies.append(elapsed)
+
+    def stats(self) -> dict[str, Any]:
+        """Return call outcomes and latency percentiles for this backend."""
+        return {
+            "model_name": self.model_name,
+            "provider": self.provider,
+            "calls": self.calls,
+            "failures": self.failures,
+            "wins": self.wins,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "failovers": self.failovers,
+            "p50_latency_seconds": self.latency_percentile(50),
+            "p95_latency_seconds": self.latency_percentile(95),
+            "p99_latency_seconds": self.latency_percentile(99),
+        }
+
+
+def _normalize_text(text: str) -> str:
+    """Collapse whitespace so cosmetic differences don't defeat the cache."""
+    return " ".join(text.split())
+
+
 class ProposalGenerator:
     """Service for generating Upwork proposals using LangChain."""
-    
+
     def __init__(
         self,
-        model_name: Optional[str] = None,
-        temperature: float = 0.7,
-        prompt_template: Optional[str] = None,
+        model_name: str | None = None,
+        temperature: float | None = None,
+        prompt_template: str | None = None,
+        cache: ProposalCache | None = None,
+        fallback_models: list[str] | None = None,
     ):
         """
-        Initialize the proposal generator with LangChain components.
-        
+        Initialize the proposal generator with LangChain chat models.
+
         Args:
             model_name: The name of the model to use (defaults to config or "claude-3-haiku-20240307")
-            temperature: Controls randomness in generation (0.0 to 1.0)
+            temperature: Controls randomness in generation (0.0 to 1.0, defaults to config)
             prompt_template: Custom prompt template (if None, uses default template)
+            cache: Optional response cache shared by generators (if None, every call hits the model)
+            fallback_models: Ordered models to hedge to or fail over to (defaults to config)
         """
-        self.model_name = model_name or settings.DEFAULT_LLM_MODEL or "claude-3-haiku-20240307"
-        self.temperature = temperature
+        self.model_name = (
+            model_name or settings.DEFAULT_LLM_MODEL or "claude-3-haiku-20240307"
+        )
+        self.temperature = (
+            settings.DEFAULT_LLM_TEMPERATURE if temperature is None else temperature
+        )
         self.prompt_template = prompt_template or DEFAULT_TEMPLATE
-        
+        self.prompt_template_hash = hashlib.sha256(
+            self.prompt_template.encode("utf-8")
+        ).hexdigest()
+        self.cache = cache
+        self.inflight = SingleFlight()
+        self.fallback_models = (
+            settings.LLM_FALLBACK_MODELS if fallback_models is None else fallback_models
+        )
+        # Cap the response length at roughly the words the prompt asks for
+        self.max_output_tokens = output_token_limit(settings.PROPOSAL_MAX_OUTPUT_WORDS)
+
         logger.info(
             "Initializing ProposalGenerator",
             extra={
                 "model_name": self.model_name,
                 "temperature": self.temperature,
                 "prompt_template_size": len(self.prompt_template),
-            }
+                "fallback_models": self.fallback_models,
+            },
         )
-        
+
+        self.provider, self.llm = self._create_llm(self.model_name)
+
+        # Outbound calls share the provider's rate budget with every other generator
+        self.scheduler = get_scheduler(self.provider)
+
+        # Check the template once, so rendering per call is a plain format_map
+        self._compile_prompt()
+
+        # Ordered backends: the primary model first, then the fallbacks
+        self.backends = [LLMBackend(self.model_name, self.provider, self.llm)]
+        for fallback_model in self.fallback_models:
+            if fallback_model == self.model_name:
+                continue
+            try:
+                provider, llm = self._create_llm(fallback_model)
+            except ProposalGenerationError as e:
+                logger.warning(
+                    "Skipping fallback model",
+                    extra={"model_name": fallback_model, "error": str(e)},
+                )
+                continue
+            self.backends.append(LLMBackend(fallback_model, provider, llm))
+
+    def _create_llm(self, model_name: str) -> tuple[str, Any]:
+        """Create the chat model for a model name, returning (provider, llm)."""
         # Determine which provider to use based on model name
-        if "claude" in self.model_name.lower():
+        if "claude" in model_name.lower():
             if not settings.ANTHROPIC_API_KEY:
                 logger.error("Missing ANTHROPIC_API_KEY for Claude model")
-                raise ProposalGenerationError("ANTHROPIC_API_KEY is required for Claude models")
-            self.llm = ChatAnthropic(
-                model=self.model_name,
+                raise ProposalGenerationError(
+                    "ANTHROPIC_API_KEY is required for Claude models"
+                )
+            llm = ChatAnthropic(
+                model=model_name,
                 temperature=self.temperature,
+                max_tokens=self.max_output_tokens,
                 anthropic_api_key=settings.ANTHROPIC_API_KEY,
             )
             logger.debug("Using Anthropic Claude model")
+            return "anthropic", llm
         else:  # Default to OpenAI
             if not settings.OPENAI_API_KEY:
                 logger.error("Missing OPENAI_API_KEY for OpenAI model")
-                raise ProposalGenerationError("OPENAI_API_KEY is required for OpenAI models")
-            self.llm = ChatOpenAI(
-                model=self.model_name,
+                raise ProposalGenerationError(
+                    "OPENAI_API_KEY is required for OpenAI models"
+                )
+            llm = ChatOpenAI(
+                model=model_name,
                 temperature=self.temperature,
+                max_tokens=self.max_output_tokens,
                 openai_api_key=settings.OPENAI_API_KEY,
             )
             logger.debug("Using OpenAI ChatGPT model")
-        
-        # Set up the LangChain
-        self._setup_chain()
-    
-    def _setup_chain(self) -> None:
-        """Set up the LangChain for proposal generation."""
-        self.prompt = PromptTemplate(
-            template=self.prompt_template,
-            input_variables=["job_title", "job_description", "skills", "additional_context_prompt"],
-        )
-        self.chain = LLMChain(llm=self.llm, prompt=self.prompt)
-        logger.debug("LangChain setup complete")
-    
-    async def generate_proposal(self, input_data: ProposalGeneratorInput) -> ProposalGeneratorOutput:
+            return "openai", llm
+
+    def _compile_prompt(self) -> None:
+        """
+        Validate the prompt template's placeholders.
+
+        Prompts are rendered with str.format_map and sent straight to the chat
+        model, skipping LLMChain's callback and run bookkeeping on every call.
+
+        Raises:
+            ProposalGenerationError: If the template uses unknown placeholders
+        """
+        try:
+            fields = {
+                field_name.split(".")[0].split("[")[0]
+                for _, field_name, _, _ in string.Formatter().parse(
+                    self.prompt_template
+                )
+                if field_name is not None
+            }
+        except ValueError as e:
+            raise ProposalGenerationError(f"Invalid prompt template: {e}")
+        unknown = fields - set(PROMPT_VARIABLES)
+        if unknown:
+            raise ProposalGenerationError(
+                f"Invalid prompt template: unknown placeholders {', '.join(sorted(unknown))}"
+            )
+        logger.debug("Prompt template compiled", extra={"placeholders": sorted(fields)})
+
+    def render_prompt(self, prompt_inputs: dict[str, str]) -> str:
+        """Render the prompt template with the prompt variables."""
+        return self.prompt_template.format_map(prompt_inputs)
+
+    def _build_prompt_inputs(
+        self, input_data: ProposalGeneratorInput
+    ) -> dict[str, str]:
+        """Map the request model onto the prompt template variables."""
+        # Prepare additional context
+        additional_context_prompt = ""
+        if input_data.additional_context:
+            additional_context_prompt = (
+                f"Additional Context: {compact_text(input_data.additional_context)}"
+            )
+
+        return {
+            "job_title": input_data.job_title,
+            "job_description": compact_text(input_data.job_description),
+            # Format skills as a comma-separated list
+            "skills": ", ".join(input_data.skills),
+            "additional_context_prompt": additional_context_prompt,
+        }
+
+    def prepare_prompt(
+        self, input_data: ProposalGeneratorInput
+    ) -> tuple[str, list[str]]:
+        """
+        Render the prompt, trimming free text to fit PROPOSAL_PROMPT_MAX_TOKENS.
+
+        The job description and additional context are compacted first; if the
+        prompt is still over budget they are truncated, the description
+        keeping the larger share.
+
+        Returns:
+            The prompt text and the names of the input fields that were truncated
+        """
+        prompt_inputs = self._build_prompt_inputs(input_data)
+        truncated: list[str] = []
+        budget = settings.PROPOSAL_PROMPT_MAX_TOKENS
+        if budget > 0:
+            fixed_tokens = self.estimate_tokens(
+                self.render_prompt(
+                    {
+                        **prompt_inputs,
+                        "job_description": "",
+                        "additional_context_prompt": "",
+                    }
+                )
+            )
+            description = prompt_inputs["job_description"]
+            context = prompt_inputs["additional_context_prompt"]
+            description_budget, context_budget = split_budget(
+                budget - fixed_tokens,
+                self.estimate_tokens(description),
+                self.estimate_tokens(context),
+            )
+
+            trimmed = truncate_to_tokens(
+                description, description_budget, self.model_name
+            )
+            if trimmed != description:
+                prompt_inputs["job_description"] = trimmed
+                truncated.append("job_description")
+            trimmed = truncate_to_tokens(context, context_budget, self.model_name)
+            if trimmed != context:
+                prompt_inputs["additional_context_prompt"] = trimmed
+                truncated.append("additional_context")
+
+            if truncated:
+                logger.info(
+                    "Trimmed proposal input to fit the prompt budget",
+                    extra={
+                        "truncated_fields": truncated,
+                        "prompt_budget_tokens": budget,
+                    },
+                )
+        return self.render_prompt(prompt_inputs), truncated
+
+    def estimate_tokens(self, text: str) -> int:
+        """Estimate the token count of text for this generator's model."""
+        return estimate_tokens(text, self.model_name)
+
+    def preview_prompt(
+        self, input_data: ProposalGeneratorInput
+    ) -> ProposalPromptPreview:
+        """Return the prompt a request would send, with its token estimates, without calling the model."""
+        prompt_text, truncated = self.prepare_prompt(input_data)
+        return ProposalPromptPreview(
+            model=self.model_name,
+            prompt=prompt_text,
+            prompt_tokens=self.estimate_tokens(prompt_text),
+            prompt_budget_tokens=settings.PROPOSAL_PROMPT_MAX_TOKENS,
+            max_output_tokens=self.max_output_tokens,
+            truncated_fields=truncated,
+        )
+
+    def fingerprint(self, input_data: ProposalGeneratorInput) -> str:
+        """
+        Compute the cache and coalescing key for a generation request.
+
+        The key covers the whitespace-normalized input together with the model,
+        the temperature and a hash of the prompt template, so changing any of
+        them never serves a proposal generated under different settings.
+        """
+        payload = {
+            "job_title": _normalize_text(input_data.job_title),
+            "job_description": _normalize_text(input_data.job_description),
+            "skills": [_normalize_text(skill) for skill in input_data.skills],
+            "additional_context": (
+                _normalize_text(input_data.additional_context)
+                if input_data.additional_context
+                else None
+            ),
+            "model_name": self.model_name,
+            "temperature": self.temperature,
+            "prompt_template_hash": self.prompt_template_hash,
+        }
+        return hashlib.sha256(
+            json.dumps(payload, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+
+    async def generate_proposal(
+        self, input_data: ProposalGeneratorInput, fresh: bool = False
+    ) -> ProposalGeneratorOutput:
         """
         Generate a proposal based on the input data.
-        
+
         Args:
             input_data: The proposal generation input data
-            
+            fresh: Skip the response cache and generate a new variant
+
         Returns:
-            A ProposalGeneratorOutput with the generated proposal text and timestamp
-            
+            A ProposalGeneratorOutput with the generated proposal text and timestamp,
+            the model that served it, and whether it was reused rather than generated
+
         Raises:
             ProposalGenerationError: If there's an error during generation
         """
+        key = self.fingerprint(input_data)
+        if self.cache is not None and not fresh:
+            cached = self.cache.get(key)
+            if cached is not None:
+                logger.info(
+                    "Serving proposal from cache",
+                    extra={"cache_key": key, "model_used": self.model_name},
+                )
+                return cached.model_copy(update={"cached": True})
+
+        started = False
+
+        async def generate() -> ProposalGeneratorOutput:
+            nonlocal started
+            started = True
+            return await self._generate(input_data)
+
+        # Identical concurrent requests (double clicks, re-renders) share one model call;
+        # a fresh request never joins one that may be serving the cached variant
+        flight_key = f"{key}:fresh" if fresh else key
+        output = await self.inflight.run(flight_key, generate)
+        if not started:
+            # Joined another caller's call, which reports the new proposal
+            return output.model_copy(update={"cached": True})
+
+        if self.cache is not None:
+            self.cache.set(key, output)
+        return output
+
+    async def _generate(
+        self, input_data: ProposalGeneratorInput
+    ) -> ProposalGeneratorOutput:
+        """Call the model for a single proposal, bypassing the cache."""
         generation_id = f"gen_{int(time.time())}"
-        
+
         # Log the start of proposal generation
         logger.info(
             "Starting proposal generation",
@@ -136,39 +630,26 @@ class ProposalGenerator:
                 "skills_count": len(input_data.skills),
                 "has_additional_context": input_data.additional_context is not None,
                 "model_used": self.model_name,
-            }
+            },
         )
-        
+
         start_time = time.time()
-        
+
         try:
-            # Prepare additional context
-            additional_context_prompt = ""
-            if input_data.additional_context:
-                additional_context_prompt = f"Additional Context: {input_data.additional_context}"
-            
-            # Format skills as a comma-separated list
-            skills_str = ", ".join(input_data.skills)
-            
             # Generate proposal
             logger.debug(
                 "Invoking AI model",
                 extra={
                     "generation_id": generation_id,
                     "model": self.model_name,
-                }
+                },
             )
-            
-            result = await self.chain.ainvoke({
-                "job_title": input_data.job_title,
-                "job_description": input_data.job_description,
-                "skills": skills_str,
-                "additional_context_prompt": additional_context_prompt,
-            })
-            
-            proposal_text = result.get("text", "").strip()
+
+            prompt_text, _ = self.prepare_prompt(input_data)
+            proposal_text, backend = await self._invoke_with_hedging(prompt_text)
+            proposal_text = proposal_text.strip()
             processing_time = time.time() - start_time
-            
+
             # Log successful generation
             logger.info(
                 "Proposal generation successful",
@@ -176,15 +657,17 @@ class ProposalGenerator:
                     "generation_id": generation_id,
                     "processing_time_seconds": processing_time,
                     "proposal_length": len(proposal_text),
-                }
+                    "backend": backend.model_name,
+                },
             )
-            
+
             # Create output model
             return ProposalGeneratorOutput(
                 proposal_text=proposal_text,
                 generation_time=datetime.utcnow(),
+                model_used=backend.model_name,
             )
-            
+
         except Exception as e:
             processing_time = time.time() - start_time
             logger.error(
@@ -195,41 +678,515 @@ class ProposalGenerator:
                     "error_type": type(e).__name__,
                     "processing_time_seconds": processing_time,
                 },
-                exc_info=True
+                exc_info=True,
             )
-            raise ProposalGenerationError(f"Failed to generate proposal: {str(e)}")
+            raise _wrap_generation_error(e)
 
+    async def _invoke_backend(
+        self, backend: LLMBackend, prompt_text: str, tokens: int
+    ) -> str:
+        """Call one backend's chat model through its provider scheduler, recording the latency."""
+        start = time.monotonic()
+        backend.calls += 1
+        try:
+            async with backend.scheduler.slot(tokens):
+                message = await backend.llm.ainvoke(prompt_text)
+        except asyncio.CancelledError:
+            # A losing call took at least this long: keeping only the winners
+            # would drag the percentile, and so the hedge delay, down over time
+            backend.record_lower_bound(
+                time.monotonic() - start, settings.LLM_HEDGE_PERCENTILE
+            )
+            raise
+        except Exception:
+            backend.failures += 1
+            raise
+        backend.latencies.append(time.monotonic() - start)
+        return _chunk_text(message)
+
+    def _hedge_delay(self, backend: LLMBackend) -> float | None:
+        """How long to wait on a backend before hedging to the next one."""
+        if not settings.LLM_HEDGE_ENABLED:
+            return None
+        delay = backend.latency_percentile(
+            settings.LLM_HEDGE_PERCENTILE, settings.LLM_HEDGE_MIN_SAMPLES
+        )
+        return delay if delay is not None else settings.LLM_HEDGE_INITIAL_DELAY_SECONDS
+
+    async def _invoke_with_hedging(self, prompt_text: str) -> tuple[str, LLMBackend]:
+        """
+        Run a generation across the ordered backends.
+
+        The primary backend is called first. If it is still running after its
+        hedge delay (a latency percentile), the next backend is called as well;
+        if it fails, the next backend is called immediately. The first success
+        wins and the remaining calls are cancelled.
+
+        Returns:
+            The winning proposal text and the backend that produced it
+        """
+        tokens = self.estimate_tokens(prompt_text)
+        pending: dict[asyncio.Task[str], tuple[LLMBackend, bool]] = {}
+        launched = 0
+        last_error: BaseException | None = None
+
+        def launch(as_hedge: bool) -> None:
+            nonlocal launched
+            if launched >= len(self.backends):
+                return
+            backend = self.backends[launched]
+            if as_hedge:
+                backend.hedges += 1
+            elif launched > 0:
+                backend.failovers += 1
+            task = asyncio.ensure_future(
+                self._invoke_backend(backend, prompt_text, tokens)
+            )
+            pending[task] = (backend, as_hedge)
+            launched += 1
+
+        launch(as_hedge=False)
+        try:
+            while pending:
+                latest = self.backends[launched - 1]
+                timeout = (
+                    self._hedge_delay(latest) if launched < len(self.backends) else None
+                )
+                done, _ = await asyncio.wait(
+                    pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+
+                if not done:
+                    logger.info(
+                        "Hedging slow proposal generation",
+                        extra={
+                            "slow_backend": latest.model_name,
+                            "hedge_delay_seconds": timeout,
+                        },
+                    )
+                    launch(as_hedge=True)
+                    continue
+
+                for task in done:
+                    backend, was_hedge = pending.pop(task)
+                    error = task.exception()
+                    if error is None:
+                        backend.wins += 1
+                        if was_hedge:
+                            backend.hedge_wins += 1
+                        return task.result(), backend
+                    last_error = error
+                    logger.warning(
+                        "Backend failed, failing over",
+                        extra={"backend": backend.model_name, "error": str(error)},
+                    )
+                    launch(as_hedge=False)
+        finally:
+            # Cancel the losers
+            for task in pending:
+                task.cancel()
+
+        assert last_error is not None
+        raise last_error
 
-# Singleton instance for reuse
-default_generator: Optional[ProposalGenerator] = None
+    async def stream_proposal(
+        self, input_data: ProposalGeneratorInput, fresh: bool = False
+    ) -> AsyncIterator[str | ProposalGeneratorOutput]:
+        """
+        Stream a proposal as the model produces it.
+
+        Yields each text chunk as soon as the provider emits it, followed by a
+        single ProposalGeneratorOutput carrying the assembled proposal. A cached
+        proposal is yielded as a single chunk.
+
+        Args:
+            input_data: The proposal generation input data
+            fresh: Skip the response cache and generate a new variant
 
+        Yields:
+            Text chunks, then the final ProposalGeneratorOutput
+
+        Raises:
+            ProposalGenerationError: If there's an error during generation
+        """
+        cache_key: str | None = None
+        if self.cache is not None:
+            cache_key = self.fingerprint(input_data)
+            cached = None if fresh else self.cache.get(cache_key)
+            if cached is not None:
+                logger.info(
+                    "Serving streamed proposal from cache",
+                    extra={"cache_key": cache_key, "model_used": self.model_name},
+                )
+                yield cached.proposal_text
+                yield cached.model_copy(update={"cached": True})
+                return
+
+        generation_id = f"gen_{int(time.time())}"
+        logger.info(
+            "Starting streaming proposal generation",
+            extra={
+                "generation_id": generation_id,
+                "job_title": input_data.job_title,
+                "model_used": self.model_name,
+            },
+        )
 
-def get_proposal_generator() -> ProposalGenerator:
+        start_time = time.time()
+        first_chunk_time: float | None = None
+        chunks: list[str] = []
+
+        try:
+            prompt_text, _ = self.prepare_prompt(input_data)
+            for position, backend in enumerate(self.backends):
+                backend.calls += 1
+                try:
+                    async with backend.scheduler.slot(
+                        self.estimate_tokens(prompt_text)
+                    ):
+                        async for chunk in backend.llm.astream(prompt_text):
+                            text = _chunk_text(chunk)
+                            if not text:
+                                continue
+                            if first_chunk_time is None:
+                                first_chunk_time = time.time() - start_time
+                            chunks.append(text)
+                            yield text
+                except Exception as e:
+                    backend.failures += 1
+                    # Text already sent can't be taken back, so only fail over before the first chunk
+                    if chunks or position == len(self.backends) - 1:
+                        raise
+                    logger.warning(
+                        "Backend failed before streaming, failing over",
+                        extra={"backend": backend.model_name, "error": str(e)},
+                    )
+                    self.backends[position + 1].failovers += 1
+                    continue
+                backend.wins += 1
+                break
+        except Exception as e:
+            logger.error(
+                f"Error streaming proposal: {str(e)}",
+                extra={
+                    "generation_id": generation_id,
+                    "error": str(e),
+                    "error_type": type(e).__name__,
+                    "processing_time_seconds": time.time() - start_time,
+                },
+                exc_info=True,
+            )
+            raise _wrap_generation_error(e)
+
+        proposal_text = "".join(chunks).strip()
+        if not proposal_text:
+            raise ProposalGenerationError(
+                "Failed to generate proposal: empty response from model"
+            )
+
+        logger.info(
+            "Streaming proposal generation successful",
+            extra={
+                "generation_id": generation_id,
+                "time_to_first_chunk_seconds": first_chunk_time,
+                "processing_time_seconds": time.time() - start_time,
+                "proposal_length": len(proposal_text),
+            },
+        )
+
+        output = ProposalGeneratorOutput(
+            proposal_text=proposal_text,
+            generation_time=datetime.utcnow(),
+            model_used=backend.model_name,
+        )
+        if self.cache is not None and cache_key is not None:
+            self.cache.set(cache_key, output)
+        yield output
+
+
+def _chunk_text(chunk: Any) -> str:
+    """Extract the text of a chat message or streamed message chunk.
+
+    OpenAI messages carry a plain string, while Anthropic ones may carry a list
+    of content blocks.
+    """
+    content = getattr(chunk, "content", chunk)
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(
+            block if isinstance(block, str) else block.get("text", "")
+            for block in content
+            if isinstance(block, (str, dict))
+        )
+    return ""
+
+
+# Response cache shared by the pooled generators (disabled when size or TTL is 0)
+proposal_cache: ProposalCache | None = (
+    ProposalCache(
+        max_size=settings.PROPOSAL_CACHE_MAX_SIZE,
+        ttl_seconds=settings.PROPOSAL_CACHE_TTL_SECONDS,
+    )
+    if settings.PROPOSAL_CACHE_MAX_SIZE > 0 and settings.PROPOSAL_CACHE_TTL_SECONDS > 0
+    else None
+)
+
+GeneratorKey = tuple[str, float, str]
+
+
+class GeneratorPool:
+    """
+    Bounded LRU pool of ProposalGenerator instances.
+
+    Generators are keyed by (model, temperature to one decimal, prompt
+    template hash) and built on first use, so requests that override the model
+    or temperature reuse an existing chat model and HTTP client instead of
+    setting up a new one.
+    Creation happens under a lock, so concurrent callers never build the same
+    generator twice.
     """
-    Get or create the proposal generator singleton.
-    
+
+    def __init__(self, max_size: int = 8, cache: ProposalCache | None = None):
+        """
+        Initialize the pool.
+
+        Args:
+            max_size: Maximum number of generators kept (least recently used are dropped)
+            cache: Response cache shared by every pooled generator
+        """
+        self.max_size = max(1, max_size)
+        self.cache = cache
+        self._generators: OrderedDict[GeneratorKey, ProposalGenerator] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._generators)
+
+    def get(
+        self,
+        model_name: str | None = None,
+        temperature: float | None = None,
+        prompt_template: str | None = None,
+    ) -> ProposalGenerator:
+        """
+        Get the generator for the given settings, creating it if needed.
+
+        Args:
+            model_name: Model override (defaults to config)
+            temperature: Temperature override (defaults to config)
+            prompt_template: Prompt template override (defaults to the built-in template)
+
+        Returns:
+            A pooled ProposalGenerator instance
+
+        Raises:
+            ProposalGenerationError: If the generator can't be created
+        """
+        model_name = (
+            model_name or settings.DEFAULT_LLM_MODEL or "claude-3-haiku-20240307"
+        )
+        temperature = (
+            settings.DEFAULT_LLM_TEMPERATURE if temperature is None else temperature
+        )
+        # 0.7 and 0.70001 behave the same, and must not each get a generator
+        temperature = round(float(temperature), 1)
+        prompt_template = prompt_template or DEFAULT_TEMPLATE
+        key = (
+            model_name,
+            temperature,
+            hashlib.sha256(prompt_template.encode("utf-8")).hexdigest(),
+        )
+
+        with self._lock:
+            generator = self._generators.get(key)
+            if generator is not None:
+                self._generators.move_to_end(key)
+                self.hits += 1
+                return generator
+
+            self.misses += 1
+            logger.info(
+                "Creating new ProposalGenerator instance",
+                extra={"model_name": model_name, "temperature": temperature},
+            )
+            generator = ProposalGenerator(
+                model_name=model_name,
+                temperature=temperature,
+                prompt_template=prompt_template,
+                cache=self.cache,
+            )
+            self._generators[key] = generator
+            while len(self._generators) > self.max_size:
+                self._generators.popitem(last=False)
+                self.evictions += 1
+            return generator
+
+    def generators(self) -> list[ProposalGenerator]:
+        """Return the pooled generators, least recently used first."""
+        with self._lock:
+            return list(self._generators.values())
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generators.clear()
+
+    def stats(self) -> dict[str, int]:
+        """Return the pool size and hit/miss/eviction counters."""
+        return {
+            "size": len(self._generators),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+# Generators shared by all requests in this process
+generator_pool = GeneratorPool(
+    max_size=settings.PROPOSAL_GENERATOR_POOL_SIZE, cache=proposal_cache
+)
+
+
+def get_proposal_generator(
+    model_name: str | None = None, temperature: float | None = None
+) -> ProposalGenerator:
+    """
+    Get or create the pooled proposal generator for a model and temperature.
+
     This function is suitable for FastAPI dependency injection.
-    
+
+    Args:
+        model_name: Model override (defaults to config)
+        temperature: Temperature override (defaults to config)
+
     Returns:
         A ProposalGenerator instance
     """
-    global default_generator
-    if default_generator is None:
-        logger.info("Creating new ProposalGenerator instance")
-        default_generator = ProposalGenerator()
-    return default_generator
+    return generator_pool.get(model_name=model_name, temperature=temperature)
+
 
+def get_proposal_service_stats() -> dict[str, Any]:
+    """Return the cache, pool, coalescing, scheduler and backend metrics for this process."""
+    generators = generator_pool.generators()
+    return {
+        "cache": proposal_cache.stats() if proposal_cache is not None else None,
+        "pool": generator_pool.stats(),
+        "inflight": {
+            "in_flight": sum(len(generator.inflight) for generator in generators),
+            "coalesced": sum(generator.inflight.coalesced for generator in generators),
+        },
+        "schedulers": get_scheduler_stats(),
+        "backends": [
+            {**backend.stats(), "temperature": generator.temperature}
+            for generator in generators
+            for backend in generator.backends
+        ],
+    }
 
-async def generate_proposal(input_data: ProposalGeneratorInput) -> ProposalGeneratorOutput:
+
+async def generate_proposal(
+    input_data: ProposalGeneratorInput, fresh: bool = False
+) -> ProposalGeneratorOutput:
     """
-    Generate a proposal using the default generator.
-    
+    Generate a proposal using the pooled generator for the input's model and temperature.
+
     Args:
         input_data: The proposal generation input data
-        
+        fresh: Skip the response cache and generate a new variant
+
     Returns:
         A ProposalGeneratorOutput with the generated proposal text and timestamp
     """
-    logger.info("Generating proposal with default generator")
-    generator = get_proposal_generator()
-    return await generator.generate_proposal(input_data) 
\ No newline at end of file
+    logger.info("Generating proposal with pooled generator")
+    generator = get_proposal_generator(input_data.model, input_data.temperature)
+    return await generator.generate_proposal(input_data, fresh=fresh)
+
+
+async def stream_proposal(
+    input_data: ProposalGeneratorInput, fresh: bool = False
+) -> AsyncIterator[str | ProposalGeneratorOutput]:
+    """
+    Stream a proposal using the pooled generator for the input's model and temperature.
+
+    Args:
+        input_data: The proposal generation input data
+        fresh: Skip the response cache and generate a new variant
+
+    Yields:
+        Text chunks, then the final ProposalGeneratorOutput
+    """
+    logger.info("Streaming proposal with pooled generator")
+    generator = get_proposal_generator(input_data.model, input_data.temperature)
+    async for event in generator.stream_proposal(input_data, fresh=fresh):
+        yield event
+
+
+def preview_proposal_prompt(
+    input_data: ProposalGeneratorInput,
+) -> ProposalPromptPreview:
+    """
+    Render the prompt for a request without calling the model.
+
+    Args:
+        input_data: The proposal generation input data
+
+    Returns:
+        The rendered prompt with its estimated token counts
+    """
+    generator = get_proposal_generator(input_data.model, input_data.temperature)
+    return generator.preview_prompt(input_data)
+
+
+async def generate_proposals_batch(
+    inputs: Sequence[ProposalGeneratorInput],
+    concurrency: int,
+    fresh: bool = False,
+) -> AsyncIterator[tuple[int, ProposalGeneratorOutput | ProposalGenerationError]]:
+    """
+    Generate proposals for several jobs using pooled generators.
+
+    At most `concurrency` generations run at the same time. Results are yielded
+    as soon as each job finishes, so one slow job doesn't hold back the rest.
+
+    Args:
+        inputs: The proposal generation inputs
+        concurrency: Maximum number of concurrent model calls
+        fresh: Skip the response cache and generate new variants
+
+    Yields:
+        (index, result) pairs in completion order, where result is either the
+        generated output or the error raised for that job
+    """
+    logger.info(
+        "Generating proposal batch with pooled generators",
+        extra={"batch_size": len(inputs), "concurrency": concurrency},
+    )
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(
+        index: int, input_data: ProposalGeneratorInput
+    ) -> tuple[int, ProposalGeneratorOutput | ProposalGenerationError]:
+        async with semaphore:
+            try:
+                generator = get_proposal_generator(
+                    input_data.model, input_data.temperature
+                )
+                return index, await generator.generate_proposal(input_data, fresh=fresh)
+            except ProposalGenerationError as e:
+                return index, e
+
+    tasks = [
+        asyncio.ensure_future(run(index, input_data))
+        for index, input_data in enumerate(inputs)
+    ]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Stop outstanding generations if the consumer goes away early
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,90 @@
+"""Prompt token budgeting for proposal generation.
+
+Job posts can be arbitrarily long, so the free-text fields are compacted and,
+if the prompt would still exceed its budget, truncated before the model is
+called. Token counts are estimated from character counts with a per-provider
+ratio: cheap enough to run on every request, and deliberately conservative so
+the real count stays under the budget.
+"""
+
+import math
+import re
+
+# Average characters per token for English prose; Claude's tokenizer produces
+# slightly more tokens than OpenAI's for the same text
+ANTHROPIC_CHARS_PER_TOKEN = 3.5
+OPENAI_CHARS_PER_TOKEN = 4.0
+
+# Tokens per English word, plus headroom so a proposal isn't cut mid-sentence
+TOKENS_PER_WORD = 1.35
+OUTPUT_TOKEN_HEADROOM = 1.25
+
+TRUNCATION_MARKER = " [...]"
+
+_SPACES = re.compile(r"[ \t\f\v]+")
+_BLANK_LINES = re.compile(r"\n\s*\n\s*")
+
+
+def chars_per_token(model_name: str) -> float:
+    """Return the characters-per-token ratio used for a model."""
+    if "claude" in model_name.lower():
+        return ANTHROPIC_CHARS_PER_TOKEN
+    return OPENAI_CHARS_PER_TOKEN
+
+
+def estimate_tokens(text: str, model_name: str) -> int:
+    """Estimate how many tokens a model's tokenizer produces for text."""
+    return math.ceil(len(text) / chars_per_token(model_name))
+
+
+def output_token_limit(words: int) -> int:
+    """Derive a max_tokens value for a response of about `words` words."""
+    return math.ceil(words * TOKENS_PER_WORD * OUTPUT_TOKEN_HEADROOM)
+
+
+def compact_text(text: str) -> str:
+    """Collapse runs of spaces and blank lines, keeping paragraph breaks."""
+    lines = (_SPACES.sub(" ", line).strip() for line in text.strip().split("\n"))
+    return _BLANK_LINES.sub("\n\n", "\n".join(lines))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model_name: str) -> str:
+    """
+    Cut text to at most max_tokens estimated tokens, at a word boundary.
+
+    The beginning of a job post usually describes the work, so the head is
+    kept and a marker shows the model that the rest was left out.
+    """
+    if estimate_tokens(text, model_name) <= max_tokens:
+        return text
+
+    max_chars = int(max_tokens * chars_per_token(model_name)) - len(TRUNCATION_MARKER)
+    if max_chars <= 0:
+        return ""
+    head = text[:max_chars]
+    boundary = head.rfind(" ")
+    if boundary > max_chars // 2:
+        head = head[:boundary]
+    return head.rstrip() + TRUNCATION_MARKER
+
+
+def split_budget(
+    available: int, description_tokens: int, context_tokens: int
+) -> tuple[int, int]:
+    """
+    Share the tokens left for free text between the job description and the
+    additional context.
+
+    The description takes priority; the context keeps at least a quarter of
+    the budget (or whatever the description doesn't need, if more).
+
+    Returns:
+        (description_budget, context_budget)
+    """
+    available = max(available, 0)
+    if description_tokens + context_tokens <= available:
+        return description_tokens, context_tokens
+    context_budget = min(
+        context_tokens, max(available // 4, available - description_tokens)
+    )
+    return available - context_budget, context_budget
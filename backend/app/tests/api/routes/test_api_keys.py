@@ -0,0 +1,111 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+from app.core.api_key_usage import api_key_usage
+from app.core.config import settings
+from app.models import ApiKey
+
+
+def create_api_key(client: TestClient, headers: dict[str, str]) -> dict[str, str]:
+    r = client.post(
+        f"{settings.API_V1_STR}/api-keys/", headers=headers, json={"name": "Extension"}
+    )
+    assert r.status_code == 200
+    return r.json()
+
+
+def test_create_and_use_api_key(
+    client: TestClient, normal_user_token_headers: dict[str, str]
+) -> None:
+    created = create_api_key(client, normal_user_token_headers)
+    assert created["key"].startswith(f"pg_{created['prefix']}_")
+
+    me = client.get(
+        f"{settings.API_V1_STR}/users/me", headers=normal_user_token_headers
+    ).json()
+    api_key_headers = {"X-API-Key": created["key"]}
+    # CachedUser and CurrentUser routes both accept the key
+    r = client.get(f"{settings.API_V1_STR}/users/me", headers=api_key_headers)
+    assert r.status_code == 200
+    assert r.json()["id"] == me["id"]
+    r = client.get(f"{settings.API_V1_STR}/users/{me['id']}", headers=api_key_headers)
+    assert r.status_code == 200
+
+    r = client.get(f"{settings.API_V1_STR}/api-keys/", headers=api_key_headers)
+    keys = r.json()
+    assert r.status_code == 200
+    assert created["id"] in [key["id"] for key in keys["data"]]
+    assert all("key" not in key for key in keys["data"])
+
+
+def test_invalid_api_key(
+    client: TestClient, normal_user_token_headers: dict[str, str]
+) -> None:
+    created = create_api_key(client, normal_user_token_headers)
+    for key in ["not-a-key", f"pg_{created['prefix']}_wrongsecret"]:
+        r = client.get(f"{settings.API_V1_STR}/users/me", headers={"X-API-Key": key})
+        assert r.status_code == 403
+        assert r.json()["detail"] == "Invalid API key"
+
+
+def test_no_credentials(client: TestClient) -> None:
+    r = client.get(f"{settings.API_V1_STR}/users/me")
+    assert r.status_code == 401
+    assert r.headers["WWW-Authenticate"] == "Bearer"
+
+
+def test_deleted_api_key_is_rejected(
+    client: TestClient, normal_user_token_headers: dict[str, str]
+) -> None:
+    created = create_api_key(client, normal_user_token_headers)
+    api_key_headers = {"X-API-Key": created["key"]}
+    r = client.get(f"{settings.API_V1_STR}/users/me", headers=api_key_headers)
+    assert r.status_code == 200
+
+    r = client.delete(
+        f"{settings.API_V1_STR}/api-keys/{created['id']}",
+        headers=normal_user_token_headers,
+    )
+    assert r.status_code == 200
+    r = client.get(f"{settings.API_V1_STR}/users/me", headers=api_key_headers)
+    assert r.status_code == 403
+
+
+def test_delete_api_key_of_other_user(
+    client: TestClient,
+    normal_user_token_headers: dict[str, str],
+    superuser_token_headers: dict[str, str],
+) -> None:
+    created = create_api_key(client, normal_user_token_headers)
+    r = client.delete(
+        f"{settings.API_V1_STR}/api-keys/{created['id']}",
+        headers=superuser_token_headers,
+    )
+    assert r.status_code == 404
+
+
+def test_last_used_is_written_in_batches(
+    client: TestClient,
+    db: Session,
+    normal_user_token_headers: dict[str, str],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    created = create_api_key(client, normal_user_token_headers)
+    api_key_headers = {"X-API-Key": created["key"]}
+    flushes = api_key_usage.flushes
+    for _ in range(3):
+        r = client.get(f"{settings.API_V1_STR}/users/me", headers=api_key_headers)
+        assert r.status_code == 200
+
+    api_key = db.exec(select(ApiKey).where(ApiKey.id == created["id"])).one()
+    assert api_key.last_used_at is None
+    assert api_key_usage.flushes == flushes
+
+    # Once the interval has passed, the next use writes them all
+    monkeypatch.setattr(api_key_usage, "flush_interval_seconds", 0)
+    r = client.get(f"{settings.API_V1_STR}/users/me", headers=api_key_headers)
+    assert r.status_code == 200
+    assert api_key_usage.flushes == flushes + 1
+    db.refresh(api_key)
+    assert api_key.last_used_at is not None
@@ -1,3 +1,5 @@
+import gzip
+import json
 import uuid
 
 from fastapi.testclient import TestClient
@@ -5,6 +7,7 @@ from sqlmodel import Session
 
 from app.core.config import settings
 from app.tests.utils.item import create_random_item
+from app.tests.utils.utils import random_lower_string
 
 
 def test_create_item(
@@ -24,6 +27,23 @@ def test_create_item(
     assert "owner_id" in content
 
 
+def test_create_item_gzip_body(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    data = {"title": "Compressed", "description": "x" * 255}
+    response = client.post(
+        f"{settings.API_V1_STR}/items/",
+        headers={
+            **superuser_token_headers,
+            "Content-Type": "application/json",
+            "Content-Encoding": "gzip",
+        },
+        content=gzip.compress(json.dumps(data).encode()),
+    )
+    assert response.status_code == 200
+    assert response.json()["description"] == data["description"]
+
+
 def test_read_item(
     client: TestClient, superuser_token_headers: dict[str, str], db: Session
 ) -> None:
@@ -65,6 +85,32 @@ def test_read_item_not_enough_permissions(
     assert content["detail"] == "Not enough permissions"
 
 
+def test_read_item_etag(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    item = create_random_item(db)
+    url = f"{settings.API_V1_STR}/items/{item.id}"
+    response = client.get(url, headers=superuser_token_headers)
+    etag = response.headers["ETag"]
+    assert etag.startswith('W/"')
+    assert response.headers["Cache-Control"] == "private, no-cache"
+
+    response = client.get(
+        url, headers={**superuser_token_headers, "If-None-Match": etag}
+    )
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["ETag"] == etag
+
+    client.put(url, headers=superuser_token_headers, json={"title": "Changed"})
+    response = client.get(
+        url, headers={**superuser_token_headers, "If-None-Match": etag}
+    )
+    assert response.status_code == 200
+    assert response.json()["title"] == "Changed"
+    assert response.headers["ETag"] != etag
+
+
 def test_read_items(
     client: TestClient, superuser_token_headers: dict[str, str], db: Session
 ) -> None:
@@ -79,6 +125,120 @@ def test_read_items(
     assert len(content["data"]) >= 2
 
 
+def test_read_items_cursor_pagination(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    for _ in range(3):
+        create_random_item(db)
+    response = client.get(
+        f"{settings.API_V1_STR}/items/",
+        headers=superuser_token_headers,
+        params={"limit": 1000},
+    )
+    expected = [item["id"] for item in response.json()["data"]]
+    assert expected == sorted(expected, key=uuid.UUID)
+
+    ids: list[str] = []
+    params: dict[str, str | int] = {"limit": 2}
+    while True:
+        response = client.get(
+            f"{settings.API_V1_STR}/items/",
+            headers=superuser_token_headers,
+            params=params,
+        )
+        assert response.status_code == 200
+        content = response.json()
+        # Counting is only done for the first page
+        assert (content["count"] is None) == ("cursor" in params)
+        ids += [item["id"] for item in content["data"]]
+        if content["next_cursor"] is None:
+            break
+        params = {"limit": 2, "cursor": content["next_cursor"]}
+    assert ids == expected
+
+
+def test_read_items_count(
+    client: TestClient, normal_user_token_headers: dict[str, str]
+) -> None:
+    def count() -> int:
+        response = client.get(
+            f"{settings.API_V1_STR}/items/", headers=normal_user_token_headers
+        )
+        return response.json()["count"]
+
+    before = count()
+    response = client.post(
+        f"{settings.API_V1_STR}/items/",
+        headers=normal_user_token_headers,
+        json={"title": "Counted"},
+    )
+    assert count() == before + 1
+    client.delete(
+        f"{settings.API_V1_STR}/items/{response.json()['id']}",
+        headers=normal_user_token_headers,
+    )
+    assert count() == before
+
+
+def test_read_items_approximate_count(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    create_random_item(db)
+    response = client.get(
+        f"{settings.API_V1_STR}/items/",
+        headers=superuser_token_headers,
+        params={"approximate": True},
+    )
+    assert response.status_code == 200
+    assert response.json()["count"] >= 0
+
+
+def test_read_items_invalid_cursor(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    response = client.get(
+        f"{settings.API_V1_STR}/items/",
+        headers=superuser_token_headers,
+        params={"cursor": "not-a-cursor"},
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+def test_read_items_etag(
+    client: TestClient, normal_user_token_headers: dict[str, str]
+) -> None:
+    url = f"{settings.API_V1_STR}/items/"
+    item = client.post(
+        url, headers=normal_user_token_headers, json={"title": "Polled"}
+    ).json()
+    etag = client.get(url, headers=normal_user_token_headers).headers["ETag"]
+    response = client.get(
+        url, headers={**normal_user_token_headers, "If-None-Match": etag}
+    )
+    assert response.status_code == 304
+
+    # Changed by a bulk update, which bumps the item's version
+    client.patch(
+        f"{url}bulk",
+        headers=normal_user_token_headers,
+        json={"items": [{"id": item["id"], "description": "Changed"}]},
+    )
+    response = client.get(
+        url, headers={**normal_user_token_headers, "If-None-Match": etag}
+    )
+    assert response.status_code == 200
+    assert item["id"] in [item["id"] for item in response.json()["data"]]
+    etag = response.headers["ETag"]
+
+    client.delete(f"{url}{item['id']}", headers=normal_user_token_headers)
+    response = client.get(
+        url, headers={**normal_user_token_headers, "If-None-Match": etag}
+    )
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
 def test_update_item(
     client: TestClient, superuser_token_headers: dict[str, str], db: Session
 ) -> None:
@@ -162,3 +322,252 @@ def test_delete_item_not_enough_permissions(
     assert response.status_code == 400
     content = response.json()
     assert content["detail"] == "Not enough permissions"
+
+
+def test_bulk_create_items(
+    client: TestClient, normal_user_token_headers: dict[str, str]
+) -> None:
+    before = client.get(
+        f"{settings.API_V1_STR}/items/", headers=normal_user_token_headers
+    ).json()["count"]
+    items = [{"title": f"Bulk {i}", "description": "Imported"} for i in range(5)]
+    response = client.post(
+        f"{settings.API_V1_STR}/items/bulk",
+        headers=normal_user_token_headers,
+        json={"items": items},
+    )
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [result["index"] for result in results] == list(range(5))
+    assert [result["item"]["title"] for result in results] == [
+        item["title"] for item in items
+    ]
+    assert all(result["error"] is None for result in results)
+
+    item_id = results[0]["id"]
+    response = client.get(
+        f"{settings.API_V1_STR}/items/{item_id}", headers=normal_user_token_headers
+    )
+    assert response.json()["title"] == "Bulk 0"
+    after = client.get(
+        f"{settings.API_V1_STR}/items/", headers=normal_user_token_headers
+    ).json()["count"]
+    assert after == before + 5
+
+
+def test_bulk_create_items_too_many(
+    client: TestClient, normal_user_token_headers: dict[str, str]
+) -> None:
+    items = [{"title": "Too many"}] * (settings.ITEMS_BULK_MAX_ROWS + 1)
+    response = client.post(
+        f"{settings.API_V1_STR}/items/bulk",
+        headers=normal_user_token_headers,
+        json={"items": items},
+    )
+    assert response.status_code == 400
+
+
+def test_bulk_update_items(
+    client: TestClient, normal_user_token_headers: dict[str, str], db: Session
+) -> None:
+    created = client.post(
+        f"{settings.API_V1_STR}/items/bulk",
+        headers=normal_user_token_headers,
+        json={"items": [{"title": "One"}, {"title": "Two", "description": "Kept"}]},
+    ).json()["results"]
+    other_item = create_random_item(db)
+    missing_id = str(uuid.uuid4())
+
+    response = client.patch(
+        f"{settings.API_V1_STR}/items/bulk",
+        headers=normal_user_token_headers,
+        json={
+            "items": [
+                {"id": created[0]["id"], "title": "One updated"},
+                {"id": created[1]["id"], "description": "Updated"},
+                {"id": str(other_item.id), "title": "Not mine"},
+                {"id": missing_id, "title": "Missing"},
+                {"id": created[0]["id"], "title": "Twice"},
+            ]
+        },
+    )
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert results[0]["item"]["title"] == "One updated"
+    assert results[1]["item"] == {
+        "id": created[1]["id"],
+        "owner_id": created[1]["item"]["owner_id"],
+        "title": "Two",
+        "description": "Updated",
+    }
+    assert [result["error"] for result in results[2:]] == [
+        "Not enough permissions",
+        "Item not found",
+        "Duplicate item id",
+    ]
+    db.refresh(other_item)
+    assert other_item.title != "Not mine"
+
+
+def test_bulk_delete_items(
+    client: TestClient, normal_user_token_headers: dict[str, str], db: Session
+) -> None:
+    created = client.post(
+        f"{settings.API_V1_STR}/items/bulk",
+        headers=normal_user_token_headers,
+        json={"items": [{"title": "One"}, {"title": "Two"}]},
+    ).json()["results"]
+    other_item = create_random_item(db)
+    before = client.get(
+        f"{settings.API_V1_STR}/items/", headers=normal_user_token_headers
+    ).json()["count"]
+
+    response = client.request(
+        "DELETE",
+        f"{settings.API_V1_STR}/items/bulk",
+        headers=normal_user_token_headers,
+        json={"ids": [created[0]["id"], created[1]["id"], str(other_item.id)]},
+    )
+    assert response.status_code == 200
+    assert [result["error"] for result in response.json()["results"]] == [
+        None,
+        None,
+        "Not enough permissions",
+    ]
+    after = client.get(
+        f"{settings.API_V1_STR}/items/", headers=normal_user_token_headers
+    ).json()["count"]
+    assert after == before - 2
+    response = client.get(
+        f"{settings.API_V1_STR}/items/{created[0]['id']}",
+        headers=normal_user_token_headers,
+    )
+    assert response.status_code == 404
+
+
+def test_import_items_csv(
+    client: TestClient, normal_user_token_headers: dict[str, str]
+) -> None:
+    before = client.get(
+        f"{settings.API_V1_STR}/items/", headers=normal_user_token_headers
+    ).json()["count"]
+    rows = "".join(f'Imported {i},"With, a comma"\n' for i in range(1000))
+    body = f"title,description\n{rows},No title\nOnly a title,\n"
+
+    response = client.post(
+        f"{settings.API_V1_STR}/items/import",
+        headers={**normal_user_token_headers, "Content-Type": "text/csv"},
+        content=body.encode(),
+    )
+    assert response.status_code == 200
+    result = response.json()
+    assert result["imported"] == 1001
+    assert [error["line"] for error in result["errors"]] == [1002]
+    after = client.get(
+        f"{settings.API_V1_STR}/items/", headers=normal_user_token_headers
+    ).json()["count"]
+    assert after == before + 1001
+
+
+def test_import_items_ndjson(
+    client: TestClient, normal_user_token_headers: dict[str, str]
+) -> None:
+    lines = [
+        '{"title": "From NDJSON", "description": "First"}',
+        "not json",
+        '{"title": "Also from NDJSON"}',
+        "",
+    ]
+
+    def chunks():  # type: ignore[no-untyped-def]
+        # Split mid-line, like a streamed upload
+        body = "\n".join(lines).encode()
+        yield body[:10]
+        yield body[10:]
+
+    response = client.post(
+        f"{settings.API_V1_STR}/items/import",
+        headers={**normal_user_token_headers, "Content-Type": "application/x-ndjson"},
+        content=chunks(),
+    )
+    assert response.status_code == 200
+    result = response.json()
+    assert result["imported"] == 2
+    assert [error["line"] for error in result["errors"]] == [2]
+
+
+def test_import_items_unsupported_type(
+    client: TestClient, normal_user_token_headers: dict[str, str]
+) -> None:
+    response = client.post(
+        f"{settings.API_V1_STR}/items/import",
+        headers={**normal_user_token_headers, "Content-Type": "application/json"},
+        content=b"[]",
+    )
+    assert response.status_code == 415
+
+
+def test_search_items(
+    client: TestClient, normal_user_token_headers: dict[str, str], db: Session
+) -> None:
+    word = random_lower_string()[:12]
+    items = [
+        {"title": f"{word} in the title", "description": "Matches best"},
+        {"title": "Only the description", "description": f"Mentions {word}"},
+        {"title": "Unrelated", "description": "Nothing to see"},
+    ]
+    client.post(
+        f"{settings.API_V1_STR}/items/bulk",
+        headers=normal_user_token_headers,
+        json={"items": items},
+    )
+    # Someone else's match stays out of the results
+    other_item = create_random_item(db)
+    other_item.title = f"{word} elsewhere"
+    db.add(other_item)
+    db.commit()
+
+    response = client.get(
+        f"{settings.API_V1_STR}/items/",
+        headers=normal_user_token_headers,
+        params={"q": word},
+    )
+    assert response.status_code == 200
+    content = response.json()
+    assert [item["title"] for item in content["data"]] == [
+        f"{word} in the title",
+        "Only the description",
+    ]
+    assert content["count"] == 2
+
+
+def test_search_items_cursor_pagination(
+    client: TestClient, normal_user_token_headers: dict[str, str]
+) -> None:
+    word = random_lower_string()[:12]
+    items = [{"title": f"{word} {i}", "description": word * (i % 2)} for i in range(5)]
+    client.post(
+        f"{settings.API_V1_STR}/items/bulk",
+        headers=normal_user_token_headers,
+        json={"items": items},
+    )
+    expected = client.get(
+        f"{settings.API_V1_STR}/items/",
+        headers=normal_user_token_headers,
+        params={"q": word},
+    ).json()["data"]
+    assert len(expected) == 5
+
+    titles: list[str] = []
+    params: dict[str, str | int] = {"q": word, "limit": 2}
+    while True:
+        content = client.get(
+            f"{settings.API_V1_STR}/items/",
+            headers=normal_user_token_headers,
+            params=params,
+        ).json()
+        titles += [item["title"] for item in content["data"]]
+        if content["next_cursor"] is None:
+            break
+        params = {"q": word, "limit": 2, "cursor": content["next_cursor"]}
+    assert titles == [item["title"] for item in expected]
@@ -1,10 +1,16 @@
+from collections.abc import Generator
 from unittest.mock import patch
 
+import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy import event
 from sqlmodel import Session
 
 from app.core.config import settings
+from app.core.db import async_engine
+from app.core.password_hashing import PasswordHashQueueFull
 from app.core.security import verify_password
+from app.core.token_revocation import revocation_list
 from app.crud import create_user
 from app.models import UserCreate
 from app.tests.utils.user import user_authentication_headers
@@ -24,6 +30,20 @@ def test_get_access_token(client: TestClient) -> None:
     assert tokens["access_token"]
 
 
+def test_get_access_token_hashing_overloaded(client: TestClient) -> None:
+    login_data = {
+        "username": settings.FIRST_SUPERUSER,
+        "password": settings.FIRST_SUPERUSER_PASSWORD,
+    }
+    with patch(
+        "app.async_crud.averify_and_update_password",
+        side_effect=PasswordHashQueueFull,
+    ):
+        r = client.post(f"{settings.API_V1_STR}/login/access-token", data=login_data)
+    assert r.status_code == 503
+    assert r.headers["Retry-After"] == "5"
+
+
 def test_get_access_token_incorrect_password(client: TestClient) -> None:
     login_data = {
         "username": settings.FIRST_SUPERUSER,
@@ -116,3 +136,125 @@ def test_reset_password_invalid_token(
     assert "detail" in response
     assert r.status_code == 400
     assert response["detail"] == "Invalid token"
+
+
+@pytest.fixture
+def stateless_claims(monkeypatch: pytest.MonkeyPatch) -> Generator[None, None, None]:
+    monkeypatch.setattr(settings, "JWT_STATELESS_CLAIMS", True)
+    revocation_list.clear()
+    yield
+    revocation_list.clear()
+
+
+def create_stateless_user(db: Session) -> tuple[UserCreate, dict[str, str]]:
+    user_in = UserCreate(email=random_email(), password=random_lower_string())
+    create_user(session=db, user_create=user_in)
+    return user_in, {"username": user_in.email, "password": user_in.password}
+
+
+@pytest.mark.usefixtures("stateless_claims")
+def test_stateless_access_token_skips_database(client: TestClient, db: Session) -> None:
+    user_in, login_data = create_stateless_user(db)
+    r = client.post(f"{settings.API_V1_STR}/login/access-token", data=login_data)
+    tokens = r.json()
+    assert r.status_code == 200
+    assert tokens["refresh_token"]
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    # Sync the revocation list first, so the request below is all in memory
+    client.get(f"{settings.API_V1_STR}/users/me", headers=headers)
+
+    statements: list[str] = []
+
+    def before_execute(_conn, _cursor, statement, *_args) -> None:  # type: ignore[no-untyped-def]
+        statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", before_execute)
+    try:
+        r = client.get(f"{settings.API_V1_STR}/users/me", headers=headers)
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", before_execute)
+    assert r.status_code == 200
+    assert r.json()["email"] == user_in.email
+    assert statements == []
+
+
+@pytest.mark.usefixtures("stateless_claims")
+def test_refresh_token_rotation(client: TestClient, db: Session) -> None:
+    _, login_data = create_stateless_user(db)
+    tokens = client.post(
+        f"{settings.API_V1_STR}/login/access-token", data=login_data
+    ).json()
+
+    r = client.post(
+        f"{settings.API_V1_STR}/login/refresh-token",
+        json={"refresh_token": tokens["refresh_token"]},
+    )
+    assert r.status_code == 200
+    new_tokens = r.json()
+    assert new_tokens["access_token"] != tokens["access_token"]
+
+    # Refresh tokens are single use, and are not access tokens
+    r = client.post(
+        f"{settings.API_V1_STR}/login/refresh-token",
+        json={"refresh_token": tokens["refresh_token"]},
+    )
+    assert r.status_code == 403
+    r = client.get(
+        f"{settings.API_V1_STR}/users/me",
+        headers={"Authorization": f"Bearer {new_tokens['refresh_token']}"},
+    )
+    assert r.status_code == 403
+
+
+@pytest.mark.usefixtures("stateless_claims")
+def test_concurrent_refresh_reuse_rejected(client: TestClient, db: Session) -> None:
+    _, login_data = create_stateless_user(db)
+    tokens = client.post(
+        f"{settings.API_V1_STR}/login/access-token", data=login_data
+    ).json()
+
+    # Both requests pass the revocation check before either revokes the token
+    with patch(
+        "app.api.routes.login.async_crud.is_refresh_token_revoked", return_value=False
+    ):
+        first = client.post(
+            f"{settings.API_V1_STR}/login/refresh-token",
+            json={"refresh_token": tokens["refresh_token"]},
+        )
+        second = client.post(
+            f"{settings.API_V1_STR}/login/refresh-token",
+            json={"refresh_token": tokens["refresh_token"]},
+        )
+    assert first.status_code == 200
+    assert second.status_code == 403
+    assert second.json()["detail"] == "Token has been revoked"
+
+
+@pytest.mark.usefixtures("stateless_claims")
+def test_deactivation_revokes_stateless_tokens(
+    client: TestClient, db: Session, superuser_token_headers: dict[str, str]
+) -> None:
+    _, login_data = create_stateless_user(db)
+    tokens = client.post(
+        f"{settings.API_V1_STR}/login/access-token", data=login_data
+    ).json()
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    r = client.get(f"{settings.API_V1_STR}/users/me", headers=headers)
+    assert r.status_code == 200
+
+    user_id = r.json()["id"]
+    r = client.patch(
+        f"{settings.API_V1_STR}/users/{user_id}",
+        headers=superuser_token_headers,
+        json={"is_active": False},
+    )
+    assert r.status_code == 200
+
+    r = client.get(f"{settings.API_V1_STR}/users/me", headers=headers)
+    assert r.status_code == 403
+    assert r.json()["detail"] == "Token has been revoked"
+    r = client.post(
+        f"{settings.API_V1_STR}/login/refresh-token",
+        json={"refresh_token": tokens["refresh_token"]},
+    )
+    assert r.status_code == 403
@@ -0,0 +1,242 @@
+import json
+from datetime import datetime, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from app import crud
+from app.core.config import settings
+from app.models import ProposalGeneratorOutput, User, UserCreate
+from app.tests.utils.proposal import create_random_proposals
+from app.tests.utils.user import user_authentication_headers
+from app.tests.utils.utils import random_email, random_lower_string
+
+PASSWORD = random_lower_string()
+
+
+@pytest.fixture
+def user(db: Session) -> User:
+    # A fresh user per test, so every history starts out empty
+    user_in = UserCreate(email=random_email(), password=PASSWORD)
+    return crud.create_user(session=db, user_create=user_in)
+
+
+@pytest.fixture
+def user_headers(client: TestClient, user: User) -> dict[str, str]:
+    return user_authentication_headers(
+        client=client, email=user.email, password=PASSWORD
+    )
+
+
+def test_read_proposals_paginates_with_cursor(
+    client: TestClient, db: Session, user: User, user_headers: dict[str, str]
+) -> None:
+    proposals = create_random_proposals(db, user.id, count=5)
+    expected = [
+        str(p.id)
+        for p in sorted(proposals, key=lambda p: (p.created_at, p.id), reverse=True)
+    ]
+
+    seen = []
+    url = f"{settings.API_V1_STR}/proposals/?limit=2"
+    while True:
+        response = client.get(url, headers=user_headers)
+        assert response.status_code == 200
+        content = response.json()
+        assert len(content["data"]) <= 2
+        seen.extend(p["id"] for p in content["data"])
+        if content["next_cursor"] is None:
+            break
+        url = (
+            f"{settings.API_V1_STR}/proposals/?limit=2&cursor={content['next_cursor']}"
+        )
+
+    assert seen == expected
+
+
+def test_read_proposals_invalid_cursor(
+    client: TestClient, user_headers: dict[str, str]
+) -> None:
+    response = client.get(
+        f"{settings.API_V1_STR}/proposals/?cursor=not-a-cursor",
+        headers=user_headers,
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+def test_read_proposals_hides_other_users_history(
+    client: TestClient,
+    db: Session,
+    normal_user_token_headers: dict[str, str],
+    user: User,
+) -> None:
+    others = create_random_proposals(db, user.id, count=2)
+    response = client.get(
+        f"{settings.API_V1_STR}/proposals/?limit=100",
+        headers=normal_user_token_headers,
+    )
+    assert response.status_code == 200
+    listed = {p["id"] for p in response.json()["data"]}
+    assert listed.isdisjoint(str(p.id) for p in others)
+
+
+def test_export_proposals(
+    client: TestClient, db: Session, user: User, user_headers: dict[str, str]
+) -> None:
+    proposals = create_random_proposals(db, user.id, count=3)
+
+    response = client.get(
+        f"{settings.API_V1_STR}/proposals/export", headers=user_headers
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert "attachment" in response.headers["content-disposition"]
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["id"] for row in rows] == [
+        str(p.id) for p in sorted(proposals, key=lambda p: (p.created_at, p.id))
+    ]
+    assert rows[0]["proposal_text"] == proposals[0].proposal_text
+
+
+def test_generate_proposal_saves_history(
+    client: TestClient,
+    user_headers: dict[str, str],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    async def fake_generate_proposal(*_args, **_kwargs):
+        return ProposalGeneratorOutput(
+            proposal_text="Saved proposal", generation_time=datetime.now(timezone.utc)
+        )
+
+    monkeypatch.setattr(
+        "app.api.routes.proposals.generate_proposal", fake_generate_proposal
+    )
+    response = client.post(
+        f"{settings.API_V1_STR}/proposals/generate",
+        headers=user_headers,
+        json={
+            "job_title": "Python Developer",
+            "job_description": "We need a developer",
+            "skills": ["Python"],
+        },
+    )
+    assert response.status_code == 200
+
+    response = client.get(f"{settings.API_V1_STR}/proposals/", headers=user_headers)
+    data = response.json()["data"]
+    assert len(data) == 1
+    assert data[0]["proposal_text"] == "Saved proposal"
+    assert data[0]["job_title"] == "Python Developer"
+    assert data[0]["model"] == settings.DEFAULT_LLM_MODEL
+    assert data[0]["input"]["skills"] == ["Python"]
+
+
+def test_dry_run_saves_no_history(
+    client: TestClient, user_headers: dict[str, str]
+) -> None:
+    response = client.post(
+        f"{settings.API_V1_STR}/proposals/generate?dry_run=true",
+        headers=user_headers,
+        json={
+            "job_title": "Python Developer",
+            "job_description": "We need a developer",
+            "skills": ["Python"],
+        },
+    )
+    assert response.status_code == 200
+
+    response = client.get(f"{settings.API_V1_STR}/proposals/", headers=user_headers)
+    assert response.json()["data"] == []
+
+
+def test_history_records_serving_model_and_skips_reused_proposals(
+    client: TestClient,
+    user_headers: dict[str, str],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    outputs = [
+        # Served by a fallback model
+        ProposalGeneratorOutput(
+            proposal_text="New proposal",
+            generation_time=datetime.now(timezone.utc),
+            model_used="gpt-4o-mini",
+        ),
+        # The same proposal again, from the cache
+        ProposalGeneratorOutput(
+            proposal_text="New proposal",
+            generation_time=datetime.now(timezone.utc),
+            model_used="gpt-4o-mini",
+            cached=True,
+        ),
+    ]
+
+    async def fake_generate_proposal(*_args, **_kwargs):
+        return outputs.pop(0)
+
+    monkeypatch.setattr(
+        "app.api.routes.proposals.generate_proposal", fake_generate_proposal
+    )
+    for _ in range(2):
+        response = client.post(
+            f"{settings.API_V1_STR}/proposals/generate",
+            headers=user_headers,
+            json={
+                "job_title": "Python Developer",
+                "job_description": "We need a developer",
+                "skills": ["Python"],
+            },
+        )
+        assert response.status_code == 200
+        # Service-side metadata stays out of the response
+        assert set(response.json()) == {"proposal_text", "generation_time"}
+
+    response = client.get(f"{settings.API_V1_STR}/proposals/", headers=user_headers)
+    data = response.json()["data"]
+    assert len(data) == 1
+    assert data[0]["model"] == "gpt-4o-mini"
+
+
+def test_reused_proposal_is_saved_for_each_user(
+    client: TestClient,
+    db: Session,
+    user_headers: dict[str, str],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    other = crud.create_user(
+        session=db, user_create=UserCreate(email=random_email(), password=PASSWORD)
+    )
+    other_headers = user_authentication_headers(
+        client=client, email=other.email, password=PASSWORD
+    )
+    generated = ProposalGeneratorOutput(
+        proposal_text="Shared proposal",
+        generation_time=datetime.now(timezone.utc),
+        model_used="claude-3-haiku-20240307",
+    )
+    # Generated for the first user, then served from the cache to both
+    outputs = [generated] + [generated.model_copy(update={"cached": True})] * 2
+
+    async def fake_generate_proposal(*_args, **_kwargs):
+        return outputs.pop(0)
+
+    monkeypatch.setattr(
+        "app.api.routes.proposals.generate_proposal", fake_generate_proposal
+    )
+    for headers in (user_headers, other_headers, user_headers):
+        response = client.post(
+            f"{settings.API_V1_STR}/proposals/generate",
+            headers=headers,
+            json={
+                "job_title": "Python Developer",
+                "job_description": "We need a developer",
+                "skills": ["Python"],
+            },
+        )
+        assert response.status_code == 200
+
+    for headers in (user_headers, other_headers):
+        response = client.get(f"{settings.API_V1_STR}/proposals/", headers=headers)
+        data = response.json()["data"]
+        assert [proposal["proposal_text"] for proposal in data] == ["Shared proposal"]
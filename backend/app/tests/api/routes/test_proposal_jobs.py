@@ -0,0 +1,175 @@
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session
+
+from app import crud
+from app.core.config import settings
+from app.tests.utils.proposal_job import create_random_proposal_job
+
+JOB_DATA = {
+    "job_title": "Python Developer",
+    "job_description": "We need a developer",
+    "skills": ["Python"],
+}
+
+# Offline stand-in for DNS
+ADDRESSES = {
+    "example.com": ["93.184.215.14", "2606:2800:21f:cb07:6820:80da:af6b:8b2c"],
+    "intranet.example.com": ["93.184.215.14", "10.0.0.12"],
+    "metadata.example.com": ["169.254.169.254"],
+}
+
+
+@pytest.fixture(autouse=True)
+def fake_dns(monkeypatch: pytest.MonkeyPatch) -> None:
+    def resolve_host(host: str, _port: int) -> list[str]:
+        if host in ADDRESSES:
+            return ADDRESSES[host]
+        # IP literals resolve to themselves
+        return [host]
+
+    monkeypatch.setattr("app.core.webhooks.resolve_host", resolve_host)
+
+
+def test_create_proposal_job(
+    client: TestClient, normal_user_token_headers: dict[str, str], db: Session
+) -> None:
+    response = client.post(
+        f"{settings.API_V1_STR}/proposals/jobs?fresh=true",
+        headers=normal_user_token_headers,
+        json={**JOB_DATA, "webhook_url": "https://example.com/hook"},
+    )
+    assert response.status_code == 202
+    content = response.json()
+    assert content["status"] == "pending"
+    assert content["output"] is None
+
+    user = crud.get_user_by_email(session=db, email=settings.EMAIL_TEST_USER)
+    job = crud.finish_proposal_job(
+        session=db, job_id=uuid.UUID(content["id"]), proposal_text="Hello there"
+    )
+    assert job is not None
+    assert user is not None
+    assert job.owner_id == user.id
+    assert job.fresh is True
+    assert job.webhook_url == "https://example.com/hook"
+
+
+def test_create_proposal_job_invalid_webhook(
+    client: TestClient, normal_user_token_headers: dict[str, str]
+) -> None:
+    response = client.post(
+        f"{settings.API_V1_STR}/proposals/jobs",
+        headers=normal_user_token_headers,
+        json={**JOB_DATA, "webhook_url": "not a url"},
+    )
+    assert response.status_code == 422
+
+
+@pytest.mark.parametrize(
+    "webhook_url",
+    [
+        "http://example.com/hook",
+        "https://127.0.0.1/hook",
+        "https://10.1.2.3/hook",
+        "https://192.168.0.1:8443/hook",
+        "https://[::1]/hook",
+        "https://0.0.0.0/hook",
+        "https://intranet.example.com/hook",
+        "https://metadata.example.com/latest/meta-data",
+    ],
+)
+def test_create_proposal_job_rejected_webhook(
+    client: TestClient, normal_user_token_headers: dict[str, str], webhook_url: str
+) -> None:
+    response = client.post(
+        f"{settings.API_V1_STR}/proposals/jobs",
+        headers=normal_user_token_headers,
+        json={**JOB_DATA, "webhook_url": webhook_url},
+    )
+    assert response.status_code == 422
+
+
+def test_create_proposal_job_webhook_allowed_hosts(
+    client: TestClient,
+    normal_user_token_headers: dict[str, str],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(
+        "app.core.webhooks.settings.PROPOSAL_JOB_WEBHOOK_ALLOWED_HOSTS",
+        ["hooks.example.com"],
+    )
+    response = client.post(
+        f"{settings.API_V1_STR}/proposals/jobs",
+        headers=normal_user_token_headers,
+        json={**JOB_DATA, "webhook_url": "https://example.com/hook"},
+    )
+    assert response.status_code == 422
+    assert response.json()["detail"] == "Webhook host is not allowed"
+
+    response = client.post(
+        f"{settings.API_V1_STR}/proposals/jobs",
+        headers=normal_user_token_headers,
+        json={**JOB_DATA, "webhook_url": "https://hooks.example.com/hook"},
+    )
+    assert response.status_code == 202
+
+
+def test_read_proposal_job(
+    client: TestClient, normal_user_token_headers: dict[str, str]
+) -> None:
+    response = client.post(
+        f"{settings.API_V1_STR}/proposals/jobs",
+        headers=normal_user_token_headers,
+        json=JOB_DATA,
+    )
+    job_id = response.json()["id"]
+
+    response = client.get(
+        f"{settings.API_V1_STR}/proposals/jobs/{job_id}",
+        headers=normal_user_token_headers,
+    )
+    assert response.status_code == 200
+    assert response.json()["id"] == job_id
+    assert response.json()["status"] == "pending"
+
+
+def test_read_finished_proposal_job(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    job = create_random_proposal_job(db)
+    crud.finish_proposal_job(session=db, job_id=job.id, proposal_text="Hello there")
+
+    response = client.get(
+        f"{settings.API_V1_STR}/proposals/jobs/{job.id}",
+        headers=superuser_token_headers,
+    )
+    assert response.status_code == 200
+    content = response.json()
+    assert content["status"] == "succeeded"
+    assert content["output"]["proposal_text"] == "Hello there"
+
+
+def test_read_proposal_job_not_found(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    response = client.get(
+        f"{settings.API_V1_STR}/proposals/jobs/{uuid.uuid4()}",
+        headers=superuser_token_headers,
+    )
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Proposal job not found"
+
+
+def test_read_proposal_job_not_enough_permissions(
+    client: TestClient, normal_user_token_headers: dict[str, str], db: Session
+) -> None:
+    job = create_random_proposal_job(db)
+    response = client.get(
+        f"{settings.API_V1_STR}/proposals/jobs/{job.id}",
+        headers=normal_user_token_headers,
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Not enough permissions"
@@ -1,13 +1,16 @@
+import json
+from unittest.mock import AsyncMock
+
 import pytest
 from fastapi.testclient import TestClient
-from sqlmodel import Session
-from unittest.mock import patch, AsyncMock
 
+from app.api.deps import get_current_user, get_current_user_cached
 from app.main import app
-from app.tests.utils.user import create_random_user
-from app.tests.utils.utils import random_email, random_lower_string
-from app.api.deps import get_current_user
-from app.models import User, ProposalGeneratorOutput
+from app.models import ProposalGeneratorOutput, ProposalPromptPreview, User
+from app.services.proposal_generator import (
+    ProposalGenerationError,
+    ProposalRateLimitError,
+)
 
 
 # Mock user for testing
@@ -17,7 +20,7 @@ def mock_user():
         email="test@example.com",
         is_active=True,
         is_superuser=True,
-        full_name="Test User"
+        full_name="Test User",
     )
 
 
@@ -28,8 +31,11 @@ def superuser_token_headers(client: TestClient) -> dict[str, str]:
 
 # Override the dependency for testing
 @pytest.fixture(autouse=True)
-def override_dependencies():
+def override_dependencies(monkeypatch):
     app.dependency_overrides[get_current_user] = mock_user
+    app.dependency_overrides[get_current_user_cached] = mock_user
+    # The mock user isn't in the database, so don't save its proposal history
+    monkeypatch.setattr("app.api.routes.proposals._save_history", lambda *_args: None)
     yield
     app.dependency_overrides = {}
 
@@ -37,35 +43,80 @@ def override_dependencies():
 # Mock the generate_proposal function
 async def mock_generate_proposal(*args, **kwargs):
     return ProposalGeneratorOutput(
-        proposal_text="Sample proposal text",
-        generation_time=1.5
+        proposal_text="Sample proposal text", generation_time=1.5
+    )
+
+
+# Mock the stream_proposal function
+async def mock_stream_proposal(*_args, **_kwargs):
+    for chunk in ["Sample ", "proposal ", "text"]:
+        yield chunk
+    yield ProposalGeneratorOutput(
+        proposal_text="Sample proposal text", generation_time=1.5
     )
 
 
+async def mock_stream_proposal_error(*_args, **_kwargs):
+    yield "Sample "
+    raise ProposalGenerationError("Provider unavailable")
+
+
+# Mock the generate_proposals_batch function: job 1 fails, results arrive out of order
+async def mock_generate_proposals_batch(inputs, *_args, **_kwargs):
+    for index in reversed(range(len(inputs))):
+        if index == 1:
+            yield index, ProposalGenerationError("Provider unavailable")
+        else:
+            yield (
+                index,
+                ProposalGeneratorOutput(
+                    proposal_text=f"Proposal for {inputs[index].job_title}",
+                    generation_time=1.5,
+                ),
+            )
+
+
+def parse_sse(body: str) -> list[tuple[str, dict]]:
+    """Split an SSE body into (event, data) pairs."""
+    events = []
+    for frame in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in frame.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
 class TestProposalGeneration:
-    
-    @pytest.mark.parametrize("input_data", [
-        # Basic valid input
-        {
-            "job_title": "Python Developer needed for web scraping project",
-            "job_description": "We need a developer to build a robust web scraper",
-            "skills": ["Python", "BeautifulSoup", "Scrapy"]
-        },
-        # With additional context
-        {
-            "job_title": "Python Developer needed for web scraping project",
-            "job_description": "We need a developer to build a robust web scraper",
-            "skills": ["Python", "BeautifulSoup", "Scrapy"],
-            "additional_context": "I have 5 years of experience in web scraping"
-        }
-    ])
+    @pytest.mark.parametrize(
+        "input_data",
+        [
+            # Basic valid input
+            {
+                "job_title": "Python Developer needed for web scraping project",
+                "job_description": "We need a developer to build a robust web scraper",
+                "skills": ["Python", "BeautifulSoup", "Scrapy"],
+            },
+            # With additional context
+            {
+                "job_title": "Python Developer needed for web scraping project",
+                "job_description": "We need a developer to build a robust web scraper",
+                "skills": ["Python", "BeautifulSoup", "Scrapy"],
+                "additional_context": "I have 5 years of experience in web scraping",
+            },
+        ],
+    )
     def test_generate_proposal_valid(
-        self, monkeypatch, client: TestClient, superuser_token_headers: dict[str, str], input_data
+        self,
+        monkeypatch,
+        client: TestClient,
+        superuser_token_headers: dict[str, str],
+        input_data,
     ) -> None:
         """Test that a proposal can be generated with valid inputs."""
         # Monkeypatch the service function
-        monkeypatch.setattr("app.api.routes.proposals.generate_proposal", mock_generate_proposal)
-        
+        monkeypatch.setattr(
+            "app.api.routes.proposals.generate_proposal", mock_generate_proposal
+        )
+
         response = client.post(
             "/api/v1/proposals/generate",
             headers=superuser_token_headers,
@@ -77,26 +128,50 @@ class TestProposalGeneration:
         assert "generation_time" in content
         assert content["proposal_text"]
 
-    @pytest.mark.parametrize("invalid_input,expected_status", [
-        # Missing required fields
-        (
-            {"job_description": "Description", "skills": ["Python"]},
-            422  # Missing job_title
-        ),
-        # Empty strings
-        (
-            {"job_title": "", "job_description": "Description", "skills": ["Python"]},
-            422
-        ),
-        # Empty skills list
-        (
-            {"job_title": "Python Developer", "job_description": "Description", "skills": []},
-            422
-        ),
-    ])
+    @pytest.mark.parametrize(
+        "invalid_input,expected_status",
+        [
+            # Missing required fields
+            (
+                {"job_description": "Description", "skills": ["Python"]},
+                422,  # Missing job_title
+            ),
+            # Empty strings
+            (
+                {
+                    "job_title": "",
+                    "job_description": "Description",
+                    "skills": ["Python"],
+                },
+                422,
+            ),
+            # Empty skills list
+            (
+                {
+                    "job_title": "Python Developer",
+                    "job_description": "Description",
+                    "skills": [],
+                },
+                422,
+            ),
+            # Model that isn't allowed
+            (
+                {
+                    "job_title": "Python Developer",
+                    "job_description": "Description",
+                    "skills": ["Python"],
+                    "model": "gpt-4-32k",
+                },
+                422,
+            ),
+        ],
+    )
     def test_generate_proposal_invalid(
-        self, client: TestClient, superuser_token_headers: dict[str, str], 
-        invalid_input, expected_status
+        self,
+        client: TestClient,
+        superuser_token_headers: dict[str, str],
+        invalid_input,
+        expected_status,
     ) -> None:
         """Test that appropriate errors are returned for invalid inputs."""
         response = client.post(
@@ -111,12 +186,12 @@ class TestProposalGeneration:
         # Temporarily remove the dependency override for this test
         original_overrides = app.dependency_overrides.copy()
         app.dependency_overrides = {}
-        
+
         try:
             data = {
                 "job_title": "Python Developer needed for web scraping project",
                 "job_description": "We need a developer to build a robust web scraper",
-                "skills": ["Python", "BeautifulSoup", "Scrapy"]
+                "skills": ["Python", "BeautifulSoup", "Scrapy"],
             }
             response = client.post(
                 "/api/v1/proposals/generate",
@@ -125,4 +200,307 @@ class TestProposalGeneration:
             assert response.status_code == 401
         finally:
             # Restore the dependency override
-            app.dependency_overrides = original_overrides 
\ No newline at end of file
+            app.dependency_overrides = original_overrides
+
+    def test_generate_proposal_stream(
+        self, monkeypatch, client: TestClient, superuser_token_headers: dict[str, str]
+    ) -> None:
+        """Test that the streaming endpoint emits token events followed by a done event."""
+        monkeypatch.setattr(
+            "app.api.routes.proposals.stream_proposal", mock_stream_proposal
+        )
+
+        response = client.post(
+            "/api/v1/proposals/generate/stream",
+            headers=superuser_token_headers,
+            json={
+                "job_title": "Python Developer needed for web scraping project",
+                "job_description": "We need a developer to build a robust web scraper",
+                "skills": ["Python", "BeautifulSoup", "Scrapy"],
+            },
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+
+        events = parse_sse(response.text)
+        assert [name for name, _ in events] == ["token", "token", "token", "done"]
+        assert (
+            "".join(data["text"] for name, data in events if name == "token")
+            == "Sample proposal text"
+        )
+        assert events[-1][1]["proposal_text"] == "Sample proposal text"
+        assert "generation_time" in events[-1][1]
+
+    def test_generate_proposal_stream_error(
+        self, monkeypatch, client: TestClient, superuser_token_headers: dict[str, str]
+    ) -> None:
+        """Test that a failure after the stream has started is reported as an error event."""
+        monkeypatch.setattr(
+            "app.api.routes.proposals.stream_proposal", mock_stream_proposal_error
+        )
+
+        response = client.post(
+            "/api/v1/proposals/generate/stream",
+            headers=superuser_token_headers,
+            json={
+                "job_title": "Python Developer",
+                "job_description": "We need a developer",
+                "skills": ["Python"],
+            },
+        )
+        assert response.status_code == 200
+
+        events = parse_sse(response.text)
+        assert events[0] == ("token", {"text": "Sample "})
+        assert events[-1][0] == "error"
+        assert "Provider unavailable" in events[-1][1]["detail"]
+
+    def test_generate_proposal_stream_invalid(
+        self, client: TestClient, superuser_token_headers: dict[str, str]
+    ) -> None:
+        """Test that input validation happens before the stream starts."""
+        response = client.post(
+            "/api/v1/proposals/generate/stream",
+            headers=superuser_token_headers,
+            json={
+                "job_title": "",
+                "job_description": "Description",
+                "skills": ["Python"],
+            },
+        )
+        assert response.status_code == 422
+
+    def test_generate_proposal_fresh(
+        self, monkeypatch, client: TestClient, superuser_token_headers: dict[str, str]
+    ) -> None:
+        """Test that the fresh flag is forwarded to the service."""
+        calls = []
+
+        async def recording_generate_proposal(_input_data, fresh=False):
+            calls.append(fresh)
+            return await mock_generate_proposal()
+
+        monkeypatch.setattr(
+            "app.api.routes.proposals.generate_proposal", recording_generate_proposal
+        )
+        data = {
+            "job_title": "Python Developer",
+            "job_description": "We need a developer",
+            "skills": ["Python"],
+        }
+
+        assert (
+            client.post(
+                "/api/v1/proposals/generate", headers=superuser_token_headers, json=data
+            ).status_code
+            == 200
+        )
+        assert (
+            client.post(
+                "/api/v1/proposals/generate?fresh=true",
+                headers=superuser_token_headers,
+                json=data,
+            ).status_code
+            == 200
+        )
+        assert calls == [False, True]
+
+    def test_generate_proposal_dry_run(
+        self, monkeypatch, client: TestClient, superuser_token_headers: dict[str, str]
+    ) -> None:
+        """Test that dry_run returns the prompt preview without generating."""
+        generate = AsyncMock()
+        monkeypatch.setattr("app.api.routes.proposals.generate_proposal", generate)
+        monkeypatch.setattr(
+            "app.api.routes.proposals.preview_proposal_prompt",
+            lambda input_data: ProposalPromptPreview(
+                model="claude-3-haiku-20240307",
+                prompt=f"Job Title: {input_data.job_title}",
+                prompt_tokens=6,
+                prompt_budget_tokens=3000,
+                max_output_tokens=507,
+                truncated_fields=["job_description"],
+            ),
+        )
+        data = {
+            "job_title": "Python Developer",
+            "job_description": "We need a developer",
+            "skills": ["Python"],
+        }
+
+        response = client.post(
+            "/api/v1/proposals/generate?dry_run=true",
+            headers=superuser_token_headers,
+            json=data,
+        )
+        assert response.status_code == 200
+        content = response.json()
+        assert content["prompt"] == "Job Title: Python Developer"
+        assert content["max_output_tokens"] == 507
+        assert content["truncated_fields"] == ["job_description"]
+        generate.assert_not_called()
+
+    def test_read_proposal_stats(
+        self, monkeypatch, client: TestClient, superuser_token_headers: dict[str, str]
+    ) -> None:
+        """Test that cache and coalescing counters are exposed to superusers."""
+        monkeypatch.setattr(
+            "app.api.routes.proposals.get_proposal_service_stats",
+            lambda: {
+                "cache": {
+                    "size": 1,
+                    "max_size": 256,
+                    "ttl_seconds": 600,
+                    "hits": 3,
+                    "misses": 1,
+                    "evictions": 0,
+                },
+                "inflight": {"in_flight": 0, "coalesced": 2},
+            },
+        )
+
+        response = client.get(
+            "/api/v1/proposals/stats", headers=superuser_token_headers
+        )
+        assert response.status_code == 200
+        assert response.json()["cache"]["hits"] == 3
+        assert response.json()["inflight"]["coalesced"] == 2
+
+    def test_generate_proposal_batch(
+        self, monkeypatch, client: TestClient, superuser_token_headers: dict[str, str]
+    ) -> None:
+        """Test that batch results are returned per item, ordered by index."""
+        monkeypatch.setattr(
+            "app.api.routes.proposals.generate_proposals_batch",
+            mock_generate_proposals_batch,
+        )
+        items = [
+            {
+                "job_title": f"Job {i}",
+                "job_description": "We need a developer",
+                "skills": ["Python"],
+            }
+            for i in range(3)
+        ]
+
+        response = client.post(
+            "/api/v1/proposals/generate/batch",
+            headers=superuser_token_headers,
+            json={"items": items},
+        )
+        assert response.status_code == 200
+        results = response.json()["results"]
+        assert [result["index"] for result in results] == [0, 1, 2]
+        assert results[0]["output"]["proposal_text"] == "Proposal for Job 0"
+        assert results[1]["output"] is None
+        assert "Provider unavailable" in results[1]["error"]
+
+    def test_generate_proposal_batch_stream(
+        self, monkeypatch, client: TestClient, superuser_token_headers: dict[str, str]
+    ) -> None:
+        """Test that streamed batch results are NDJSON lines in completion order."""
+        monkeypatch.setattr(
+            "app.api.routes.proposals.generate_proposals_batch",
+            mock_generate_proposals_batch,
+        )
+        items = [
+            {
+                "job_title": f"Job {i}",
+                "job_description": "We need a developer",
+                "skills": ["Python"],
+            }
+            for i in range(3)
+        ]
+
+        response = client.post(
+            "/api/v1/proposals/generate/batch?stream=true",
+            headers=superuser_token_headers,
+            json={"items": items},
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in response.text.strip().split("\n")]
+        assert [line["index"] for line in lines] == [2, 1, 0]
+        assert lines[1]["error"]
+
+    def test_generate_proposal_batch_concurrency_capped(
+        self, monkeypatch, client: TestClient, superuser_token_headers: dict[str, str]
+    ) -> None:
+        """Test that the requested concurrency is capped by the server setting."""
+        seen = {}
+
+        async def recording_batch(inputs, concurrency, fresh=False):
+            seen["concurrency"] = concurrency
+            async for item in mock_generate_proposals_batch(inputs, concurrency, fresh):
+                yield item
+
+        monkeypatch.setattr(
+            "app.api.routes.proposals.generate_proposals_batch", recording_batch
+        )
+        monkeypatch.setattr(
+            "app.api.routes.proposals.settings.PROPOSAL_BATCH_MAX_CONCURRENCY", 3
+        )
+
+        response = client.post(
+            "/api/v1/proposals/generate/batch",
+            headers=superuser_token_headers,
+            json={
+                "items": [
+                    {
+                        "job_title": "Job",
+                        "job_description": "Description",
+                        "skills": ["Python"],
+                    }
+                ],
+                "concurrency": 50,
+            },
+        )
+        assert response.status_code == 200
+        assert seen["concurrency"] == 3
+
+    def test_generate_proposal_batch_too_large(
+        self, monkeypatch, client: TestClient, superuser_token_headers: dict[str, str]
+    ) -> None:
+        """Test that oversized batches are rejected."""
+        monkeypatch.setattr(
+            "app.api.routes.proposals.settings.PROPOSAL_BATCH_MAX_ITEMS", 2
+        )
+        items = [
+            {
+                "job_title": f"Job {i}",
+                "job_description": "We need a developer",
+                "skills": ["Python"],
+            }
+            for i in range(3)
+        ]
+
+        response = client.post(
+            "/api/v1/proposals/generate/batch",
+            headers=superuser_token_headers,
+            json={"items": items},
+        )
+        assert response.status_code == 400
+
+    def test_generate_proposal_rate_limited(
+        self, monkeypatch, client: TestClient, superuser_token_headers: dict[str, str]
+    ) -> None:
+        """Test that provider rate limiting is reported as a retryable 503."""
+
+        async def rate_limited_generate_proposal(*_args, **_kwargs):
+            raise ProposalRateLimitError("AI provider is busy, please retry shortly")
+
+        monkeypatch.setattr(
+            "app.api.routes.proposals.generate_proposal", rate_limited_generate_proposal
+        )
+
+        response = client.post(
+            "/api/v1/proposals/generate",
+            headers=superuser_token_headers,
+            json={
+                "job_title": "Python Developer",
+                "job_description": "We need a developer",
+                "skills": ["Python"],
+            },
+        )
+        assert response.status_code == 503
+        assert "Retry-After" in response.headers
@@ -0,0 +1,30 @@
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+
+
+def test_read_db_pool_stats(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    r = client.get(
+        f"{settings.API_V1_STR}/utils/db-pool-stats/", headers=superuser_token_headers
+    )
+    assert r.status_code == 200
+    stats = {pool["name"]: pool for pool in r.json()}
+    assert set(stats) == {"sync", "async"}
+    assert stats["async"]["pool_size"] == settings.DB_POOL_SIZE
+    assert stats["async"]["max_overflow"] == settings.DB_MAX_OVERFLOW
+    # The request itself authenticated through the async engine
+    assert stats["async"]["checkouts"] > 0
+    assert len(stats["async"]["checkout_wait_ms"]["counts"]) == (
+        len(stats["async"]["checkout_wait_ms"]["buckets"]) + 1
+    )
+
+
+def test_read_db_pool_stats_normal_user(
+    client: TestClient, normal_user_token_headers: dict[str, str]
+) -> None:
+    r = client.get(
+        f"{settings.API_V1_STR}/utils/db-pool-stats/", headers=normal_user_token_headers
+    )
+    assert r.status_code == 403
@@ -0,0 +1,18 @@
+from app.api.caching import etag_matches, make_etag
+
+
+def test_make_etag_is_weak_and_stable() -> None:
+    etag = make_etag("a", 1)
+    assert etag.startswith('W/"') and etag.endswith('"')
+    assert make_etag("a", 1) == etag
+    assert make_etag("a", 2) != etag
+
+
+def test_etag_matches() -> None:
+    etag = make_etag("a", 1)
+    assert etag_matches(etag, etag)
+    # Weak comparison, in a list of candidates
+    assert etag_matches(f'"other", {etag.removeprefix("W/")}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches(make_etag("a", 2), etag)
@@ -0,0 +1,152 @@
+import asyncio
+from collections.abc import Generator
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.core.db import async_engine, engine
+from app.core.security import create_access_token
+from app.main import app
+from app.models import ProposalGeneratorOutput
+from app.tests.utils.user import create_random_user
+
+CONCURRENT_GENERATIONS = 10
+
+
+@pytest.mark.asyncio
+async def test_generation_does_not_hold_db_connections(
+    normal_user_token_headers: dict[str, str], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    started = 0
+    release = asyncio.Event()
+
+    async def slow_generate_proposal(*_args, **_kwargs):
+        nonlocal started
+        started += 1
+        # Stands in for a slow AI provider call
+        await release.wait()
+        return ProposalGeneratorOutput(
+            proposal_text="Hello there", generation_time=datetime.now(timezone.utc)
+        )
+
+    monkeypatch.setattr(
+        "app.api.routes.proposals.generate_proposal", slow_generate_proposal
+    )
+    monkeypatch.setattr("app.api.routes.proposals._save_history", lambda *_: None)
+
+    def checked_out() -> int:
+        return engine.pool.checkedout() + async_engine.pool.checkedout()
+
+    baseline = checked_out()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        requests = [
+            asyncio.create_task(
+                client.post(
+                    f"{settings.API_V1_STR}/proposals/generate",
+                    headers=normal_user_token_headers,
+                    json={
+                        "job_title": "Python Developer",
+                        "job_description": "We need a developer",
+                        "skills": ["Python"],
+                    },
+                )
+            )
+            for _ in range(CONCURRENT_GENERATIONS)
+        ]
+        for _ in range(1000):
+            if started == CONCURRENT_GENERATIONS:
+                break
+            await asyncio.sleep(0.01)
+        assert started == CONCURRENT_GENERATIONS
+
+        # Every request is authenticated and waiting on the provider
+        assert checked_out() == baseline
+
+        release.set()
+        responses = await asyncio.gather(*requests)
+
+    assert all(response.status_code == 200 for response in responses)
+
+
+@pytest.fixture
+def pool_checkouts() -> Generator[list[object], None, None]:
+    checkouts: list[object] = []
+
+    def on_checkout(*args: object) -> None:
+        checkouts.append(args)
+
+    for pooled_engine in (engine, async_engine.sync_engine):
+        event.listen(pooled_engine, "checkout", on_checkout)
+    yield checkouts
+    for pooled_engine in (engine, async_engine.sync_engine):
+        event.remove(pooled_engine, "checkout", on_checkout)
+
+
+def test_cached_user_skips_the_database(
+    client: TestClient,
+    normal_user_token_headers: dict[str, str],
+    pool_checkouts: list[object],
+) -> None:
+    r = client.get(f"{settings.API_V1_STR}/users/me", headers=normal_user_token_headers)
+    assert r.status_code == 200
+    pool_checkouts.clear()
+
+    r = client.get(f"{settings.API_V1_STR}/users/me", headers=normal_user_token_headers)
+    assert r.status_code == 200
+    assert r.json()["email"] == settings.EMAIL_TEST_USER
+    assert pool_checkouts == []
+
+
+def test_cached_user_is_invalidated_on_update(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    user = create_random_user(db)
+    headers = {
+        "Authorization": f"Bearer {create_access_token(user.id, timedelta(minutes=5))}"
+    }
+    r = client.get(f"{settings.API_V1_STR}/users/me", headers=headers)
+    assert r.status_code == 200
+
+    r = client.patch(
+        f"{settings.API_V1_STR}/users/me",
+        headers=headers,
+        json={"full_name": "Updated Name"},
+    )
+    assert r.status_code == 200
+    r = client.get(f"{settings.API_V1_STR}/users/me", headers=headers)
+    assert r.json()["full_name"] == "Updated Name"
+
+    r = client.patch(
+        f"{settings.API_V1_STR}/users/{user.id}",
+        headers=superuser_token_headers,
+        json={"is_active": False},
+    )
+    assert r.status_code == 200
+    r = client.get(f"{settings.API_V1_STR}/users/me", headers=headers)
+    assert r.status_code == 400
+    assert r.json()["detail"] == "Inactive user"
+
+
+def test_cached_user_is_invalidated_on_delete(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    user = create_random_user(db)
+    headers = {
+        "Authorization": f"Bearer {create_access_token(user.id, timedelta(minutes=5))}"
+    }
+    r = client.get(f"{settings.API_V1_STR}/users/me", headers=headers)
+    assert r.status_code == 200
+
+    r = client.delete(
+        f"{settings.API_V1_STR}/users/{user.id}", headers=superuser_token_headers
+    )
+    assert r.status_code == 200
+    r = client.get(f"{settings.API_V1_STR}/users/me", headers=headers)
+    assert r.status_code == 404
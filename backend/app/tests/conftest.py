@@ -6,10 +6,11 @@ import pytest
 from fastapi.testclient import TestClient
 from sqlmodel import Session, delete
 
+from app import crud
 from app.core.config import settings
 from app.core.db import engine, init_db
 from app.main import app
-from app.models import Item, User
+from app.models import Item, Proposal, ProposalJob, RevokedToken, User
 from app.tests.utils.user import authentication_token_from_email
 from app.tests.utils.utils import get_superuser_token_headers
 
@@ -32,9 +33,17 @@ warnings.filterwarnings(
 def db() -> Generator[Session, None, None]:
     with Session(engine) as session:
         init_db(session)
+        # The previous run's teardown deleted rows behind the counters' back
+        crud.reconcile_counters(session=session)
         yield session
         statement = delete(Item)
         session.execute(statement)
+        statement = delete(ProposalJob)
+        session.execute(statement)
+        statement = delete(Proposal)
+        session.execute(statement)
+        statement = delete(RevokedToken)
+        session.execute(statement)
         statement = delete(User)
         session.execute(statement)
         session.commit()
@@ -0,0 +1,135 @@
+import gzip
+import json
+from collections.abc import Iterator
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.core.compression import ENCODERS, CompressionMiddleware, negotiate_encoding
+
+compression_app = FastAPI()
+compression_app.add_middleware(
+    CompressionMiddleware, minimum_size=100, max_request_size=1000
+)
+
+LARGE = {"data": [{"title": f"Item {i}"} for i in range(100)]}
+
+
+@compression_app.get("/small")
+def small() -> dict[str, str]:
+    return {"status": "ok"}
+
+
+@compression_app.get("/large")
+def large() -> dict[str, list[dict[str, str]]]:
+    return LARGE
+
+
+def lines() -> Iterator[str]:
+    for i in range(100):
+        yield f"line {i}\n"
+
+
+@compression_app.get("/csv")
+def csv() -> StreamingResponse:
+    return StreamingResponse(lines(), media_type="text/csv")
+
+
+@compression_app.get("/events")
+def events() -> StreamingResponse:
+    return StreamingResponse(lines(), media_type="text/event-stream")
+
+
+@compression_app.post("/echo")
+async def echo(request: Request) -> dict[str, int]:
+    return {"size": len(await request.body())}
+
+
+@pytest.fixture(scope="module")
+def compression_client() -> Iterator[TestClient]:
+    with TestClient(compression_app) as client:
+        yield client
+
+
+def test_negotiate_encoding() -> None:
+    assert negotiate_encoding("gzip") == "gzip"
+    assert negotiate_encoding("gzip;q=0.5, identity") == "gzip"
+    assert negotiate_encoding("gzip;q=0") is None
+    assert negotiate_encoding("identity") is None
+    assert negotiate_encoding("") is None
+    # The server's preference breaks ties
+    assert negotiate_encoding("*") == next(iter(ENCODERS))
+
+
+def test_large_response_is_compressed(compression_client: TestClient) -> None:
+    response = compression_client.get("/large", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert int(response.headers["Content-Length"]) < len(json.dumps(LARGE))
+    assert response.json() == LARGE
+
+
+def test_zstd_response(compression_client: TestClient) -> None:
+    pytest.importorskip("zstandard")
+    response = compression_client.get(
+        "/large", headers={"Accept-Encoding": "gzip, zstd"}
+    )
+    assert response.headers["Content-Encoding"] == "zstd"
+    assert response.json() == LARGE
+
+
+def test_small_response_is_not_compressed(compression_client: TestClient) -> None:
+    response = compression_client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in response.headers
+    assert response.json() == {"status": "ok"}
+
+
+def test_streamed_response_is_compressed_per_chunk(
+    compression_client: TestClient,
+) -> None:
+    response = compression_client.get("/csv", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Content-Length" not in response.headers
+    assert response.text == "".join(lines())
+
+
+def test_event_stream_is_not_compressed(compression_client: TestClient) -> None:
+    response = compression_client.get("/events", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in response.headers
+    assert response.text == "".join(lines())
+
+
+def test_gzip_request_body(compression_client: TestClient) -> None:
+    response = compression_client.post(
+        "/echo",
+        content=gzip.compress(b"x" * 1000),
+        headers={"Content-Encoding": "gzip"},
+    )
+    assert response.json() == {"size": 1000}
+
+
+def test_gzip_request_body_too_large(compression_client: TestClient) -> None:
+    # 10 kB compressed to a few bytes
+    response = compression_client.post(
+        "/echo",
+        content=gzip.compress(b"x" * 10_000),
+        headers={"Content-Encoding": "gzip"},
+    )
+    assert response.status_code == 413
+
+
+def test_invalid_gzip_request_body(compression_client: TestClient) -> None:
+    response = compression_client.post(
+        "/echo", content=b"not gzip", headers={"Content-Encoding": "gzip"}
+    )
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid gzip request body"}
+
+
+def test_unsupported_request_encoding(compression_client: TestClient) -> None:
+    response = compression_client.post(
+        "/echo", content=b"data", headers={"Content-Encoding": "compress"}
+    )
+    assert response.status_code == 415
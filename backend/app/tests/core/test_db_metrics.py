@@ -0,0 +1,78 @@
+from collections.abc import Generator
+
+import pytest
+from sqlalchemy import Engine, exc, text
+from sqlalchemy.pool import QueuePool
+from sqlmodel import create_engine
+
+from app.core.config import settings
+from app.core.db_metrics import Histogram, PoolMetrics
+
+
+@pytest.fixture
+def metrics() -> PoolMetrics:
+    return PoolMetrics("test")
+
+
+@pytest.fixture
+def small_engine(metrics: PoolMetrics) -> Generator[Engine, None, None]:
+    engine = create_engine(
+        str(settings.SQLALCHEMY_DATABASE_URI),
+        poolclass=metrics.pool_class(QueuePool),
+        pool_size=1,
+        max_overflow=1,
+        pool_timeout=0.1,
+    )
+    metrics.listen(engine)
+    yield engine
+    engine.dispose()
+
+
+def test_histogram_buckets() -> None:
+    histogram = Histogram((1, 10))
+    for value in (0.5, 1, 5, 50):
+        histogram.observe(value)
+
+    stats = histogram.stats()
+    assert stats["counts"] == [2, 1, 1]
+    assert stats["count"] == 4
+    assert stats["sum"] == 56.5
+    assert stats["max"] == 50
+
+
+def test_checkouts_overflow_and_timeouts(
+    small_engine: Engine, metrics: PoolMetrics
+) -> None:
+    with small_engine.connect() as first, small_engine.connect() as second:
+        first.execute(text("SELECT 1"))
+        second.execute(text("SELECT 1"))
+        stats = metrics.stats()
+        assert stats["checked_out"] == 2
+        assert stats["overflow"] == 1
+
+        with pytest.raises(exc.TimeoutError):
+            small_engine.connect()
+
+    stats = metrics.stats()
+    assert stats["name"] == "test"
+    assert stats["pool_size"] == 1
+    assert stats["max_overflow"] == 1
+    assert stats["checked_out"] == 0
+    assert stats["checkouts"] == 2
+    assert stats["overflow_checkouts"] == 1
+    assert stats["peak_checked_out"] == 2
+    assert stats["timeouts"] == 1
+    assert stats["checkout_wait_ms"]["count"] == 3
+    assert stats["checkout_wait_ms"]["max"] >= 100
+
+
+def test_connection_lifetime(small_engine: Engine, metrics: PoolMetrics) -> None:
+    with small_engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+    assert metrics.stats()["connections_opened"] == 1
+
+    small_engine.dispose()
+
+    stats = metrics.stats()
+    assert stats["connections_closed"] == 1
+    assert stats["connection_lifetime_seconds"]["count"] == 1
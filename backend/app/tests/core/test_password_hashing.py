@@ -0,0 +1,53 @@
+import pytest
+
+from app.core.password_hashing import PasswordHasher, PasswordHashQueueFull
+
+# The lowest cost bcrypt allows, to keep the tests fast
+ROUNDS = 4
+
+
+def test_hash_and_verify_inline() -> None:
+    hasher = PasswordHasher(rounds=ROUNDS, workers=0)
+    hashed = hasher.hash("secret")
+
+    assert hashed.startswith("$2b$04$")
+    assert hasher.verify("secret", hashed)
+    assert not hasher.verify("wrong", hashed)
+
+
+def test_hash_and_verify_in_process_pool() -> None:
+    hasher = PasswordHasher(rounds=ROUNDS, workers=1)
+    try:
+        hashed = hasher.hash("secret")
+        assert hasher.verify("secret", hashed)
+        assert not hasher.verify("wrong", hashed)
+    finally:
+        hasher.shutdown()
+
+
+def test_verify_and_update_rehashes_other_costs() -> None:
+    old = PasswordHasher(rounds=ROUNDS + 1, workers=0).hash("secret")
+    hasher = PasswordHasher(rounds=ROUNDS, workers=0)
+
+    verified, new_hash = hasher.verify_and_update("secret", old)
+    assert verified
+    assert new_hash is not None and new_hash.startswith("$2b$04$")
+
+    verified, new_hash = hasher.verify_and_update("secret", new_hash)
+    assert verified
+    assert new_hash is None
+
+    assert hasher.verify_and_update("wrong", old) == (False, None)
+
+
+def test_full_queue_is_rejected() -> None:
+    hasher = PasswordHasher(rounds=ROUNDS, workers=1, max_pending=1)
+    # Another request holds the only slot
+    hasher._slots.acquire()
+    try:
+        with pytest.raises(PasswordHashQueueFull):
+            hasher.hash("secret")
+        assert hasher.rejected == 1
+    finally:
+        hasher._slots.release()
+        hasher.shutdown()
@@ -0,0 +1,55 @@
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from app.core.token_revocation import BloomFilter, TokenRevocationList
+from app.models import RevokedToken
+
+
+def in_an_hour() -> datetime:
+    return datetime.now(timezone.utc) + timedelta(hours=1)
+
+
+def test_bloom_filter_has_no_false_negatives() -> None:
+    bloom = BloomFilter(size_bits=1 << 12, hashes=4)
+    keys = [uuid.uuid4().hex for _ in range(100)]
+    for key in keys:
+        bloom.add(key)
+
+    assert all(key in bloom for key in keys)
+    assert sum(uuid.uuid4().hex in bloom for _ in range(1000)) < 50
+
+
+def test_revoked_jti() -> None:
+    revocations = TokenRevocationList()
+    revocations.add(RevokedToken(jti="revoked", expires_at=in_an_hour()))
+
+    assert revocations.is_revoked("revoked", uuid.uuid4(), time.time())
+    assert not revocations.is_revoked("other", uuid.uuid4(), time.time())
+
+
+def test_user_revocation_only_applies_to_earlier_tokens() -> None:
+    revocations = TokenRevocationList()
+    user_id = uuid.uuid4()
+    revoked_at = datetime.now(timezone.utc)
+    revocations.add(
+        RevokedToken(user_id=user_id, revoked_at=revoked_at, expires_at=in_an_hour())
+    )
+
+    assert revocations.is_revoked("jti", user_id, revoked_at.timestamp() - 1)
+    assert not revocations.is_revoked("jti", user_id, revoked_at.timestamp() + 1)
+    assert not revocations.is_revoked("jti", uuid.uuid4(), revoked_at.timestamp() - 1)
+
+
+def test_expired_revocations_are_purged() -> None:
+    revocations = TokenRevocationList()
+    expired = datetime.now(timezone.utc) - timedelta(seconds=1)
+    revocations.add(RevokedToken(jti="expired", expires_at=expired))
+    revocations.add(RevokedToken(jti="current", expires_at=in_an_hour()))
+    revocations.add(RevokedToken(user_id=uuid.uuid4(), expires_at=expired))
+
+    revocations._purge()
+
+    assert len(revocations) == 1
+    assert not revocations.is_revoked("expired", None, None)
+    assert revocations.is_revoked("current", None, None)
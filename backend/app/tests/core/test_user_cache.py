@@ -0,0 +1,70 @@
+import time
+import uuid
+
+from app.core.user_cache import UserCache
+from app.models import UserPublic
+
+
+def make_user() -> UserPublic:
+    return UserPublic(id=uuid.uuid4(), email="user@example.com")
+
+
+def test_get_returns_cached_user() -> None:
+    cache = UserCache()
+    user = make_user()
+    cache.set("token", user)
+
+    assert cache.get("token") == user
+    assert cache.get("other") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_entries_expire(monkeypatch) -> None:
+    cache = UserCache(ttl_seconds=30)
+    cache.set("token", make_user())
+
+    now = time.monotonic()
+    monkeypatch.setattr("app.core.user_cache.time.monotonic", lambda: now + 31)
+    assert cache.get("token") is None
+    assert len(cache) == 0
+
+
+def test_entries_never_outlive_their_token() -> None:
+    cache = UserCache(ttl_seconds=30)
+    cache.set("expired", make_user(), token_expires_at=time.time() - 1)
+    assert cache.get("expired") is None
+
+
+def test_zero_ttl_disables_cache() -> None:
+    cache = UserCache(ttl_seconds=0)
+    cache.set("token", make_user())
+    assert cache.get("token") is None
+
+
+def test_least_recently_used_entry_is_evicted() -> None:
+    cache = UserCache(max_size=2)
+    cache.set("a", make_user())
+    cache.set("b", make_user())
+    cache.get("a")
+    cache.set("c", make_user())
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_invalidate_user_drops_all_its_tokens() -> None:
+    cache = UserCache()
+    user = make_user()
+    other = make_user()
+    cache.set("first", user)
+    cache.set("second", user)
+    cache.set("other", other)
+
+    cache.invalidate_user(user.id)
+
+    assert cache.get("first") is None
+    assert cache.get("second") is None
+    assert cache.get("other") == other
@@ -0,0 +1,44 @@
+from sqlmodel import Session, delete, select
+
+from app import crud
+from app.core import counters
+from app.models import Item, ItemCount, ItemCreate
+from app.tests.utils.user import create_random_user
+
+
+def stored_item_count(db: Session, owner_id) -> int:  # type: ignore[no-untyped-def]
+    return db.exec(counters.item_count(owner_id)).one()
+
+
+def test_create_item_counts_it(db: Session) -> None:
+    user = create_random_user(db)
+    assert stored_item_count(db, user.id) == 0
+    for title in ["first", "second"]:
+        crud.create_item(session=db, item_in=ItemCreate(title=title), owner_id=user.id)
+    assert stored_item_count(db, user.id) == 2
+
+
+def test_create_user_counts_it(db: Session) -> None:
+    users = db.exec(counters.row_count(counters.USER_COUNT)).one()
+    create_random_user(db)
+    assert db.exec(counters.row_count(counters.USER_COUNT)).one() == users + 1
+
+
+def test_reconcile_fixes_drifted_counters(db: Session) -> None:
+    user = create_random_user(db)
+    crud.create_item(session=db, item_in=ItemCreate(title="kept"), owner_id=user.id)
+    crud.create_item(session=db, item_in=ItemCreate(title="gone"), owner_id=user.id)
+    other_user = create_random_user(db)
+    crud.create_item(
+        session=db, item_in=ItemCreate(title="kept"), owner_id=other_user.id
+    )
+    # Deleted and counted behind the counters' back
+    db.exec(delete(Item).where(Item.title == "gone", Item.owner_id == user.id))  # type: ignore
+    db.exec(delete(ItemCount).where(ItemCount.owner_id == other_user.id))  # type: ignore
+    db.commit()
+
+    assert crud.reconcile_counters(session=db, batch_size=2) >= 2
+    assert stored_item_count(db, user.id) == 1
+    assert stored_item_count(db, other_user.id) == 1
+    assert crud.reconcile_counters(session=db) == 0
+    assert db.exec(select(ItemCount).where(ItemCount.count < 0)).first() is None
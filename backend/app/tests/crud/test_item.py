@@ -0,0 +1,53 @@
+import uuid
+from collections.abc import Generator
+
+import pytest
+from sqlalchemy import create_engine
+from sqlmodel import Session, SQLModel, col, select
+
+from app import crud
+from app.models import Item, User
+
+
+@pytest.fixture
+def sqlite_session() -> Generator[Session, None, None]:
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine, tables=[User.__table__, Item.__table__])  # type: ignore[attr-defined]
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+
+def test_item_search_sqlite_fallback(sqlite_session: Session) -> None:
+    owner_id = uuid.uuid4()
+    sqlite_session.add(User(id=owner_id, email="owner@example.com", hashed_password=""))
+    for title, description in [
+        ("Python scraper", "Extracts pages"),
+        ("Data pipeline", "Written in python"),
+        ("Python 100%_done", None),
+        ("Unrelated", "Nothing here"),
+    ]:
+        sqlite_session.add(
+            Item(title=title, description=description, owner_id=owner_id)
+        )
+    sqlite_session.commit()
+
+    condition, rank = crud.item_search("python", "sqlite")
+    rows = sqlite_session.exec(
+        select(Item.title, rank).where(condition).order_by(rank.desc(), col(Item.title))
+    ).all()
+    assert [title for title, _ in rows] == [
+        "Python 100%_done",
+        "Python scraper",
+        "Data pipeline",
+    ]
+
+    # Every word has to match, and LIKE wildcards are taken literally
+    condition, _ = crud.item_search("python pages", "sqlite")
+    assert sqlite_session.exec(select(Item.title).where(condition)).all() == [
+        "Python scraper"
+    ]
+    condition, _ = crud.item_search("%_", "sqlite")
+    assert sqlite_session.exec(select(Item.title).where(condition)).all() == [
+        "Python 100%_done"
+    ]
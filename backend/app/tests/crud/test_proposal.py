@@ -0,0 +1,121 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import event
+from sqlmodel import Session, select
+
+from app import crud
+from app.core.db import engine
+from app.models import Proposal, ProposalJob, ProposalJobCreate, User
+from app.tests.utils.proposal import create_random_proposals
+from app.tests.utils.proposal_job import create_random_proposal_job
+from app.tests.utils.user import create_random_user
+
+
+def test_get_proposals_page_walks_history_newest_first(db: Session) -> None:
+    user = create_random_user(db)
+    proposals = create_random_proposals(db, user.id, count=5)
+    # Rows created in the same instant are ordered by id
+    same_time = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    for proposal in proposals[:3]:
+        proposal.created_at = same_time
+        db.add(proposal)
+    db.commit()
+    expected = sorted(proposals, key=lambda p: (p.created_at, p.id), reverse=True)
+
+    seen = []
+    after = None
+    while True:
+        page, has_more = crud.get_proposals_page(
+            session=db, owner_id=user.id, limit=2, after=after
+        )
+        seen.extend(page)
+        if not has_more:
+            break
+        after = (page[-1].created_at, page[-1].id)
+
+    assert [p.id for p in seen] == [p.id for p in expected]
+
+
+def test_get_proposals_page_only_returns_own_proposals(db: Session) -> None:
+    user = create_random_user(db)
+    other = create_random_user(db)
+    create_random_proposals(db, other.id, count=2)
+
+    page, has_more = crud.get_proposals_page(session=db, owner_id=user.id, limit=10)
+    assert page == []
+    assert has_more is False
+
+
+def test_finish_proposal_job_saves_proposal(db: Session) -> None:
+    job = create_random_proposal_job(db)
+
+    crud.finish_proposal_job(session=db, job_id=job.id, proposal_text="Hello there")
+
+    page, _ = crud.get_proposals_page(session=db, owner_id=job.owner_id, limit=10)
+    assert len(page) == 1
+    assert page[0].proposal_text == "Hello there"
+    assert page[0].job_title == job.input["job_title"]
+    assert page[0].input == job.input
+
+
+def test_failed_proposal_job_saves_nothing(db: Session) -> None:
+    job = create_random_proposal_job(db)
+
+    crud.finish_proposal_job(session=db, job_id=job.id, error="boom")
+
+    page, _ = crud.get_proposals_page(session=db, owner_id=job.owner_id, limit=10)
+    assert page == []
+
+
+def test_finish_proposal_job_records_serving_model(db: Session) -> None:
+    job = create_random_proposal_job(db)
+
+    crud.finish_proposal_job(
+        session=db, job_id=job.id, proposal_text="Hello there", model_used="gpt-4o"
+    )
+
+    page, _ = crud.get_proposals_page(session=db, owner_id=job.owner_id, limit=10)
+    assert [p.model for p in page] == ["gpt-4o"]
+
+
+def test_finish_proposal_job_saves_cached_proposal_once(db: Session) -> None:
+    job = create_random_proposal_job(db)
+    crud.finish_proposal_job(session=db, job_id=job.id, proposal_text="Hello there")
+    again = crud.create_proposal_job(
+        session=db,
+        job_in=ProposalJobCreate.model_validate(job.input),
+        owner_id=job.owner_id,
+    )
+
+    crud.finish_proposal_job(
+        session=db, job_id=again.id, proposal_text="Hello there", cached=True
+    )
+
+    page, _ = crud.get_proposals_page(session=db, owner_id=job.owner_id, limit=10)
+    assert len(page) == 1
+
+
+def test_deleting_owner_deletes_history_and_jobs(db: Session) -> None:
+    job = create_random_proposal_job(db)
+    crud.finish_proposal_job(session=db, job_id=job.id, proposal_text="Hello there")
+    owner_id = job.owner_id
+    db.expunge_all()
+
+    user = db.get(User, owner_id)
+    statements: list[str] = []
+
+    def before_execute(_conn, _cursor, statement, *_args) -> None:  # type: ignore[no-untyped-def]
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_execute)
+    try:
+        db.delete(user)
+        db.commit()
+    finally:
+        event.remove(engine, "before_cursor_execute", before_execute)
+
+    # The rows are left to ON DELETE CASCADE, never loaded into the session
+    assert not any("FROM proposal" in statement for statement in statements)
+
+    assert db.exec(select(Proposal).where(Proposal.owner_id == owner_id)).all() == []
+    assert db.get(ProposalJob, job.id) is None
@@ -0,0 +1,111 @@
+from collections.abc import Generator
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlmodel import Session, delete, select
+
+from app import crud
+from app.core.db import engine
+from app.models import ProposalJob, ProposalJobStatus
+from app.tests.utils.proposal_job import create_random_proposal_job
+
+
+@pytest.fixture(autouse=True)
+def empty_queue(db: Session) -> Generator[None, None, None]:
+    # Claims take the oldest runnable jobs, so start every test from an empty queue
+    db.execute(delete(ProposalJob))
+    db.commit()
+    yield
+
+
+def claim(session: Session, limit: int = 10) -> list[ProposalJob]:
+    return crud.claim_proposal_jobs(
+        session=session, limit=limit, stale_after_seconds=600, max_attempts=3
+    )
+
+
+def test_create_proposal_job(db: Session) -> None:
+    job = create_random_proposal_job(db, webhook_url="https://example.com/hook")
+    assert job.status == ProposalJobStatus.pending
+    assert job.attempts == 0
+    assert job.webhook_url == "https://example.com/hook"
+    assert "webhook_url" not in job.input
+    assert job.input["skills"] == ["Python"]
+
+
+def test_claim_marks_jobs_running_oldest_first(db: Session) -> None:
+    first = create_random_proposal_job(db)
+    second = create_random_proposal_job(db)
+
+    claimed = claim(db, limit=1)
+    assert [job.id for job in claimed] == [first.id]
+    assert claimed[0].status == ProposalJobStatus.running
+    assert claimed[0].attempts == 1
+    assert claimed[0].started_at is not None
+
+    assert [job.id for job in claim(db)] == [second.id]
+    assert claim(db) == []
+
+
+def test_claim_skips_locked_jobs(db: Session) -> None:
+    locked = create_random_proposal_job(db)
+    free = create_random_proposal_job(db)
+
+    # Another worker is in the middle of claiming `locked`
+    with Session(engine) as other_worker:
+        other_worker.exec(
+            select(ProposalJob).where(ProposalJob.id == locked.id).with_for_update()
+        ).one()
+        assert [job.id for job in claim(db)] == [free.id]
+        other_worker.rollback()
+
+    assert [job.id for job in claim(db)] == [locked.id]
+
+
+def test_claim_recovers_stale_running_jobs(db: Session) -> None:
+    job = create_random_proposal_job(db)
+    claim(db)
+    assert claim(db) == []
+
+    job.started_at = datetime.now(timezone.utc) - timedelta(hours=1)
+    db.add(job)
+    db.commit()
+
+    reclaimed = claim(db)
+    assert [j.id for j in reclaimed] == [job.id]
+    assert reclaimed[0].attempts == 2
+
+
+def test_claim_gives_up_after_max_attempts(db: Session) -> None:
+    job = create_random_proposal_job(db)
+    job.attempts = 3
+    job.error = "AI provider is busy"
+    db.add(job)
+    db.commit()
+
+    assert claim(db) == []
+    db.refresh(job)
+    assert job.status == ProposalJobStatus.failed
+    assert job.error == "Gave up after 3 attempts: AI provider is busy"
+
+
+def test_finish_proposal_job(db: Session) -> None:
+    job = create_random_proposal_job(db)
+    claim(db)
+
+    retried = crud.finish_proposal_job(
+        session=db, job_id=job.id, error="busy", retry=True
+    )
+    assert retried is not None
+    assert retried.status == ProposalJobStatus.pending
+    assert retried.finished_at is None
+
+    claim(db)
+    finished = crud.finish_proposal_job(
+        session=db, job_id=job.id, proposal_text="Hello there"
+    )
+    assert finished is not None
+    assert finished.status == ProposalJobStatus.succeeded
+    assert finished.proposal_text == "Hello there"
+    assert finished.error is None
+    assert finished.finished_at is not None
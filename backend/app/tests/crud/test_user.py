@@ -2,6 +2,8 @@ from fastapi.encoders import jsonable_encoder
 from sqlmodel import Session
 
 from app import crud
+from app.core.config import settings
+from app.core.password_hashing import hash_password
 from app.core.security import verify_password
 from app.models import User, UserCreate, UserUpdate
 from app.tests.utils.utils import random_email, random_lower_string
@@ -26,6 +28,23 @@ def test_authenticate_user(db: Session) -> None:
     assert user.email == authenticated_user.email
 
 
+def test_authenticate_rehashes_outdated_cost(db: Session) -> None:
+    email = random_email()
+    password = random_lower_string()
+    user_in = UserCreate(email=email, password=password)
+    user = crud.create_user(session=db, user_create=user_in)
+    user.hashed_password = hash_password(password, rounds=4)
+    db.add(user)
+    db.commit()
+
+    authenticated_user = crud.authenticate(session=db, email=email, password=password)
+    assert authenticated_user
+    assert authenticated_user.hashed_password.startswith(
+        f"$2b${settings.BCRYPT_ROUNDS:02d}$"
+    )
+    assert verify_password(password, authenticated_user.hashed_password)
+
+
 def test_not_authenticate_user(db: Session) -> None:
     email = random_email()
     password = random_lower_string()
@@ -0,0 +1,198 @@
+import asyncio
+import json
+from collections.abc import Generator
+from datetime import datetime
+
+import httpx
+import pytest
+from sqlmodel import Session, delete
+
+from app import crud, proposal_worker
+from app.models import ProposalGeneratorOutput, ProposalJob, ProposalJobStatus
+from app.services.proposal_generator import (
+    ProposalGenerationError,
+    ProposalRateLimitError,
+)
+from app.tests.utils.proposal_job import create_random_proposal_job
+
+
+@pytest.fixture(autouse=True)
+def empty_queue(db: Session) -> Generator[None, None, None]:
+    db.execute(delete(ProposalJob))
+    db.commit()
+    yield
+
+
+@pytest.fixture
+def webhook_requests(monkeypatch: pytest.MonkeyPatch) -> list[httpx.Request]:
+    requests: list[httpx.Request] = []
+    monkeypatch.setattr("app.proposal_worker.settings.PROPOSAL_JOB_WEBHOOK_ATTEMPTS", 1)
+    # Offline stand-in for DNS
+    monkeypatch.setattr(
+        "app.core.webhooks.resolve_host",
+        lambda host, _port: (
+            ["10.0.0.12"] if host == "internal.example.com" else ["93.184.215.14"]
+        ),
+    )
+    return requests
+
+
+def mock_client(
+    requests: list[httpx.Request],
+    status_code: int = 200,
+    headers: dict[str, str] | None = None,
+) -> httpx.AsyncClient:
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(status_code, headers=headers)
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+def claim_one() -> ProposalJob:
+    jobs = proposal_worker.claim_jobs(1)
+    assert len(jobs) == 1
+    return jobs[0]
+
+
+@pytest.mark.asyncio
+async def test_process_job_success_with_webhook(
+    db: Session, monkeypatch: pytest.MonkeyPatch, webhook_requests: list[httpx.Request]
+) -> None:
+    async def fake_generate(input_data, **_kwargs):
+        return ProposalGeneratorOutput(
+            proposal_text=f"Proposal for {input_data.job_title}",
+            generation_time=datetime.utcnow(),
+            model_used="gpt-4o-mini",
+        )
+
+    monkeypatch.setattr("app.proposal_worker.generate_proposal", fake_generate)
+    job = create_random_proposal_job(db, webhook_url="https://example.com/hook")
+
+    async with mock_client(webhook_requests) as client:
+        await proposal_worker.process_job(claim_one(), client)
+
+    db.refresh(job)
+    assert job.status == ProposalJobStatus.succeeded
+    assert job.proposal_text == f"Proposal for {job.input['job_title']}"
+    # Saved to the history with the model that served it
+    proposals, _ = crud.get_proposals_page(session=db, owner_id=job.owner_id, limit=10)
+    assert [p.model for p in proposals] == ["gpt-4o-mini"]
+    assert job.webhook_delivered_at is not None
+    assert len(webhook_requests) == 1
+    payload = json.loads(webhook_requests[0].content)
+    assert payload["id"] == str(job.id)
+    assert payload["status"] == "succeeded"
+    assert payload["output"]["proposal_text"] == job.proposal_text
+
+
+@pytest.mark.asyncio
+async def test_process_job_failure(
+    db: Session, monkeypatch: pytest.MonkeyPatch, webhook_requests: list[httpx.Request]
+) -> None:
+    async def failing_generate(*_args, **_kwargs):
+        raise ProposalGenerationError("Failed to generate proposal: bad request")
+
+    monkeypatch.setattr("app.proposal_worker.generate_proposal", failing_generate)
+    job = create_random_proposal_job(db, webhook_url="https://example.com/hook")
+
+    async with mock_client(webhook_requests, status_code=500) as client:
+        await proposal_worker.process_job(claim_one(), client)
+
+    db.refresh(job)
+    assert job.status == ProposalJobStatus.failed
+    assert job.error == "Failed to generate proposal: bad request"
+    # The webhook was attempted but not acknowledged
+    assert len(webhook_requests) == 1
+    assert job.webhook_delivered_at is None
+
+
+@pytest.mark.asyncio
+async def test_webhook_to_private_address_not_sent(
+    db: Session, webhook_requests: list[httpx.Request]
+) -> None:
+    # The host may have been public when the job was created
+    job = create_random_proposal_job(
+        db, webhook_url="https://internal.example.com/hook"
+    )
+
+    async with mock_client(webhook_requests) as client:
+        assert not await proposal_worker.deliver_webhook(client, job)
+
+    assert webhook_requests == []
+
+
+@pytest.mark.asyncio
+async def test_webhook_redirect_not_followed(
+    db: Session, webhook_requests: list[httpx.Request]
+) -> None:
+    job = create_random_proposal_job(db, webhook_url="https://example.com/hook")
+
+    async with mock_client(
+        webhook_requests,
+        status_code=307,
+        headers={"Location": "http://169.254.169.254/latest/meta-data"},
+    ) as client:
+        assert not await proposal_worker.deliver_webhook(client, job)
+
+    assert [str(request.url) for request in webhook_requests] == [
+        "https://example.com/hook"
+    ]
+
+
+@pytest.mark.asyncio
+async def test_process_job_rate_limited_is_requeued(
+    db: Session, monkeypatch: pytest.MonkeyPatch, webhook_requests: list[httpx.Request]
+) -> None:
+    async def busy_generate(*_args, **_kwargs):
+        raise ProposalRateLimitError("AI provider is busy, please retry shortly")
+
+    monkeypatch.setattr("app.proposal_worker.generate_proposal", busy_generate)
+    job = create_random_proposal_job(db, webhook_url="https://example.com/hook")
+
+    async with mock_client(webhook_requests) as client:
+        await proposal_worker.process_job(claim_one(), client)
+
+    db.refresh(job)
+    assert job.status == ProposalJobStatus.pending
+    assert job.attempts == 1
+    assert webhook_requests == []
+
+
+@pytest.mark.asyncio
+async def test_run_worker_respects_concurrency(
+    db: Session, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    running = 0
+    max_running = 0
+    done = 0
+
+    async def slow_generate(*_args, **_kwargs):
+        nonlocal running, max_running, done
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.05)
+        running -= 1
+        done += 1
+        return ProposalGeneratorOutput(
+            proposal_text="Hello there", generation_time=datetime.utcnow()
+        )
+
+    monkeypatch.setattr("app.proposal_worker.generate_proposal", slow_generate)
+    jobs = [create_random_proposal_job(db) for _ in range(5)]
+
+    stop = asyncio.Event()
+    worker = asyncio.create_task(
+        proposal_worker.run_worker(stop, concurrency=2, poll_interval=0.01)
+    )
+    for _ in range(200):
+        if done == len(jobs):
+            break
+        await asyncio.sleep(0.02)
+    stop.set()
+    await asyncio.wait_for(worker, timeout=5)
+
+    assert max_running == 2
+    for job in jobs:
+        db.refresh(job)
+        assert job.status == ProposalJobStatus.succeeded
@@ -1,6 +1,7 @@
 """Common fixtures for service tests."""
 
 import pytest
+from langchain_core.messages import AIMessage
 from unittest.mock import AsyncMock, MagicMock
 
 from app.models import ProposalGeneratorInput
@@ -8,24 +9,11 @@ from app.models import ProposalGeneratorInput
 
 @pytest.fixture
 def mock_llm():
-    """Fixture for a mocked LLM."""
+    """Fixture for a mocked chat model."""
     mock = MagicMock()
-    mock.ainvoke = AsyncMock(return_value={"text": "This is a generated proposal."})
-    return mock
-
-
-@pytest.fixture
-def mock_prompt():
-    """Fixture for a mocked PromptTemplate."""
-    mock = MagicMock()
-    return mock
-
-
-@pytest.fixture
-def mock_chain():
-    """Fixture for a mocked LLMChain."""
-    mock = MagicMock()
-    mock.ainvoke = AsyncMock(return_value={"text": "This is a generated proposal."})
+    mock.ainvoke = AsyncMock(
+        return_value=AIMessage(content="This is a generated proposal.")
+    )
     return mock
 
 
@@ -0,0 +1,177 @@
+"""Tests for the outbound LLM request scheduler."""
+
+import asyncio
+import time
+
+import pytest
+
+from app.services.llm_scheduler import (
+    ProviderScheduler,
+    SchedulerQueueTimeout,
+    is_rate_limit_error,
+)
+
+
+class RateLimitError(Exception):
+    """Stand-in for the provider SDK rate limit error."""
+
+    status_code = 429
+
+
+class TestProviderScheduler:
+    """Tests for ProviderScheduler admission control."""
+
+    @pytest.mark.asyncio
+    async def test_concurrency_limit_queues_extra_calls(self):
+        """Test that calls beyond the concurrency limit wait for a free slot."""
+        scheduler = ProviderScheduler("test", max_concurrency=2)
+        scheduler.concurrency_limit = 1
+
+        await scheduler.acquire(10)
+        waiter = asyncio.create_task(scheduler.acquire(10))
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+        assert scheduler.queue_depth == 1
+
+        scheduler.release()
+        await asyncio.wait_for(waiter, timeout=1)
+        assert scheduler.in_flight == 1
+        assert scheduler.queue_depth == 0
+
+    @pytest.mark.asyncio
+    async def test_rpm_budget_delays_until_window_frees(self):
+        """Test that the request budget queues calls instead of failing them."""
+        scheduler = ProviderScheduler("test", rpm_limit=1, window_seconds=0.05)
+
+        async with scheduler.slot(10):
+            pass
+        start = time.monotonic()
+        async with scheduler.slot(10):
+            pass
+
+        assert time.monotonic() - start >= 0.04
+        assert scheduler.stats()["max_wait_seconds"] >= 0.04
+
+    @pytest.mark.asyncio
+    async def test_tpm_budget_delays_until_tokens_expire(self):
+        """Test that the token budget accounts for estimated prompt tokens."""
+        scheduler = ProviderScheduler("test", tpm_limit=100, window_seconds=0.05)
+
+        async with scheduler.slot(80):
+            pass
+        start = time.monotonic()
+        async with scheduler.slot(30):
+            pass
+
+        assert time.monotonic() - start >= 0.04
+
+    @pytest.mark.asyncio
+    async def test_oversized_call_admitted_when_window_empty(self):
+        """Test that a call larger than the whole token budget can still run."""
+        scheduler = ProviderScheduler("test", tpm_limit=100)
+
+        async with scheduler.slot(500):
+            pass
+
+        assert scheduler.admitted == 1
+
+    @pytest.mark.asyncio
+    async def test_queue_timeout(self):
+        """Test that a call gives up after the maximum queue wait."""
+        scheduler = ProviderScheduler("test", rpm_limit=1, max_wait_seconds=0.02)
+
+        await scheduler.acquire(10)
+        with pytest.raises(SchedulerQueueTimeout):
+            await scheduler.acquire(10)
+        assert scheduler.timed_out == 1
+
+    @pytest.mark.asyncio
+    async def test_aimd_adapts_concurrency_limit(self):
+        """Test that rate limits halve the limit and successes raise it slowly."""
+        scheduler = ProviderScheduler("test", max_concurrency=8)
+        assert scheduler.concurrency_limit == 4
+
+        with pytest.raises(RateLimitError):
+            async with scheduler.slot(10):
+                raise RateLimitError()
+        assert scheduler.concurrency_limit == 2
+        assert scheduler.rate_limited == 1
+
+        for _ in range(4):
+            async with scheduler.slot(10):
+                pass
+        assert 3 <= scheduler.concurrency_limit < 4
+
+    @pytest.mark.asyncio
+    async def test_limit_stays_within_bounds(self):
+        """Test that the adaptive limit never leaves [min, max]."""
+        scheduler = ProviderScheduler("test", max_concurrency=2, min_concurrency=1)
+
+        for _ in range(5):
+            with pytest.raises(RateLimitError):
+                async with scheduler.slot(1):
+                    raise RateLimitError()
+        assert scheduler.concurrency_limit == 1
+
+        for _ in range(50):
+            async with scheduler.slot(1):
+                pass
+        assert scheduler.concurrency_limit == 2
+
+    @pytest.mark.asyncio
+    async def test_other_errors_do_not_reduce_limit(self):
+        """Test that ordinary failures release the slot without backing off."""
+        scheduler = ProviderScheduler("test", max_concurrency=8)
+
+        with pytest.raises(ValueError):
+            async with scheduler.slot(10):
+                raise ValueError("bad request")
+
+        assert scheduler.concurrency_limit > 4
+        assert scheduler.in_flight == 0
+
+    @pytest.mark.asyncio
+    async def test_cancelled_calls_do_not_raise_limit(self):
+        """Test that cancelled calls release their slot without counting as successes."""
+        scheduler = ProviderScheduler("test", max_concurrency=8)
+
+        for _ in range(4):
+            with pytest.raises(asyncio.CancelledError):
+                async with scheduler.slot(10):
+                    raise asyncio.CancelledError()
+
+        assert scheduler.concurrency_limit == 4
+        assert scheduler.in_flight == 0
+
+    @pytest.mark.asyncio
+    async def test_admission_wakes_callers_queued_behind(self):
+        """Test that callers queued behind an admitted one start if there is room."""
+        scheduler = ProviderScheduler("test", rpm_limit=2, window_seconds=0.05)
+        await scheduler.acquire(10)
+        await scheduler.acquire(10)
+
+        # The first waits for the window, the second queues behind it
+        first = asyncio.create_task(scheduler.acquire(10))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(scheduler.acquire(10))
+        await asyncio.wait_for(first, timeout=1)
+
+        # Nothing is released, yet the second call fits in the same window
+        await asyncio.wait_for(second, timeout=1)
+        assert scheduler.in_flight == 4
+
+
+def test_is_rate_limit_error():
+    """Test detection of provider rate limit and overload errors."""
+    assert is_rate_limit_error(RateLimitError())
+
+    class OverloadedError(Exception):
+        pass
+
+    assert is_rate_limit_error(OverloadedError())
+
+    overloaded = Exception()
+    overloaded.status_code = 529
+    assert is_rate_limit_error(overloaded)
+
+    assert not is_rate_limit_error(ValueError("bad request"))
@@ -1,15 +1,28 @@
 """Tests for the proposal generator service."""
 
-import pytest
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from unittest.mock import AsyncMock, MagicMock, patch
 
-from app.models import ProposalGeneratorInput
+import pytest
+from langchain_core.messages import AIMessage
+
+from app.core.config import settings
+from app.models import ProposalGeneratorOutput
 from app.services.proposal_generator import (
-    ProposalGenerator,
+    GeneratorPool,
+    LLMBackend,
+    ProposalCache,
     ProposalGenerationError,
-    get_proposal_generator,
+    ProposalGenerator,
+    ProposalRateLimitError,
+    SingleFlight,
     generate_proposal,
+    generate_proposals_batch,
+    get_proposal_generator,
+    stream_proposal,
 )
 
 
@@ -17,126 +30,222 @@ class TestProposalGenerator:
     """Tests for the ProposalGenerator service."""
 
     @patch("app.services.proposal_generator.ChatAnthropic")
-    @patch("app.services.proposal_generator.PromptTemplate")
-    @patch("app.services.proposal_generator.LLMChain")
-    def test_init_with_claude_model(self, mock_llm_chain, mock_prompt_template, mock_chat_anthropic, monkeypatch):
+    def test_init_with_claude_model(self, mock_chat_anthropic, monkeypatch):
         """Test initialization with Claude model."""
         # Set environment variables
-        monkeypatch.setattr("app.services.proposal_generator.settings.ANTHROPIC_API_KEY", "test-key")
-        monkeypatch.setattr("app.services.proposal_generator.settings.DEFAULT_LLM_MODEL", "claude-3-haiku")
-        
+        monkeypatch.setattr(
+            "app.services.proposal_generator.settings.ANTHROPIC_API_KEY", "test-key"
+        )
+        monkeypatch.setattr(
+            "app.services.proposal_generator.settings.DEFAULT_LLM_MODEL",
+            "claude-3-haiku",
+        )
+
         # Create mock instances
         mock_chat_anthropic.return_value = "mock_llm"
-        mock_prompt_template.return_value = "mock_prompt"
-        mock_llm_chain.return_value = "mock_chain"
-        
+
         # Create generator
         generator = ProposalGenerator()
-        
+
         # Check if correct LLM was instantiated
         mock_chat_anthropic.assert_called_once()
         assert generator.model_name == "claude-3-haiku"
-        
-        # Check if chain was set up
-        mock_prompt_template.assert_called_once()
-        mock_llm_chain.assert_called_once()
+
+        # Check if the chat model is called directly
+        assert generator.backends[0].llm == "mock_llm"
 
     @patch("app.services.proposal_generator.ChatOpenAI")
-    @patch("app.services.proposal_generator.PromptTemplate")
-    @patch("app.services.proposal_generator.LLMChain")
-    def test_init_with_openai_model(self, mock_llm_chain, mock_prompt_template, mock_chat_openai, monkeypatch):
+    def test_init_with_openai_model(self, mock_chat_openai, monkeypatch):
         """Test initialization with OpenAI model."""
         # Set environment variables
-        monkeypatch.setattr("app.services.proposal_generator.settings.OPENAI_API_KEY", "test-key")
-        monkeypatch.setattr("app.services.proposal_generator.settings.DEFAULT_LLM_MODEL", "gpt-4")
-        
+        monkeypatch.setattr(
+            "app.services.proposal_generator.settings.OPENAI_API_KEY", "test-key"
+        )
+        monkeypatch.setattr(
+            "app.services.proposal_generator.settings.DEFAULT_LLM_MODEL", "gpt-4"
+        )
+
         # Create mock instances
         mock_chat_openai.return_value = "mock_llm"
-        mock_prompt_template.return_value = "mock_prompt"
-        mock_llm_chain.return_value = "mock_chain"
-        
+
         # Create generator
         generator = ProposalGenerator()
-        
+
         # Check if correct LLM was instantiated
         mock_chat_openai.assert_called_once()
         assert generator.model_name == "gpt-4"
-        
-        # Check if chain was set up
-        mock_prompt_template.assert_called_once()
-        mock_llm_chain.assert_called_once()
+
+        # Check if the chat model is called directly
+        assert generator.backends[0].llm == "mock_llm"
+
+    @patch("app.services.proposal_generator.ChatAnthropic")
+    def test_init_with_invalid_template(self, mock_chat_anthropic, monkeypatch):
+        """Test that unknown template placeholders are rejected up front."""
+        monkeypatch.setattr(
+            "app.services.proposal_generator.settings.ANTHROPIC_API_KEY", "test-key"
+        )
+
+        with pytest.raises(ProposalGenerationError, match="budget"):
+            ProposalGenerator(prompt_template="Write about {job_title} within {budget}")
 
     @pytest.mark.asyncio
     @patch("app.services.proposal_generator.ChatAnthropic")
-    @patch("app.services.proposal_generator.PromptTemplate")
-    @patch("app.services.proposal_generator.LLMChain")
-    async def test_generate_proposal(self, mock_llm_chain, mock_prompt_template, mock_chat_anthropic, 
-                                    mock_chain, proposal_input_with_context, monkeypatch):
+    async def test_generate_proposal(
+        self, mock_chat_anthropic, mock_llm, proposal_input_with_context, monkeypatch
+    ):
         """Test proposal generation."""
         # Set environment variables to avoid API key error
-        monkeypatch.setattr("app.services.proposal_generator.settings.ANTHROPIC_API_KEY", "test-key")
-        
+        monkeypatch.setattr(
+            "app.services.proposal_generator.settings.ANTHROPIC_API_KEY", "test-key"
+        )
+
         # Create mock instances
-        mock_chat_anthropic.return_value = "mock_llm"
-        mock_prompt_template.return_value = "mock_prompt"
-        mock_llm_chain.return_value = mock_chain
-        
+        mock_chat_anthropic.return_value = mock_llm
+
         # Create generator
         generator = ProposalGenerator()
-        
+
         # Generate proposal
         result = await generator.generate_proposal(proposal_input_with_context)
-        
-        # Check if chain was called with correct parameters
-        mock_chain.ainvoke.assert_called_once()
-        call_args = mock_chain.ainvoke.call_args[0][0]
-        assert call_args["job_title"] == "Python Developer"
-        assert call_args["job_description"] == "Looking for a Python developer for a web scraping project"
-        assert call_args["skills"] == "Python, Scrapy, FastAPI"
-        assert "5 years of experience" in call_args["additional_context_prompt"]
-        
+
+        # Check if the model was called with the rendered prompt
+        mock_llm.ainvoke.assert_called_once()
+        prompt_text = mock_llm.ainvoke.call_args[0][0]
+        assert "Job Title: Python Developer" in prompt_text
+        assert (
+            "Looking for a Python developer for a web scraping project" in prompt_text
+        )
+        assert "Skills Required: Python, Scrapy, FastAPI" in prompt_text
+        assert "Additional Context: 5 years of experience" in prompt_text
+
         # Check result
         assert result.proposal_text == "This is a generated proposal."
         assert isinstance(result.generation_time, datetime)
 
     @pytest.mark.asyncio
     @patch("app.services.proposal_generator.ChatAnthropic")
-    async def test_generate_proposal_error(self, mock_chat_anthropic, mock_chain, proposal_input, monkeypatch):
+    async def test_generate_proposal_error(
+        self, mock_chat_anthropic, mock_llm, proposal_input, monkeypatch
+    ):
         """Test error handling during proposal generation."""
         # Set environment variables to avoid API key error
-        monkeypatch.setattr("app.services.proposal_generator.settings.ANTHROPIC_API_KEY", "test-key")
-        
+        monkeypatch.setattr(
+            "app.services.proposal_generator.settings.ANTHROPIC_API_KEY", "test-key"
+        )
+
         # Create generator with mocked dependencies
-        with patch("app.services.proposal_generator.PromptTemplate"):
-            with patch("app.services.proposal_generator.LLMChain", return_value=mock_chain):
-                generator = ProposalGenerator()
-                generator.chain = mock_chain
-                generator.chain.ainvoke.side_effect = Exception("Test error")
-                
-                # Generate proposal should raise an exception
-                with pytest.raises(ProposalGenerationError):
-                    await generator.generate_proposal(proposal_input)
+        mock_chat_anthropic.return_value = mock_llm
+        generator = ProposalGenerator()
+        mock_llm.ainvoke.side_effect = Exception("Test error")
+
+        # Generate proposal should raise an exception
+        with pytest.raises(ProposalGenerationError):
+            await generator.generate_proposal(proposal_input)
+
+    @pytest.mark.asyncio
+    @patch("app.services.proposal_generator.ChatAnthropic")
+    async def test_stream_proposal(
+        self, mock_chat_anthropic, proposal_input_with_context, monkeypatch
+    ):
+        """Test that chunks are yielded as they arrive, followed by the assembled output."""
+        monkeypatch.setattr(
+            "app.services.proposal_generator.settings.ANTHROPIC_API_KEY", "test-key"
+        )
+
+        async def fake_astream(prompt_text):
+            assert "5 years of experience" in prompt_text
+            for content in [
+                "This is ",
+                [{"type": "text", "text": "a streamed"}],
+                "",
+                " proposal. ",
+            ]:
+                yield MagicMock(content=content)
+
+        mock_llm = MagicMock()
+        mock_llm.astream = fake_astream
+        mock_chat_anthropic.return_value = mock_llm
+
+        generator = ProposalGenerator()
+        events = [
+            event
+            async for event in generator.stream_proposal(proposal_input_with_context)
+        ]
+
+        assert events[:-1] == ["This is ", "a streamed", " proposal. "]
+        assert events[-1].proposal_text == "This is a streamed proposal."
+        assert isinstance(events[-1].generation_time, datetime)
+
+    @pytest.mark.asyncio
+    @patch("app.services.proposal_generator.ChatAnthropic")
+    async def test_stream_proposal_error(
+        self, mock_chat_anthropic, proposal_input, monkeypatch
+    ):
+        """Test that provider errors during streaming are wrapped."""
+        monkeypatch.setattr(
+            "app.services.proposal_generator.settings.ANTHROPIC_API_KEY", "test-key"
+        )
+
+        async def failing_astream(_prompt_text):
+            yield MagicMock(content="Partial ")
+            raise Exception("Connection reset")
+
+        mock_llm = MagicMock()
+        mock_llm.astream = failing_astream
+        mock_chat_anthropic.return_value = mock_llm
+
+        generator = ProposalGenerator()
+        with pytest.raises(ProposalGenerationError):
+            async for _ in generator.stream_proposal(proposal_input):
+                pass
+
+    @pytest.mark.asyncio
+    @patch("app.services.proposal_generator.ChatAnthropic")
+    async def test_generate_proposal_rate_limited(
+        self, mock_chat_anthropic, mock_llm, proposal_input, monkeypatch
+    ):
+        """Test that provider rate limits surface as ProposalRateLimitError."""
+        monkeypatch.setattr(
+            "app.services.proposal_generator.settings.ANTHROPIC_API_KEY", "test-key"
+        )
+
+        class RateLimitError(Exception):
+            status_code = 429
+
+        mock_chat_anthropic.return_value = mock_llm
+        generator = ProposalGenerator()
+        mock_llm.ainvoke.side_effect = RateLimitError("Too many requests")
+
+        with pytest.raises(ProposalRateLimitError):
+            await generator.generate_proposal(proposal_input)
+        assert generator.scheduler.in_flight == 0
 
     @patch("app.services.proposal_generator.ProposalGenerator")
     def test_get_proposal_generator(self, mock_generator_class):
-        """Test singleton pattern of get_proposal_generator."""
-        # Reset the singleton first to ensure test isolation
+        """Test that get_proposal_generator reuses pooled instances."""
+        # Empty the pool first to ensure test isolation
         import app.services.proposal_generator
-        app.services.proposal_generator.default_generator = None
-        
+
+        app.services.proposal_generator.generator_pool.clear()
+
         # Set up mock
         mock_generator_class.return_value = "mock_generator_instance"
-        
+
         # Get generator - should create a new one
         result1 = get_proposal_generator()
         assert result1 == "mock_generator_instance"
         mock_generator_class.assert_called_once()
-        
+        assert (
+            mock_generator_class.call_args.kwargs["temperature"]
+            == settings.DEFAULT_LLM_TEMPERATURE
+        )
+
         # Get generator again - should reuse the existing one
         mock_generator_class.reset_mock()
         result2 = get_proposal_generator()
         assert result2 == result1
         mock_generator_class.assert_not_called()
+        app.services.proposal_generator.generator_pool.clear()
 
     @pytest.mark.asyncio
     @patch("app.services.proposal_generator.get_proposal_generator")
@@ -146,11 +255,909 @@ class TestProposalGenerator:
         mock_generator = MagicMock()
         mock_generator.generate_proposal = AsyncMock(return_value="mock_result")
         mock_get_generator.return_value = mock_generator
-        
+
         # Call helper function
         result = await generate_proposal(proposal_input)
-        
+
         # Check if the generator was called correctly
+        mock_get_generator.assert_called_once_with(None, None)
+        mock_generator.generate_proposal.assert_called_once_with(
+            proposal_input, fresh=False
+        )
+        assert result == "mock_result"
+
+    @pytest.mark.asyncio
+    @patch("app.services.proposal_generator.get_proposal_generator")
+    async def test_stream_proposal_helper(self, mock_get_generator, proposal_input):
+        """Test the stream_proposal helper function."""
+
+        async def fake_stream(input_data, **_kwargs):
+            assert input_data == proposal_input
+            yield "chunk"
+            yield "mock_result"
+
+        mock_generator = MagicMock()
+        mock_generator.stream_proposal = fake_stream
+        mock_get_generator.return_value = mock_generator
+
+        events = [event async for event in stream_proposal(proposal_input)]
+
         mock_get_generator.assert_called_once()
-        mock_generator.generate_proposal.assert_called_once_with(proposal_input)
-        assert result == "mock_result" 
\ No newline at end of file
+        assert events == ["chunk", "mock_result"]
+
+
+class TestPromptBudget:
+    """Tests for the prompt token budget in ProposalGenerator."""
+
+    @pytest.fixture
+    def generator(self, monkeypatch, mock_llm):
+        monkeypatch.setattr(
+            "app.services.proposal_generator.settings.ANTHROPIC_API_KEY", "test-key"
+        )
+        monkeypatch.setattr(
+            "app.services.proposal_generator.settings.PROPOSAL_PROMPT_MAX_TOKENS", 600
+        )
+        monkeypatch.setattr(
+            "app.services.proposal_generator.ChatAnthropic",
+            MagicMock(return_value=mock_llm),
+        )
+        return ProposalGenerator(
+            model_name="claude-3-haiku-20240307", fallback_models=[]
+        )
+
+    def test_max_tokens_derived_from_target_words(self, monkeypatch, mock_llm):
+        """Test that the chat model gets a max_tokens matching the proposal length."""
+        monkeypatch.setattr(
+            "app.services.proposal_generator.settings.ANTHROPIC_API_KEY", "test-key"
+        )
+        monkeypatch.setattr(
+            "app.services.proposal_generator.settings.PROPOSAL_MAX_OUTPUT_WORDS", 300
+        )
+        chat_anthropic = MagicMock(return_value=mock_llm)
+        monkeypatch.setattr(
+            "app.services.proposal_generator.ChatAnthropic", chat_anthropic
+        )
+
+        generator = ProposalGenerator(
+            model_name="claude-3-haiku-20240307", fallback_models=[]
+        )
+
+        assert (
+            chat_anthropic.call_args.kwargs["max_tokens"] == generator.max_output_tokens
+        )
+        assert 400 < generator.max_output_tokens < 600
+
+    def test_short_input_not_trimmed(self, generator, proposal_input_with_context):
+        """Test that inputs within the budget are rendered in full."""
+        prompt_text, truncated = generator.prepare_prompt(proposal_input_with_context)
+
+        assert truncated == []
+        assert proposal_input_with_context.job_description in prompt_text
+        assert "Additional Context: 5 years of experience" in prompt_text
+
+    def test_long_input_trimmed_to_budget(self, generator, proposal_input):
+        """Test that a huge job post and context are cut to fit the budget."""
+        long_input = proposal_input.model_copy(
+            update={
+                "job_description": "Build a scraper for product pages. " * 2000,
+                "additional_context": "I have built many scrapers. " * 500,
+            }
+        )
+
+        prompt_text, truncated = generator.prepare_prompt(long_input)
+
+        assert truncated == ["job_description", "additional_context"]
+        assert generator.estimate_tokens(prompt_text) <= 600
+        assert "Job Title: Python Developer" in prompt_text
+        assert "Additional Context: I have built many scrapers." in prompt_text
+        assert "PROPOSAL:" in prompt_text
+
+    def test_budget_disabled(self, generator, proposal_input, monkeypatch):
+        """Test that a budget of 0 sends the input untrimmed."""
+        monkeypatch.setattr(
+            "app.services.proposal_generator.settings.PROPOSAL_PROMPT_MAX_TOKENS", 0
+        )
+        long_input = proposal_input.model_copy(
+            update={"job_description": "Build a scraper. " * 2000}
+        )
+
+        _, truncated = generator.prepare_prompt(long_input)
+
+        assert truncated == []
+
+    @pytest.mark.asyncio
+    async def test_generation_sends_trimmed_prompt(
+        self, generator, mock_llm, proposal_input
+    ):
+        """Test that the model receives the budgeted prompt."""
+        long_input = proposal_input.model_copy(
+            update={"job_description": "Build a scraper. " * 2000}
+        )
+
+        await generator.generate_proposal(long_input)
+
+        prompt_text = mock_llm.ainvoke.call_args[0][0]
+        assert generator.estimate_tokens(prompt_text) <= 600
+
+    def test_preview_prompt(self, generator, proposal_input, mock_llm):
+        """Test that the dry-run preview reports the prompt and token estimates without calling the model."""
+        preview = generator.preview_prompt(proposal_input)
+
+        assert preview.model == "claude-3-haiku-20240307"
+        assert "Job Title: Python Developer" in preview.prompt
+        assert preview.prompt_tokens == generator.estimate_tokens(preview.prompt)
+        assert preview.prompt_budget_tokens == 600
+        assert preview.max_output_tokens == generator.max_output_tokens
+        mock_llm.ainvoke.assert_not_called()
+
+
+class TestProposalCache:
+    """Tests for the in-process proposal response cache."""
+
+    @staticmethod
+    def _output(text: str) -> ProposalGeneratorOutput:
+        return ProposalGeneratorOutput(
+            proposal_text=text, generation_time=datetime.utcnow()
+        )
+
+    def test_hit_and_miss_counters(self):
+        """Test that lookups are counted as hits or misses."""
+        cache = ProposalCache(max_size=2, ttl_seconds=60)
+        assert cache.get("a") is None
+        output = self._output("A proposal")
+        cache.set("a", output)
+        assert cache.get("a") is output
+
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["evictions"] == 0
+        assert stats["size"] == 1
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted when full."""
+        cache = ProposalCache(max_size=2, ttl_seconds=60)
+        cache.set("a", self._output("A"))
+        cache.set("b", self._output("B"))
+        # Touch "a" so "b" becomes the least recently used entry
+        cache.get("a")
+        cache.set("c", self._output("C"))
+
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.get("c") is not None
+        assert cache.evictions == 1
+        assert len(cache) == 2
+
+    def test_ttl_expiry(self, monkeypatch):
+        """Test that entries expire after the TTL and count as evictions."""
+        now = [1000.0]
+        monkeypatch.setattr(
+            "app.services.proposal_generator.time.monotonic", lambda: now[0]
+        )
+        cache = ProposalCache(max_size=2, ttl_seconds=10)
+        cache.set("a", self._output("A"))
+
+        now[0] += 9
+        assert cache.get("a") is not None
+        now[0] += 2
+        assert cache.get("a") is None
+        assert cache.evictions == 1
+        assert len(cache) == 0
+
+
+class TestProposalGeneratorCaching:
+    """Tests for cache integration in ProposalGenerator."""
+
+    @pytest.fixture
+    def generator_factory(self, monkeypatch, mock_llm):
+        """Build generators with a mocked chat model."""
+        monkeypatch.setattr(
+            "app.services.proposal_generator.settings.ANTHROPIC_API_KEY", "test-key"
+        )
+        monkeypatch.setattr(
+            "app.services.proposal_generator.ChatAnthropic",
+            MagicMock(return_value=mock_llm),
+        )
+
+        def factory(**kwargs):
+            return ProposalGenerator(**kwargs)
+
+        return factory
+
+    @pytest.mark.asyncio
+    async def test_repeated_request_served_from_cache(
+        self, generator_factory, mock_llm, proposal_input
+    ):
+        """Test that an identical request does not call the model again."""
+        generator = generator_factory(cache=ProposalCache())
+
+        first = await generator.generate_proposal(proposal_input)
+        second = await generator.generate_proposal(proposal_input)
+
+        assert second.proposal_text == first.proposal_text
+        assert not first.cached and second.cached
+        mock_llm.ainvoke.assert_called_once()
+        assert generator.cache.hits == 1
+
+    @pytest.mark.asyncio
+    async def test_fresh_bypasses_cache(
+        self, generator_factory, mock_llm, proposal_input
+    ):
+        """Test that fresh=True calls the model and replaces the cached entry."""
+        generator = generator_factory(cache=ProposalCache())
+
+        await generator.generate_proposal(proposal_input)
+        mock_llm.ainvoke.return_value = AIMessage(content="A new variant.")
+        fresh = await generator.generate_proposal(proposal_input, fresh=True)
+        cached = await generator.generate_proposal(proposal_input)
+
+        assert mock_llm.ainvoke.call_count == 2
+        assert fresh.proposal_text == "A new variant."
+        assert not fresh.cached
+        assert cached.proposal_text == fresh.proposal_text
+
+    def test_fingerprint_normalizes_whitespace(self, generator_factory, proposal_input):
+        """Test that cosmetic whitespace differences map to the same key."""
+        generator = generator_factory()
+        padded = proposal_input.model_copy(
+            update={"job_description": f"  {proposal_input.job_description}\n\n"}
+        )
+        assert generator.fingerprint(padded) == generator.fingerprint(proposal_input)
+
+    def test_fingerprint_depends_on_generation_settings(
+        self, generator_factory, proposal_input
+    ):
+        """Test that model, temperature and template changes invalidate cached entries."""
+        base = generator_factory().fingerprint(proposal_input)
+
+        assert generator_factory(temperature=0.2).fingerprint(proposal_input) != base
+        assert (
+            generator_factory(model_name="claude-3-opus-20240229").fingerprint(
+                proposal_input
+            )
+            != base
+        )
+        assert (
+            generator_factory(
+                prompt_template="{job_title} {job_description} {skills} {additional_context_prompt}"
+            ).fingerprint(proposal_input)
+            != base
+        )
+
+        other_skills = proposal_input.model_copy(update={"skills": ["Go"]})
+        assert generator_factory().fingerprint(other_skills) != base
+
+    @pytest.mark.asyncio
+    @pytest.mark.usefixtures("mock_llm")
+    async def test_stream_served_from_cache(self, generator_factory, proposal_input):
+        """Test that a cached proposal is streamed as a single chunk."""
+        generator = generator_factory(cache=ProposalCache())
+        output = await generator.generate_proposal(proposal_input)
+
+        events = [event async for event in generator.stream_proposal(proposal_input)]
+
+        assert events == [
+            output.proposal_text,
+            output.model_copy(update={"cached": True}),
+        ]
+
+
+class TestSingleFlight:
+    """Tests for coalescing of identical concurrent calls."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_calls_share_one_task(self):
+        """Test that concurrent callers with the same key share a single call."""
+        flight = SingleFlight()
+        calls = 0
+        release = asyncio.Event()
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            return object()
+
+        waiters = [asyncio.create_task(flight.run("key", work)) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*waiters)
+
+        assert calls == 1
+        assert results[0] is results[1] is results[2]
+        assert flight.coalesced == 2
+        assert len(flight) == 0
+
+    @pytest.mark.asyncio
+    async def test_exception_shared_by_all_waiters(self):
+        """Test that every waiter receives the shared call's exception."""
+        flight = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0)
+            raise ProposalGenerationError("boom")
+
+        waiters = [asyncio.create_task(flight.run("key", work)) for _ in range(2)]
+        results = await asyncio.gather(*waiters, return_exceptions=True)
+
+        assert all(isinstance(result, ProposalGenerationError) for result in results)
+
+    @pytest.mark.asyncio
+    async def test_cancelling_one_waiter_keeps_call_running(self):
+        """Test that the shared call survives while other waiters remain."""
+        flight = SingleFlight()
+        release = asyncio.Event()
+
+        async def work():
+            await release.wait()
+            return "done"
+
+        first = asyncio.create_task(flight.run("key", work))
+        second = asyncio.create_task(flight.run("key", work))
+        await asyncio.sleep(0)
+
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+
+        assert await second == "done"
+        assert first.cancelled()
+
+    @pytest.mark.asyncio
+    async def test_cancelling_last_waiter_cancels_call(self):
+        """Test that the shared call is cancelled once nobody is waiting for it."""
+        flight = SingleFlight()
+        started = asyncio.Event()
+        cancelled = asyncio.Event()
+
+        async def work():
+            started.set()
+            try:
+                await asyncio.sleep(60)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        waiters = [asyncio.create_task(flight.run("key", work)) for _ in range(2)]
+        await started.wait()
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.wait_for(cancelled.wait(), timeout=1)
+
+        assert len(flight) == 0
+
+    @pytest.mark.asyncio
+    async def test_call_being_cancelled_is_not_joined(self):
+        """Test that a caller arriving after the last waiter left starts a new call."""
+        flight = SingleFlight()
+        started = asyncio.Event()
+
+        async def abandoned():
+            started.set()
+            try:
+                await asyncio.sleep(60)
+            except asyncio.CancelledError:
+                # Slow cleanup keeps the task pending while it is being cancelled
+                await asyncio.sleep(0.01)
+                raise
+
+        async def work():
+            return "done"
+
+        waiter = asyncio.create_task(flight.run("key", abandoned))
+        await started.wait()
+        abandoned_call = flight._calls["key"]
+        abandoned_task = abandoned_call.task
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert abandoned_call.cancelled
+
+        assert await flight.run("key", work) == "done"
+        assert flight.coalesced == 0
+        await asyncio.gather(abandoned_task, return_exceptions=True)
+        assert abandoned_task.cancelled()
+
+    @pytest.mark.asyncio
+    async def test_generator_coalesces_identical_requests(
+        self, monkeypatch, proposal_input
+    ):
+        """Test that ProposalGenerator issues one model call for identical concurrent requests."""
+        monkeypatch.setattr(
+            "app.services.proposal_generator.settings.ANTHROPIC_API_KEY", "test-key"
+        )
+
+        async def slow_ainvoke(_prompt_text):
+            await asyncio.sleep(0.01)
+            return AIMessage(content="This is a generated proposal.")
+
+        llm = MagicMock()
+        llm.ainvoke = AsyncMock(side_effect=slow_ainvoke)
+        monkeypatch.setattr(
+            "app.services.proposal_generator.ChatAnthropic", MagicMock(return_value=llm)
+        )
+        generator = ProposalGenerator()
+
+        results = await asyncio.gather(
+            *(generator.generate_proposal(proposal_input) for _ in range(3))
+        )
+
+        llm.ainvoke.assert_called_once()
+        assert len({result.proposal_text for result in results}) == 1
+        # Only the caller that started the call reports a new proposal
+        assert [result.cached for result in results].count(False) == 1
+
+    @pytest.mark.asyncio
+    async def test_fresh_request_does_not_join_cached_variant(
+        self, monkeypatch, proposal_input
+    ):
+        """Test that a fresh request runs its own model call alongside an identical one."""
+        monkeypatch.setattr(
+            "app.services.proposal_generator.settings.ANTHROPIC_API_KEY", "test-key"
+        )
+
+        async def slow_ainvoke(_prompt_text):
+            await asyncio.sleep(0.01)
+            return AIMessage(content="This is a generated proposal.")
+
+        llm = MagicMock()
+        llm.ainvoke = AsyncMock(side_effect=slow_ainvoke)
+        monkeypatch.setattr(
+            "app.services.proposal_generator.ChatAnthropic", MagicMock(return_value=llm)
+        )
+        generator = ProposalGenerator(cache=ProposalCache())
+
+        cached, fresh = await asyncio.gather(
+            generator.generate_proposal(proposal_input),
+            generator.generate_proposal(proposal_input, fresh=True),
+        )
+
+        assert llm.ainvoke.call_count == 2
+        assert cached is not fresh
+
+
+class TestGenerateProposalsBatch:
+    """Tests for batch generation with bounded concurrency."""
+
+    @pytest.mark.asyncio
+    @patch("app.services.proposal_generator.get_proposal_generator")
+    async def test_concurrency_cap_and_per_item_errors(
+        self, mock_get_generator, proposal_input
+    ):
+        """Test that the concurrency cap is respected and failures stay per item."""
+        running = 0
+        max_running = 0
+
+        async def fake_generate(input_data, **_kwargs):
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            if input_data.job_title == "fail":
+                raise ProposalGenerationError("boom")
+            return ProposalGeneratorOutput(
+                proposal_text=input_data.job_title, generation_time=datetime.utcnow()
+            )
+
+        mock_generator = MagicMock()
+        mock_generator.generate_proposal = fake_generate
+        mock_get_generator.return_value = mock_generator
+        inputs = [
+            proposal_input.model_copy(update={"job_title": title})
+            for title in ["one", "fail", "three", "four", "five"]
+        ]
+
+        results = dict(
+            [item async for item in generate_proposals_batch(inputs, concurrency=2)]
+        )
+
+        assert max_running == 2
+        assert sorted(results) == [0, 1, 2, 3, 4]
+        assert isinstance(results[1], ProposalGenerationError)
+        assert results[4].proposal_text == "five"
+
+    @pytest.mark.asyncio
+    @patch("app.services.proposal_generator.get_proposal_generator")
+    async def test_results_yielded_in_completion_order(
+        self, mock_get_generator, proposal_input
+    ):
+        """Test that a slow job doesn't hold back faster ones."""
+
+        async def fake_generate(input_data, **_kwargs):
+            await asyncio.sleep(0.05 if input_data.job_title == "slow" else 0)
+            return ProposalGeneratorOutput(
+                proposal_text=input_data.job_title, generation_time=datetime.utcnow()
+            )
+
+        mock_generator = MagicMock()
+        mock_generator.generate_proposal = fake_generate
+        mock_get_generator.return_value = mock_generator
+        inputs = [
+            proposal_input.model_copy(update={"job_title": title})
+            for title in ["slow", "fast"]
+        ]
+
+        order = [
+            index async for index, _ in generate_proposals_batch(inputs, concurrency=2)
+        ]
+
+        assert order == [1, 0]
+
+    @pytest.mark.asyncio
+    @patch("app.services.proposal_generator.get_proposal_generator")
+    async def test_generator_setup_error_reported_per_item(
+        self, mock_get_generator, proposal_input
+    ):
+        """Test that a generator setup failure is reported for every job."""
+        mock_get_generator.side_effect = ProposalGenerationError(
+            "ANTHROPIC_API_KEY is required for Claude models"
+        )
+
+        results = [
+            item
+            async for item in generate_proposals_batch(
+                [proposal_input, proposal_input], concurrency=2
+            )
+        ]
+
+        assert [index for index, _ in results] == [0, 1]
+        assert all(isinstance(result, ProposalGenerationError) for _, result in results)
+
+
+class TestHedgingAndFailover:
+    """Tests for hedged requests and failover across backends."""
+
+    @pytest.fixture
+    def llms(self, monkeypatch):
+        """Patch the chat models so each backend gets its own mock, in creation order."""
+        monkeypatch.setattr(
+            "app.services.proposal_generator.settings.ANTHROPIC_API_KEY", "test-key"
+        )
+        monkeypatch.setattr(
+            "app.services.proposal_generator.settings.OPENAI_API_KEY", "test-key"
+        )
+        monkeypatch.setattr(
+            "app.services.proposal_generator.settings.LLM_HEDGE_INITIAL_DELAY_SECONDS",
+            0.05,
+        )
+        created = []
+
+        def make_llm(**_kwargs):
+            llm = MagicMock()
+            llm.ainvoke = AsyncMock(
+                return_value=AIMessage(content=f"Proposal from backend {len(created)}")
+            )
+            created.append(llm)
+            return llm
+
+        monkeypatch.setattr(
+            "app.services.proposal_generator.ChatAnthropic",
+            MagicMock(side_effect=make_llm),
+        )
+        monkeypatch.setattr(
+            "app.services.proposal_generator.ChatOpenAI",
+            MagicMock(side_effect=make_llm),
+        )
+        # Fresh schedulers, so earlier tests don't use up the per-minute request budget
+        monkeypatch.setattr("app.services.llm_scheduler._schedulers", {})
+        return created
+
+    @pytest.mark.usefixtures("llms")
+    def test_backends_in_order(self):
+        """Test that the primary model comes first, followed by the fallbacks."""
+        generator = ProposalGenerator(
+            model_name="claude-3-haiku-20240307",
+            fallback_models=["gpt-4o-mini", "claude-3-haiku-20240307"],
+        )
+
+        assert [backend.model_name for backend in generator.backends] == [
+            "claude-3-haiku-20240307",
+            "gpt-4o-mini",
+        ]
+        assert [backend.provider for backend in generator.backends] == [
+            "anthropic",
+            "openai",
+        ]
+
+    @pytest.mark.usefixtures("llms")
+    def test_fallback_without_api_key_skipped(self, monkeypatch):
+        """Test that a fallback whose provider isn't configured is skipped."""
+        monkeypatch.setattr(
+            "app.services.proposal_generator.settings.OPENAI_API_KEY", None
+        )
+        generator = ProposalGenerator(
+            model_name="claude-3-haiku-20240307", fallback_models=["gpt-4o-mini"]
+        )
+
+        assert len(generator.backends) == 1
+
+    @pytest.mark.asyncio
+    async def test_fast_primary_not_hedged(self, llms, proposal_input):
+        """Test that no hedge is sent when the primary answers in time."""
+        generator = ProposalGenerator(
+            model_name="claude-3-haiku-20240307", fallback_models=["gpt-4o-mini"]
+        )
+
+        result = await generator.generate_proposal(proposal_input)
+
+        assert result.proposal_text == "Proposal from backend 0"
+        llms[1].ainvoke.assert_not_called()
+        assert generator.backends[0].wins == 1
+
+    @pytest.mark.asyncio
+    async def test_slow_primary_hedged_and_cancelled(self, llms, proposal_input):
+        """Test that a slow primary is hedged, the hedge wins and the primary is cancelled."""
+        generator = ProposalGenerator(
+            model_name="claude-3-haiku-20240307", fallback_models=["gpt-4o-mini"]
+        )
+        primary_cancelled = asyncio.Event()
+
+        async def slow(_inputs):
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                primary_cancelled.set()
+                raise
+
+        llms[0].ainvoke.side_effect = slow
+
+        result = await generator.generate_proposal(proposal_input)
+        await asyncio.wait_for(primary_cancelled.wait(), timeout=1)
+
+        assert result.proposal_text == "Proposal from backend 1"
+        assert result.model_used == "gpt-4o-mini"
+        primary, fallback = generator.backends
+        assert fallback.hedges == 1
+        assert fallback.wins == fallback.hedge_wins == 1
+        assert primary.wins == 0
+
+    @pytest.mark.asyncio
+    async def test_hard_failure_fails_over_immediately(
+        self, llms, proposal_input, monkeypatch
+    ):
+        """Test that a failing primary fails over without waiting for the hedge delay."""
+        monkeypatch.setattr(
+            "app.services.proposal_generator.settings.LLM_HEDGE_INITIAL_DELAY_SECONDS",
+            5,
+        )
+        generator = ProposalGenerator(
+            model_name="claude-3-haiku-20240307", fallback_models=["gpt-4o-mini"]
+        )
+        llms[0].ainvoke.side_effect = Exception("Connection refused")
+
+        result = await asyncio.wait_for(
+            generator.generate_proposal(proposal_input), timeout=1
+        )
+
+        assert result.proposal_text == "Proposal from backend 1"
+        primary, fallback = generator.backends
+        assert primary.failures == 1
+        assert fallback.failovers == 1
+        assert fallback.wins == 1
+
+    @pytest.mark.asyncio
+    async def test_all_backends_fail(self, llms, proposal_input):
+        """Test that the error is raised when every backend fails."""
+        generator = ProposalGenerator(
+            model_name="claude-3-haiku-20240307", fallback_models=["gpt-4o-mini"]
+        )
+        llms[0].ainvoke.side_effect = Exception("Connection refused")
+        llms[1].ainvoke.side_effect = Exception("Service unavailable")
+
+        with pytest.raises(ProposalGenerationError, match="Service unavailable"):
+            await generator.generate_proposal(proposal_input)
+
+    @pytest.mark.asyncio
+    @pytest.mark.usefixtures("llms")
+    async def test_hedge_delay_uses_latency_percentile(self, monkeypatch):
+        """Test that the hedge delay follows the observed latency percentile."""
+        monkeypatch.setattr(
+            "app.services.proposal_generator.settings.LLM_HEDGE_MIN_SAMPLES", 10
+        )
+        monkeypatch.setattr(
+            "app.services.proposal_generator.settings.LLM_HEDGE_PERCENTILE", 90
+        )
+        generator = ProposalGenerator(
+            model_name="claude-3-haiku-20240307", fallback_models=["gpt-4o-mini"]
+        )
+        primary = generator.backends[0]
+
+        assert generator._hedge_delay(primary) == 0.05
+        primary.latencies.extend(float(seconds) for seconds in range(1, 11))
+        assert generator._hedge_delay(primary) == 9.0
+
+    @pytest.mark.asyncio
+    async def test_hedge_delay_stable_when_primary_slow(
+        self, llms, proposal_input, monkeypatch
+    ):
+        """Test that cancelled slow primaries are recorded without lowering the hedge delay."""
+        monkeypatch.setattr(
+            "app.services.proposal_generator.settings.LLM_HEDGE_MIN_SAMPLES", 10
+        )
+        monkeypatch.setattr(
+            "app.services.proposal_generator.settings.LLM_HEDGE_PERCENTILE", 90
+        )
+        generator = ProposalGenerator(
+            model_name="claude-3-haiku-20240307", fallback_models=["gpt-4o-mini"]
+        )
+        primary = generator.backends[0]
+        primary.latencies.extend([0.01] * 5 + [0.05] * 5)
+
+        async def slow(_inputs):
+            await asyncio.sleep(5)
+
+        llms[0].ainvoke.side_effect = slow
+
+        for _ in range(5):
+            result = await generator.generate_proposal(proposal_input, fresh=True)
+            assert result.proposal_text == "Proposal from backend 1"
+        await asyncio.sleep(0.01)
+
+        assert len(primary.latencies) == 15
+        assert generator._hedge_delay(primary) >= 0.05
+
+    def test_cancelled_call_never_lowers_percentile(self):
+        """Test that a call cancelled early is not recorded as a fast one."""
+        backend = LLMBackend("claude-3-haiku-20240307", "anthropic", MagicMock())
+        backend.latencies.extend([1.0, 2.0, 3.0])
+
+        backend.record_lower_bound(0.5, 95)
+        assert backend.latency_percentile(95) == 3.0
+        assert len(backend.latencies) == 3
+
+        backend.record_lower_bound(4.0, 95)
+        assert backend.latency_percentile(95) == 4.0
+
+    @pytest.mark.asyncio
+    @pytest.mark.usefixtures("llms")
+    async def test_stream_fails_over_before_first_chunk(self, proposal_input):
+        """Test that streaming fails over when the primary errors before sending text."""
+        generator = ProposalGenerator(
+            model_name="claude-3-haiku-20240307", fallback_models=["gpt-4o-mini"]
+        )
+
+        async def failing_astream(_prompt_text):
+            raise Exception("Connection refused")
+            yield
+
+        async def working_astream(_prompt_text):
+            yield MagicMock(content="From the fallback.")
+
+        generator.backends[0].llm = MagicMock(astream=failing_astream)
+        generator.backends[1].llm = MagicMock(astream=working_astream)
+
+        events = [event async for event in generator.stream_proposal(proposal_input)]
+
+        assert events[-1].proposal_text == "From the fallback."
+        assert generator.backends[1].wins == 1
+
+
+class TestGeneratorPool:
+    """Tests for the keyed generator pool."""
+
+    @pytest.fixture
+    def generator_class(self, monkeypatch):
+        """Replace ProposalGenerator with a cheap stand-in that records its settings."""
+
+        def make_generator(**kwargs):
+            return MagicMock(**kwargs)
+
+        generator_class = MagicMock(side_effect=make_generator)
+        monkeypatch.setattr(
+            "app.services.proposal_generator.ProposalGenerator", generator_class
+        )
+        return generator_class
+
+    def test_same_settings_share_instance(self, generator_class):
+        """Test that equal (model, temperature, template) keys reuse one generator."""
+        pool = GeneratorPool(max_size=4)
+
+        first = pool.get("gpt-4o-mini", 0.2)
+        second = pool.get("gpt-4o-mini", 0.2)
+
+        assert first is second
+        assert generator_class.call_count == 1
+        assert pool.stats()["hits"] == 1
+        assert pool.stats()["misses"] == 1
+
+    def test_overrides_resolve_to_separate_instances(self, generator_class):
+        """Test that each model/temperature/template gets its own generator."""
+        pool = GeneratorPool(max_size=4)
+
+        default = pool.get()
+        assert pool.get("gpt-4o-mini") is not default
+        assert pool.get(temperature=0.1) is not default
+        assert pool.get(prompt_template="Write about {job_title}") is not default
+
+        assert generator_class.call_count == 4
+        assert default.temperature == settings.DEFAULT_LLM_TEMPERATURE
+        assert (
+            pool.get(settings.DEFAULT_LLM_MODEL, settings.DEFAULT_LLM_TEMPERATURE)
+            is default
+        )
+
+    def test_temperature_rounded_in_key(self, generator_class):
+        """Test that temperatures equal to one decimal share a generator."""
+        pool = GeneratorPool(max_size=4)
+
+        first = pool.get("gpt-4o-mini", 0.7)
+
+        assert pool.get("gpt-4o-mini", 0.70001) is first
+        assert pool.get("gpt-4o-mini", 0.6999) is first
+        assert first.temperature == 0.7
+        assert generator_class.call_count == 1
+
+    def test_lru_eviction(self, generator_class):
+        """Test that the least recently used generator is dropped when full."""
+        pool = GeneratorPool(max_size=2)
+
+        first = pool.get("model-a")
+        pool.get("model-b")
+        pool.get("model-a")
+        pool.get("model-c")
+
+        assert len(pool) == 2
+        assert pool.stats()["evictions"] == 1
+        assert pool.get("model-a") is first
+        assert generator_class.call_count == 3
+
+    def test_creation_error_not_pooled(self, generator_class):
+        """Test that a failed construction is raised and retried next time."""
+        generator_class.side_effect = ProposalGenerationError(
+            "OPENAI_API_KEY is required for OpenAI models"
+        )
+        pool = GeneratorPool(max_size=2)
+
+        with pytest.raises(ProposalGenerationError):
+            pool.get("gpt-4o-mini")
+        assert len(pool) == 0
+
+    def test_concurrent_creation_builds_once(self, generator_class):
+        """Test that threads racing for the same key build a single generator."""
+
+        def slow_generator(**kwargs):
+            time.sleep(0.01)
+            return MagicMock(**kwargs)
+
+        generator_class.side_effect = slow_generator
+        pool = GeneratorPool(max_size=2)
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            generators = list(
+                executor.map(lambda _: pool.get("gpt-4o-mini", 0.3), range(8))
+            )
+
+        assert generator_class.call_count == 1
+        assert all(generator is generators[0] for generator in generators)
+
+    @pytest.mark.asyncio
+    async def test_input_overrides_select_pooled_generator(
+        self, monkeypatch, proposal_input
+    ):
+        """Test that model and temperature on the input pick the matching generator."""
+        pool = GeneratorPool(max_size=4)
+        monkeypatch.setattr("app.services.proposal_generator.generator_pool", pool)
+        created = []
+
+        def make_generator(**kwargs):
+            generator = MagicMock(**kwargs)
+            generator.generate_proposal = AsyncMock(return_value=kwargs["model_name"])
+            created.append(generator)
+            return generator
+
+        monkeypatch.setattr(
+            "app.services.proposal_generator.ProposalGenerator",
+            MagicMock(side_effect=make_generator),
+        )
+        override = proposal_input.model_copy(
+            update={"model": "gpt-4o-mini", "temperature": 0.2}
+        )
+
+        assert await generate_proposal(override) == "gpt-4o-mini"
+        assert await generate_proposal(override) == "gpt-4o-mini"
+        assert await generate_proposal(proposal_input) == settings.DEFAULT_LLM_MODEL
+
+        assert len(created) == 2
+        assert created[0].temperature == 0.2
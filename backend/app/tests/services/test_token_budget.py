@@ -0,0 +1,68 @@
+"""Tests for prompt token budgeting."""
+
+from app.services.token_budget import (
+    TRUNCATION_MARKER,
+    compact_text,
+    estimate_tokens,
+    output_token_limit,
+    split_budget,
+    truncate_to_tokens,
+)
+
+
+def test_estimate_tokens_per_provider():
+    """Test that Claude models are estimated more conservatively than OpenAI ones."""
+    text = "x" * 700
+
+    assert estimate_tokens(text, "claude-3-haiku-20240307") == 200
+    assert estimate_tokens(text, "gpt-4o-mini") == 175
+    assert estimate_tokens("", "gpt-4o-mini") == 0
+
+
+def test_output_token_limit_covers_target_words():
+    """Test that the derived max_tokens leaves headroom over the target length."""
+    limit = output_token_limit(300)
+
+    assert 400 < limit < 600
+
+
+def test_compact_text_keeps_paragraphs():
+    """Test that whitespace runs collapse but paragraph breaks survive."""
+    text = "  We need   a developer.\t\n\n\n\n  Must know\tPython.  \n"
+
+    assert compact_text(text) == "We need a developer.\n\nMust know Python."
+
+
+def test_truncate_to_tokens_short_text_unchanged():
+    """Test that text within the budget is returned as is."""
+    assert truncate_to_tokens("Short job post", 100, "gpt-4o-mini") == "Short job post"
+
+
+def test_truncate_to_tokens_cuts_at_word_boundary():
+    """Test that long text is cut on a word boundary and marked."""
+    text = " ".join(f"word{i}" for i in range(1000))
+
+    truncated = truncate_to_tokens(text, 50, "gpt-4o-mini")
+
+    assert truncated.endswith(TRUNCATION_MARKER)
+    assert estimate_tokens(truncated, "gpt-4o-mini") <= 50
+    assert text.startswith(truncated[: -len(TRUNCATION_MARKER)])
+    assert truncated[: -len(TRUNCATION_MARKER)].split()[-1] in text.split()
+
+
+def test_truncate_to_tokens_zero_budget():
+    """Test that a budget too small for the marker drops the text."""
+    assert truncate_to_tokens("Some text", 0, "gpt-4o-mini") == ""
+
+
+def test_split_budget():
+    """Test how the free-text budget is shared between description and context."""
+    # Everything fits
+    assert split_budget(1000, 300, 200) == (300, 200)
+    # The description takes priority, the context keeps a quarter
+    assert split_budget(1000, 5000, 2000) == (750, 250)
+    # Context gets whatever the description doesn't need
+    assert split_budget(1000, 100, 2000) == (100, 900)
+    # Short context isn't padded
+    assert split_budget(1000, 5000, 50) == (950, 50)
+    assert split_budget(-10, 100, 100) == (0, 0)
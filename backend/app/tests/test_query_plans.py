@@ -0,0 +1,383 @@
+"""
+Query plan regression tests.
+
+Each test runs a group of routes and crud functions against a representative
+amount of seeded data, captures every statement they send to Postgres (from
+both engines), and EXPLAINs each one with sequential scans disabled. The
+planner then only falls back to a Seq Scan when no index can serve the query
+at all, which at production volumes means reading the whole table on every
+request: a schema change that drops or stops matching an index fails here.
+"""
+
+import uuid
+from collections.abc import Generator, Iterator
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event, insert, inspect, text
+from sqlmodel import Session, SQLModel, col, delete
+
+from app import crud
+from app.core.api_key_usage import api_key_usage
+from app.core.config import settings
+from app.core.db import async_engine, engine
+from app.core.token_revocation import revocation_list
+from app.models import (
+    Item,
+    Proposal,
+    ProposalJob,
+    ProposalJobStatus,
+    RevokedToken,
+    User,
+)
+from app.tests.utils.utils import random_email, random_lower_string
+
+SEED_USERS = 50
+SEED_ITEMS_PER_USER = 200
+SEED_PROPOSALS_PER_USER = 20
+SEED_JOBS_PER_USER = 10
+SEED_REVOKED_TOKENS = 2000
+
+EXPLAINED_STATEMENTS = ("SELECT", "UPDATE", "DELETE", "WITH")
+
+# Tables some query reads whole on purpose, and why
+SCANNED_TABLES = {
+    "itemcount": "The total item count sums the counters, one row per user",
+}
+
+
+@pytest.fixture(scope="module", autouse=True)
+def seed_data(db: Session) -> Generator[None, None, None]:
+    """Fill every table, so the planner's statistics look like production."""
+    now = datetime.now(timezone.utc)
+    user_ids = [uuid.uuid4() for _ in range(SEED_USERS)]
+    db.execute(
+        insert(User),
+        [
+            {
+                "id": user_id,
+                "email": f"plan-{user_id.hex}@example.com",
+                "hashed_password": "unusable",
+                "is_active": True,
+                "is_superuser": False,
+            }
+            for user_id in user_ids
+        ],
+    )
+    db.execute(
+        insert(Item),
+        [
+            {
+                "id": uuid.uuid4(),
+                "owner_id": user_id,
+                "title": f"item {i} {random_lower_string()[:8]}",
+                "description": random_lower_string(),
+            }
+            for user_id in user_ids
+            for i in range(SEED_ITEMS_PER_USER)
+        ],
+    )
+    db.execute(
+        insert(Proposal),
+        [
+            {
+                "id": uuid.uuid4(),
+                "owner_id": user_id,
+                "job_title": f"job {i}",
+                "proposal_text": random_lower_string(),
+                "input": {"job_title": f"job {i}"},
+                "created_at": now - timedelta(hours=i),
+            }
+            for user_id in user_ids
+            for i in range(SEED_PROPOSALS_PER_USER)
+        ],
+    )
+    # Most jobs are long done; the queue itself is short
+    db.execute(
+        insert(ProposalJob),
+        [
+            {
+                "id": uuid.uuid4(),
+                "owner_id": user_id,
+                "status": ProposalJobStatus.succeeded.value,
+                "input": {"job_title": f"job {i}"},
+                "created_at": now - timedelta(hours=i),
+                "finished_at": now - timedelta(hours=i),
+            }
+            for user_id in user_ids
+            for i in range(SEED_JOBS_PER_USER)
+        ],
+    )
+    revoked_token_ids = [uuid.uuid4() for _ in range(SEED_REVOKED_TOKENS)]
+    db.execute(
+        insert(RevokedToken),
+        [
+            {
+                "id": token_id,
+                "jti": token_id.hex,
+                "scope": "all",
+                "revoked_at": now - timedelta(days=i % 60),
+                "expires_at": now - timedelta(days=i % 60) + timedelta(days=30),
+            }
+            for i, token_id in enumerate(revoked_token_ids)
+        ],
+    )
+    db.commit()
+    crud.reconcile_counters(session=db)
+    db.execute(text("ANALYZE"))
+    db.commit()
+    yield
+    # Items, proposals, jobs and counters go with their owners
+    db.execute(delete(User).where(col(User.id).in_(user_ids)))
+    db.execute(delete(RevokedToken).where(col(RevokedToken.id).in_(revoked_token_ids)))
+    db.commit()
+    crud.reconcile_counters(session=db)
+
+
+@contextmanager
+def captured_statements() -> Iterator[dict[str, Any]]:
+    """Collect the statements sent by both engines, with their first parameters."""
+    statements: dict[str, Any] = {}
+
+    def before_execute(  # type: ignore[no-untyped-def]
+        _conn, _cursor, statement, parameters, _context, executemany
+    ) -> None:
+        if executemany:
+            parameters = parameters[0] if parameters else None
+        statements.setdefault(statement, parameters)
+
+    connectables = [engine, async_engine.sync_engine]
+    for connectable in connectables:
+        event.listen(connectable, "before_cursor_execute", before_execute)
+    try:
+        yield statements
+    finally:
+        for connectable in connectables:
+            event.remove(connectable, "before_cursor_execute", before_execute)
+
+
+def seq_scans(plan: dict[str, Any]) -> Iterator[str]:
+    """Tables a plan (node) reads with a sequential scan."""
+    if plan["Node Type"] == "Seq Scan":
+        yield plan["Relation Name"]
+    for subplan in plan.get("Plans", []):
+        yield from seq_scans(subplan)
+
+
+def assert_no_seq_scans(statements: dict[str, Any]) -> None:
+    checked_tables = set(SQLModel.metadata.tables) - set(SCANNED_TABLES)
+    explained = 0
+    offenders = []
+    for statement, parameters in statements.items():
+        if not statement.lstrip().upper().startswith(EXPLAINED_STATEMENTS):
+            continue
+        # Planned but not run; the connection's transaction is rolled back
+        with engine.connect() as connection:
+            connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+            [plan] = connection.exec_driver_sql(
+                f"EXPLAIN (FORMAT JSON) {statement}", parameters or None
+            ).scalar_one()
+        explained += 1
+        tables = sorted(set(seq_scans(plan["Plan"])) & checked_tables)
+        if tables:
+            offenders.append(f"{', '.join(tables)}: {statement}")
+    assert explained > 0
+    assert not offenders, "Sequential scans in:\n" + "\n\n".join(offenders)
+
+
+def test_foreign_keys_are_indexed() -> None:
+    """Cascading deletes of a user look up every referencing row by its key."""
+    inspector = inspect(engine)
+    unindexed = []
+    for table in inspector.get_table_names():
+        leading_columns = {
+            index["column_names"][0] for index in inspector.get_indexes(table)
+        }
+        primary_key = inspector.get_pk_constraint(table)["constrained_columns"]
+        if primary_key:
+            leading_columns.add(primary_key[0])
+        for foreign_key in inspector.get_foreign_keys(table):
+            if foreign_key["constrained_columns"][0] not in leading_columns:
+                unindexed.append(f"{table}.{foreign_key['constrained_columns'][0]}")
+    assert unindexed == []
+
+
+def test_item_queries_use_indexes(
+    client: TestClient,
+    superuser_token_headers: dict[str, str],
+    normal_user_token_headers: dict[str, str],
+) -> None:
+    url = f"{settings.API_V1_STR}/items/"
+    with captured_statements() as statements:
+        for headers in (superuser_token_headers, normal_user_token_headers):
+            for params in ({"limit": 2}, {"limit": 2, "q": "item"}):
+                page = client.get(url, headers=headers, params=params).json()
+                client.get(
+                    url,
+                    headers=headers,
+                    params={**params, "cursor": page["next_cursor"]},
+                )
+            client.get(url, headers=headers, params={"approximate": True})
+
+        headers = normal_user_token_headers
+        item = client.post(url, headers=headers, json={"title": "Plan"}).json()
+        client.get(f"{url}{item['id']}", headers=headers)
+        client.put(f"{url}{item['id']}", headers=headers, json={"title": "Plan 2"})
+        client.delete(f"{url}{item['id']}", headers=headers)
+
+        results = client.post(
+            f"{url}bulk",
+            headers=headers,
+            json={"items": [{"title": "Bulk 1"}, {"title": "Bulk 2"}]},
+        ).json()["results"]
+        ids = [result["id"] for result in results]
+        client.patch(
+            f"{url}bulk",
+            headers=headers,
+            json={"items": [{"id": id, "title": "Bulk"} for id in ids]},
+        )
+        client.request("DELETE", f"{url}bulk", headers=headers, json={"ids": ids})
+    assert_no_seq_scans(statements)
+
+
+def test_user_queries_use_indexes(
+    client: TestClient,
+    superuser_token_headers: dict[str, str],
+    normal_user_token_headers: dict[str, str],
+) -> None:
+    url = f"{settings.API_V1_STR}/users/"
+    with captured_statements() as statements:
+        client.get(f"{url}me", headers=normal_user_token_headers)
+        page = client.get(
+            url, headers=superuser_token_headers, params={"limit": 2}
+        ).json()
+        client.get(
+            url,
+            headers=superuser_token_headers,
+            params={"limit": 2, "cursor": page["next_cursor"]},
+        )
+        client.get(url, headers=superuser_token_headers, params={"approximate": True})
+
+        user_in = {"email": random_email(), "password": random_lower_string()}
+        user = client.post(url, headers=superuser_token_headers, json=user_in).json()
+        client.get(f"{url}{user['id']}", headers=superuser_token_headers)
+        client.patch(
+            f"{url}{user['id']}",
+            headers=superuser_token_headers,
+            json={"full_name": "Plan"},
+        )
+        client.delete(f"{url}{user['id']}", headers=superuser_token_headers)
+    assert_no_seq_scans(statements)
+
+
+def test_auth_queries_use_indexes(
+    client: TestClient,
+    db: Session,
+    superuser_token_headers: dict[str, str],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(settings, "JWT_STATELESS_CLAIMS", True)
+    monkeypatch.setattr(api_key_usage, "flush_interval_seconds", 0)
+    user_in = {"email": random_email(), "password": random_lower_string()}
+    client.post(
+        f"{settings.API_V1_STR}/users/", headers=superuser_token_headers, json=user_in
+    )
+    login_data = {"username": user_in["email"], "password": user_in["password"]}
+    revocation_list.clear()
+    try:
+        with captured_statements() as statements:
+            tokens = client.post(
+                f"{settings.API_V1_STR}/login/access-token", data=login_data
+            ).json()
+            headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+            # The first revocation sync loads all unexpired revocations
+            client.get(f"{settings.API_V1_STR}/users/me", headers=headers)
+            client.post(
+                f"{settings.API_V1_STR}/login/refresh-token",
+                json={"refresh_token": tokens["refresh_token"]},
+            )
+            client.patch(
+                f"{settings.API_V1_STR}/users/me",
+                headers=headers,
+                json={"full_name": "Plan"},
+            )
+            # Later syncs only load revocations made since the last one
+            revocation_list._synced_at = 0.0
+            client.get(f"{settings.API_V1_STR}/users/me", headers=headers)
+
+            api_key = client.post(
+                f"{settings.API_V1_STR}/api-keys/",
+                headers=superuser_token_headers,
+                json={"name": "Plan"},
+            ).json()
+            client.get(
+                f"{settings.API_V1_STR}/users/me", headers={"X-API-Key": api_key["key"]}
+            )
+            client.get(
+                f"{settings.API_V1_STR}/api-keys/", headers=superuser_token_headers
+            )
+            client.delete(
+                f"{settings.API_V1_STR}/api-keys/{api_key['id']}",
+                headers=superuser_token_headers,
+            )
+            crud.authenticate(
+                session=db, email=user_in["email"], password=user_in["password"]
+            )
+    finally:
+        revocation_list.clear()
+    assert_no_seq_scans(statements)
+
+
+def test_proposal_queries_use_indexes(
+    client: TestClient, db: Session, normal_user_token_headers: dict[str, str]
+) -> None:
+    url = f"{settings.API_V1_STR}/proposals/"
+    with captured_statements() as statements:
+        page = client.get(
+            url, headers=normal_user_token_headers, params={"limit": 1}
+        ).json()
+        if page["next_cursor"]:
+            client.get(
+                url,
+                headers=normal_user_token_headers,
+                params={"limit": 1, "cursor": page["next_cursor"]},
+            )
+        client.get(f"{url}export", headers=normal_user_token_headers)
+
+        job = client.post(
+            f"{url}jobs",
+            headers=normal_user_token_headers,
+            json={
+                "job_title": "Python Developer",
+                "job_description": "We need a developer",
+                "skills": ["Python"],
+            },
+        ).json()
+        client.get(f"{url}jobs/{job['id']}", headers=normal_user_token_headers)
+        crud.claim_proposal_jobs(
+            session=db, limit=10, stale_after_seconds=600, max_attempts=3
+        )
+        crud.finish_proposal_job(
+            session=db, job_id=uuid.UUID(job["id"]), proposal_text="Hello there"
+        )
+        crud.mark_proposal_job_webhook_delivered(
+            session=db, job_id=uuid.UUID(job["id"])
+        )
+        user = crud.get_user_by_email(session=db, email=settings.EMAIL_TEST_USER)
+        assert user
+        crud.get_proposals_page(
+            session=db,
+            owner_id=user.id,
+            limit=10,
+            after=(datetime.now(timezone.utc), uuid.uuid4()),
+        )
+    assert_no_seq_scans(statements)
+
+
+def test_counter_reconciliation_uses_indexes(db: Session) -> None:
+    with captured_statements() as statements:
+        crud.reconcile_counters(session=db, batch_size=10)
+    assert_no_seq_scans(statements)
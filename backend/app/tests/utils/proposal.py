@@ -0,0 +1,24 @@
+import uuid
+
+from sqlmodel import Session
+
+from app import crud
+from app.models import Proposal, ProposalCreate
+from app.tests.utils.utils import random_lower_string
+
+
+def create_random_proposals(
+    db: Session, owner_id: uuid.UUID, count: int = 1
+) -> list[Proposal]:
+    proposals_in = [
+        ProposalCreate(
+            job_title=random_lower_string(),
+            proposal_text=random_lower_string(),
+            model="claude-3-haiku-20240307",
+            input={"job_title": "Python Developer", "skills": ["Python"]},
+        )
+        for _ in range(count)
+    ]
+    return crud.create_proposals(
+        session=db, proposals_in=proposals_in, owner_id=owner_id
+    )
@@ -0,0 +1,17 @@
+from sqlmodel import Session
+
+from app import crud
+from app.models import ProposalJob, ProposalJobCreate
+from app.tests.utils.user import create_random_user
+from app.tests.utils.utils import random_lower_string
+
+
+def create_random_proposal_job(db: Session, **job_fields: object) -> ProposalJob:
+    user = create_random_user(db)
+    job_in = ProposalJobCreate(
+        job_title=random_lower_string(),
+        job_description=random_lower_string(),
+        skills=["Python"],
+        **job_fields,
+    )
+    return crud.create_proposal_job(session=db, job_in=job_in, owner_id=user.id)
@@ -1,3 +1,5 @@
+import base64
+import json
 import logging
 from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
@@ -121,3 +123,17 @@ def verify_password_reset_token(token: str) -> str | None:
         return str(decoded_token["sub"])
     except InvalidTokenError:
         return None
+
+
+def encode_cursor(values: dict[str, Any]) -> str:
+    """Encode keyset pagination values as an opaque, URL-safe cursor."""
+    data = json.dumps(values, default=str, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> dict[str, Any]:
+    """Decode a cursor made by encode_cursor, raising ValueError if it's malformed."""
+    values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    if not isinstance(values, dict):
+        raise ValueError("Invalid cursor")
+    return values
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+"""
+Throughput benchmark for sync vs async database routes.
+
+Serves the same lightweight query (an owner's item count and first page of
+items, like GET /items/) from two routes: a sync `def` route on the sync
+engine, which Starlette runs in its threadpool, and an `async def` route on
+the async engine. Both are driven in-process through httpx's ASGI transport
+with the same number of concurrent clients, so the difference is the cost
+of the request path itself. `--db-latency` adds a server-side pg_sleep to
+every query to mimic a database across the network.
+
+Needs the database from docker compose:
+    docker compose exec backend python scripts/benchmark_db_throughput.py --concurrency 100 --db-latency 0.02
+"""
+
+import argparse
+import asyncio
+import math
+import statistics
+import time
+import uuid
+from typing import Any
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import text
+from sqlmodel import func, select
+
+from app.api.deps import AsyncSessionDep, SessionDep
+from app.core.db import async_engine
+from app.models import Item
+
+
+def build_app(db_latency: float) -> FastAPI:
+    app = FastAPI()
+    sleep = text("SELECT pg_sleep(:seconds)").bindparams(seconds=db_latency)
+
+    @app.get("/sync/{owner_id}")
+    def read_items_sync(session: SessionDep, owner_id: uuid.UUID) -> Any:
+        if db_latency:
+            session.exec(sleep)  # type: ignore[call-overload]
+        count = session.exec(
+            select(func.count()).select_from(Item).where(Item.owner_id == owner_id)
+        ).one()
+        items = session.exec(
+            select(Item).where(Item.owner_id == owner_id).limit(10)
+        ).all()
+        return {"count": count, "data": [item.id for item in items]}
+
+    @app.get("/async/{owner_id}")
+    async def read_items_async(session: AsyncSessionDep, owner_id: uuid.UUID) -> Any:
+        if db_latency:
+            await session.exec(sleep)  # type: ignore[call-overload]
+        count = (
+            await session.exec(
+                select(func.count()).select_from(Item).where(Item.owner_id == owner_id)
+            )
+        ).one()
+        items = (
+            await session.exec(select(Item).where(Item.owner_id == owner_id).limit(10))
+        ).all()
+        return {"count": count, "data": [item.id for item in items]}
+
+    return app
+
+
+async def measure(
+    client: httpx.AsyncClient, path: str, requests: int, concurrency: int
+) -> dict[str, float]:
+    """Return requests per second, failed requests and latency percentiles (ms)."""
+    latencies: list[float] = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one() -> None:
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.get(path)
+            if response.is_success:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+
+    for _ in range(min(50, requests)):
+        await one()
+    latencies.clear()
+    errors = 0
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    if not latencies:
+        latencies = [math.nan]
+    return {
+        "rps": (requests - errors) / elapsed,
+        "errors": errors,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[max(0, int(len(latencies) * 0.99) - 1)] * 1000,
+    }
+
+
+async def main(requests: int, concurrency: int, db_latency: float) -> None:
+    app = build_app(db_latency)
+    owner_id = uuid.uuid4()
+    # Pool timeouts become 500s instead of aborting the run
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        results = {
+            "sync": await measure(client, f"/sync/{owner_id}", requests, concurrency),
+            "async": await measure(client, f"/async/{owner_id}", requests, concurrency),
+        }
+    await async_engine.dispose()
+
+    print(
+        f"{requests} requests, {concurrency} concurrent, {db_latency * 1000:.0f} ms db latency\n"
+    )
+    print(f"{'route':<8} {'req/s':>10} {'errors':>8} {'p50 ms':>10} {'p99 ms':>10}")
+    for name, result in results.items():
+        print(
+            f"{name:<8} {result['rps']:>10.1f} {result['errors']:>8} "
+            f"{result['p50_ms']:>10.1f} {result['p99_ms']:>10.1f}"
+        )
+
+    speedup = results["async"]["rps"] / results["sync"]["rps"]
+    print(f"\nAsync route throughput: {speedup:.2f}x the sync route")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark sync vs async DB routes")
+    parser.add_argument(
+        "--requests", type=int, default=600, help="Timed requests per route"
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=100, help="Concurrent clients"
+    )
+    parser.add_argument(
+        "--db-latency",
+        type=float,
+        default=0.0,
+        help="Seconds of pg_sleep added to every request",
+    )
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency, args.db_latency))
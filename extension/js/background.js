@@ -5,6 +5,21 @@ console.log("Upwork Proposal Generator: Background script loaded");
 // Store auth token in memory
 let authToken = null;
 
+// Request bodies at least this large are sent gzipped (job descriptions can be long)
+const GZIP_MIN_BYTES = 1024;
+
+// Serialize a JSON request body, gzipped when it's large and the browser supports it
+async function jsonRequestBody(data) {
+  const json = JSON.stringify(data);
+  const headers = { 'Content-Type': 'application/json' };
+  if (typeof CompressionStream === 'undefined' || json.length < GZIP_MIN_BYTES) {
+    return { body: json, headers };
+  }
+  const stream = new Blob([json]).stream().pipeThrough(new CompressionStream('gzip'));
+  const body = await new Response(stream).arrayBuffer();
+  return { body, headers: { ...headers, 'Content-Encoding': 'gzip' } };
+}
+
 // Listen for changes in the active tab
 chrome.tabs.onUpdated.addListener((tabId, changeInfo, tab) => {
   // Only proceed if the tab has completed loading
@@ -81,14 +96,15 @@ chrome.runtime.onMessage.addListener((message, sender, sendResponse) => {
     }
     
     // Make the API request from the background script to avoid CORS issues
-    fetch('http://localhost:8000/api/v1/proposals/generate', {
+    jsonRequestBody(message.data)
+    .then(({ body, headers }) => fetch('http://localhost:8000/api/v1/proposals/generate', {
       method: 'POST',
       headers: {
-        'Content-Type': 'application/json',
+        ...headers,
         'Authorization': `Bearer ${authToken}`,
       },
-      body: JSON.stringify(message.data)
-    })
+      body
+    }))
     .then(response => {
       if (response.status === 401) {
         // If unauthorized, clear token and prompt user to log in again
@@ -140,6 +156,142 @@ chrome.runtime.onMessage.addListener((message, sender, sendResponse) => {
   }
 });
 
+// Parse a single Server-Sent Events frame into { event, data }
+function parseSseFrame(frame) {
+  let event = 'message';
+  const dataLines = [];
+  for (const line of frame.split('\n')) {
+    if (line.startsWith('event:')) {
+      event = line.slice(6).trim();
+    } else if (line.startsWith('data:')) {
+      dataLines.push(line.slice(5).trimStart());
+    }
+  }
+  if (dataLines.length === 0) {
+    return null;
+  }
+  return { event, data: JSON.parse(dataLines.join('\n')) };
+}
+
+// Stream a proposal from the API and relay each event over the given port
+async function streamProposal(port, data) {
+  if (!authToken) {
+    console.error("Upwork Proposal Generator: No auth token available");
+    port.postMessage({
+      type: 'error',
+      error: "Authentication required. Please log in using the extension popup."
+    });
+    return;
+  }
+
+  // Abort the request if the content script goes away (e.g. tab closed)
+  const controller = new AbortController();
+  port.onDisconnect.addListener(() => controller.abort());
+
+  try {
+    const { body, headers } = await jsonRequestBody(data);
+    const response = await fetch('http://localhost:8000/api/v1/proposals/generate/stream', {
+      method: 'POST',
+      headers: {
+        ...headers,
+        'Accept': 'text/event-stream',
+        'Authorization': `Bearer ${authToken}`,
+      },
+      body,
+      signal: controller.signal
+    });
+
+    if (response.status === 401) {
+      // If unauthorized, clear token and prompt user to log in again
+      authToken = null;
+      chrome.storage.local.remove(['authToken', 'userEmail']);
+      throw new Error('Authentication expired. Please log in again.');
+    }
+
+    if (response.status === 422) {
+      const errorData = await response.json();
+      console.error("Validation error:", errorData);
+      const errorMessages = errorData.detail.map(error =>
+        `Field '${error.loc.join('.')}' ${error.msg.toLowerCase()}`
+      ).join('; ');
+      throw new Error(`Validation error: ${errorMessages}`);
+    }
+
+    if (!response.ok) {
+      const text = await response.text();
+      console.error("API error response:", text);
+      let errorMsg = text;
+      try {
+        errorMsg = JSON.parse(text).detail || text;
+      } catch (e) {
+        // Not JSON, use plain text
+      }
+      throw new Error(`API error: ${response.status} - ${errorMsg}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let sawDone = false;
+
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) {
+        break;
+      }
+      buffer += decoder.decode(value, { stream: true });
+
+      // Events are separated by a blank line; keep any partial frame in the buffer
+      let separatorIndex;
+      while ((separatorIndex = buffer.indexOf('\n\n')) !== -1) {
+        const frame = buffer.slice(0, separatorIndex);
+        buffer = buffer.slice(separatorIndex + 2);
+
+        const parsed = parseSseFrame(frame);
+        if (!parsed) {
+          continue;
+        }
+        if (parsed.event === 'token') {
+          port.postMessage({ type: 'token', text: parsed.data.text });
+        } else if (parsed.event === 'done') {
+          console.log("Upwork Proposal Generator: Streaming request successful");
+          sawDone = true;
+          port.postMessage({ type: 'done', data: parsed.data });
+        } else if (parsed.event === 'error') {
+          throw new Error(`API error: ${parsed.data.detail}`);
+        }
+      }
+    }
+
+    // Cut off before the done event (server restart, proxy timeout), possibly
+    // mid-frame: whatever is left in the buffer is incomplete
+    if (!sawDone) {
+      throw new Error('Stream ended unexpectedly');
+    }
+  } catch (error) {
+    if (error.name === 'AbortError') {
+      console.log("Upwork Proposal Generator: Streaming request aborted");
+      return;
+    }
+    console.error("Upwork Proposal Generator: Streaming request failed", error);
+    port.postMessage({ type: 'error', error: error.message });
+  }
+}
+
+// Listen for streaming connections from the content script
+chrome.runtime.onConnect.addListener((port) => {
+  if (port.name !== 'proposalStream') {
+    return;
+  }
+
+  port.onMessage.addListener((message) => {
+    if (message.action === 'streamProposal') {
+      console.log("Upwork Proposal Generator: Received streaming API request", message.data);
+      streamProposal(port, message.data);
+    }
+  });
+});
+
 // Listen for installation or update
 chrome.runtime.onInstalled.addListener((details) => {
   console.log("Upwork Proposal Generator: Extension installed or updated", details.reason);
@@ -127,6 +127,33 @@ function addProposalButton() {
   }
 }
 
+// Function to find the cover letter textarea on the page
+function findCoverLetterTextarea() {
+  let coverLetterTextarea = document.querySelector('textarea[aria-labelledby="cover_letter_label"]');
+  
+  if (!coverLetterTextarea) {
+    coverLetterTextarea = document.querySelector('.air3-textarea .inner-textarea');
+  }
+  
+  if (!coverLetterTextarea) {
+    coverLetterTextarea = document.querySelector('textarea.inner-textarea');
+  }
+  
+  if (!coverLetterTextarea) {
+    // Try a more specific selector matching the structure in example.html
+    const textareaWrappers = document.querySelectorAll('.air3-textarea.textarea-wrapper');
+    for (const wrapper of textareaWrappers) {
+      const textarea = wrapper.querySelector('textarea');
+      if (textarea) {
+        coverLetterTextarea = textarea;
+        break;
+      }
+    }
+  }
+  
+  return coverLetterTextarea;
+}
+
 // Function to parse job details from the page
 function parseJobDetails() {
   const jobDetails = {
@@ -175,66 +202,61 @@ async function generateProposal() {
       button.disabled = true;
     }
     
-    console.log("Upwork Proposal Generator: Sending request to API", jobDetails);
-    
-    // Instead of making the request directly from the content script,
-    // send a message to the background script to make the request
-    const response = await new Promise((resolve, reject) => {
-      chrome.runtime.sendMessage(
-        { 
-          action: "makeApiRequest", 
-          data: jobDetails 
-        },
-        (response) => {
-          if (chrome.runtime.lastError) {
-            reject(new Error(chrome.runtime.lastError.message));
-          } else if (!response.success) {
-            reject(new Error(response.error));
-          } else {
-            resolve(response.data);
-          }
-        }
-      );
-    });
-    
-    console.log("Upwork Proposal Generator: Received API response", response);
-    
-    // Find the cover letter textarea again (in case the DOM has changed)
-    let coverLetterTextarea = document.querySelector('textarea[aria-labelledby="cover_letter_label"]');
+    console.log("Upwork Proposal Generator: Sending streaming request to API", jobDetails);
     
+    // Find the cover letter textarea up front so it can be filled as text arrives
+    const coverLetterTextarea = findCoverLetterTextarea();
     if (!coverLetterTextarea) {
-      coverLetterTextarea = document.querySelector('.air3-textarea .inner-textarea');
+      console.error("Upwork Proposal Generator: Could not find textarea to fill");
     }
     
-    if (!coverLetterTextarea) {
-      coverLetterTextarea = document.querySelector('textarea.inner-textarea');
-    }
-    
-    if (!coverLetterTextarea) {
-      // Try a more specific selector matching the structure in example.html
-      const textareaWrappers = document.querySelectorAll('.air3-textarea.textarea-wrapper');
-      for (const wrapper of textareaWrappers) {
-        const textarea = wrapper.querySelector('textarea');
-        if (textarea) {
-          coverLetterTextarea = textarea;
-          break;
-        }
+    // Trigger input event to ensure Upwork's form validation recognizes the change
+    const fillTextarea = (text) => {
+      if (!coverLetterTextarea) {
+        return;
       }
-    }
+      coverLetterTextarea.value = text;
+      coverLetterTextarea.dispatchEvent(new Event('input', { bubbles: true }));
+    };
     
-    if (coverLetterTextarea && response.proposal_text) {
-      coverLetterTextarea.value = response.proposal_text;
+    // Instead of making the request directly from the content script,
+    // open a port to the background script which streams the response back
+    const response = await new Promise((resolve, reject) => {
+      const port = chrome.runtime.connect({ name: 'proposalStream' });
+      let streamedText = '';
+      let settled = false;
       
-      // Trigger input event to ensure Upwork's form validation recognizes the change
-      const inputEvent = new Event('input', { bubbles: true });
-      coverLetterTextarea.dispatchEvent(inputEvent);
+      port.onMessage.addListener((message) => {
+        if (message.type === 'token') {
+          streamedText += message.text;
+          fillTextarea(streamedText);
+        } else if (message.type === 'done') {
+          settled = true;
+          port.disconnect();
+          resolve(message.data);
+        } else if (message.type === 'error') {
+          settled = true;
+          port.disconnect();
+          reject(new Error(message.error));
+        }
+      });
       
-      console.log("Upwork Proposal Generator: Filled textarea with proposal");
-    } else {
-      console.error("Upwork Proposal Generator: Could not find textarea to fill", { 
-        textareaFound: !!coverLetterTextarea, 
-        proposalTextExists: !!response.proposal_text 
+      port.onDisconnect.addListener(() => {
+        if (!settled) {
+          const lastError = chrome.runtime.lastError;
+          reject(new Error(lastError ? lastError.message : 'Connection to the extension was lost.'));
+        }
       });
+      
+      port.postMessage({ action: 'streamProposal', data: jobDetails });
+    });
+    
+    console.log("Upwork Proposal Generator: Received API response", response);
+    
+    if (response.proposal_text) {
+      // Replace the streamed text with the final, trimmed proposal
+      fillTextarea(response.proposal_text);
+      console.log("Upwork Proposal Generator: Filled textarea with proposal");
     }
     
     // Reset button state